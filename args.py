@@ -1,6 +1,11 @@
 import argparse
 
 
+# checked before importing data_access.profiling, which only the profiled runs should pay for
+def profile_requested(args: argparse.Namespace) -> bool:
+    return getattr(args, 'profile', False) or getattr(args, 'profile_json', None) is not None
+
+
 def parse_args():
     parser = argparse.ArgumentParser(description='A script for inserting records into taxonomy.db')
     parser.add_argument(
@@ -22,7 +27,7 @@ def parse_args():
         help='Sets the rank id of the record (for SUFFIX)', metavar='RANKID'
     )
     parser.add_argument(
-        '-g', '--genusid', dest='genus_id', type=int,
+        '-g', '--genusid', dest='genus_type_id', type=int,
         help='Sets the genus type id of the record (for SUFFIX)', metavar='GENUSTYPEID'
     )
     parser.add_argument(
@@ -38,4 +43,21 @@ def parse_args():
         help=('Sets what the relative index of this record is (for RANK).'
               + 'This allows testing for whether two RANKs are "synonymous"'), metavar='INDEX'
     )
+    parser.add_argument(
+        '-s', '--socket', dest='socket', type=str,
+        help='Sends the record to a running ingest_server.py listening on SOCKET instead of opening the db',
+        metavar='SOCKET'
+    )
+    parser.add_argument(
+        '--profile', dest='profile', action='store_true',
+        help='Prints per-statement SQL counts, latencies and rows, and commit time, to stderr on exit'
+    )
+    parser.add_argument(
+        '--profile-json', type=str, dest='profile_json', metavar='PATH',
+        help='Writes the --profile report to PATH as JSON instead'
+    )
+    parser.add_argument(
+        '--startup-profile', dest='startup_profile', action='store_true',
+        help='Prints a per-module import time breakdown to stderr on exit'
+    )
     return parser.parse_args()
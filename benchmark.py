@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+
+from benchmarks.harness import SCENARIOS, BenchmarkOptions, compare_results, format_results, run_benchmarks
+from benchmarks.synthetic import generate_taxonomy, write_ndjson
+
+_defaults = BenchmarkOptions()
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(description='A tool for benchmarking inserts and lookups on a synthetic taxonomy')
+    argparser.add_argument(
+        '-n', '--entities', type=int, dest='entities', default=_defaults.entities, metavar='COUNT',
+        help='The number of entities the synthetic taxonomy has'
+    )
+    argparser.add_argument(
+        '--seed', type=int, dest='seed', default=_defaults.seed, metavar='SEED',
+        help='Seeds the generator; the same seed always produces the same taxonomy'
+    )
+    argparser.add_argument(
+        '--batch-size', type=int, dest='batch_size', default=_defaults.batch_size, metavar='SIZE',
+        help='The number of entities written per transaction by entity_batch'
+    )
+    argparser.add_argument(
+        '--single', type=int, dest='single', default=_defaults.single, metavar='COUNT',
+        help='The number of entities entity_single inserts one at a time'
+    )
+    argparser.add_argument(
+        '--lookups', type=int, dest='lookups', default=_defaults.lookups, metavar='COUNT',
+        help='The number of lookups each lookup scenario makes'
+    )
+    argparser.add_argument(
+        '-s', '--scenario', type=str, nargs='+', dest='scenarios', choices=SCENARIOS, default=list(SCENARIOS),
+        metavar='SCENARIO', help=f'The scenarios to run; options are {list(SCENARIOS)}'
+    )
+    argparser.add_argument(
+        '-o', '--output', type=str, dest='output', metavar='PATH',
+        help='Writes the results as JSON to PATH (otherwise they are printed)'
+    )
+    argparser.add_argument(
+        '-c', '--compare', type=str, dest='compare', metavar='PATH',
+        help='A previous run\'s JSON; exits with status 1 if any metric regressed by more than --tolerance'
+    )
+    argparser.add_argument(
+        '--tolerance', type=float, dest='tolerance', default=0.20, metavar='FRACTION',
+        help='How much worse a metric may get before --compare counts it as a regression'
+    )
+    argparser.add_argument(
+        '--ndjson', type=str, dest='ndjson', metavar='PATH',
+        help='Only writes the synthetic entities to PATH as NDJSON (for insert_entity.py --from-file)'
+    )
+    return argparser.parse_args()
+
+
+def main(args):
+    options = BenchmarkOptions(entities=args.entities, seed=args.seed, batch_size=args.batch_size,
+                               single=args.single, lookups=args.lookups)
+    if args.ndjson is not None:
+        with open(args.ndjson, 'w') as stream:
+            write_ndjson(generate_taxonomy(options.entities, options.seed), stream)
+        return
+
+    results = run_benchmarks(options, args.scenarios)
+    print(format_results(results), file=sys.stderr)
+    if args.output is not None:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare is not None:
+        with open(args.compare) as stream:
+            previous = json.load(stream)
+        try:
+            regressions = compare_results(previous, results, args.tolerance)
+        except ValueError as e:
+            sys.exit(str(e))
+        for regression in regressions:
+            print(f'REGRESSION {regression.scenario} {regression.metric}: {regression.previous} -> '
+                  f'{regression.current} ({regression.change:+.1%})', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    argv = parse_args()
+    main(argv)
@@ -0,0 +1,299 @@
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, NamedTuple, Tuple
+
+from benchmarks.synthetic import SyntheticTaxonomy, generate_taxonomy, load_cons_statuses, load_reference_data, \
+    suffix_records
+
+SCENARIOS = ('structure_single', 'entity_single', 'entity_batch', 'lookup_entity', 'lookup_entity_cached',
+             'lookup_lineage', 'lookup_members')
+
+# the lookups read the database entity_batch leaves behind, so they always run after it
+_READS_BATCH_DB = {'lookup_entity', 'lookup_entity_cached', 'lookup_lineage', 'lookup_members'}
+
+# metric -> whether a larger value is an improvement
+_METRICS = {
+    'records_per_sec': True,
+    'p50_ms': False,
+    'p99_ms': False,
+    'peak_rss_kib': False,
+    'db_bytes': False
+}
+
+# runs with different parameters measure different things and can't be compared
+_COMPARABLE_META = ('entities', 'seed', 'batch_size', 'single', 'lookups')
+
+
+class BenchmarkOptions(NamedTuple):
+    entities: int = 2000
+    seed: int = 0
+    batch_size: int = 500
+    # entity_single goes through insert_entity.main once per entity, so it only covers the first few
+    single: int = 200
+    lookups: int = 1000
+
+
+class ScenarioResult(NamedTuple):
+    records: int
+    seconds: float
+    records_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    peak_rss_kib: int
+    db_bytes: int
+
+
+class Regression(NamedTuple):
+    scenario: str
+    metric: str
+    previous: float
+    current: float
+    change: float
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    # nearest rank, so the result is always a latency that was actually observed
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _peak_rss_kib() -> int:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _db_bytes(db_file: str) -> int:
+    from data_access.connections import close_pools
+
+    # closing the last connection checkpoints the WAL back into the main file
+    close_pools()
+    return sum(os.path.getsize(path) for path in (db_file, db_file + '-wal') if os.path.exists(path))
+
+
+def _timed(operations: List[Callable[[], int]]) -> Tuple[int, List[float]]:
+    records = 0
+    latencies = []
+    for operation in operations:
+        started = time.perf_counter()
+        count = operation()
+        elapsed = time.perf_counter() - started
+        records += count
+        # a batch's latency is spread evenly over the records it wrote
+        latencies.extend([elapsed / count] * count if count else [elapsed])
+    return records, latencies
+
+
+def _structure_kwargs(record) -> dict:
+    from model.db_data import Field, GenusType, Rank
+
+    if isinstance(record, Field):
+        return {'type': 'FIELD', 'value': record.name}
+    if isinstance(record, GenusType):
+        return {'type': 'GENUSTYPE', 'value': record.name}
+    if isinstance(record, Rank):
+        return {'type': 'RANK', 'value': record.name, 'label': record.label, 'is_main': record.is_main,
+                'rel_index': record.rel_index, 'field_id': record.field_id}
+    return {'type': 'SUFFIX', 'value': record.suffix, 'rank_id': record.rank_id,
+            'genus_type_id': record.genus_type_id}
+
+
+def _insert_structure(kwargs: dict, conn) -> int:
+    from functional.dispatch import insert_record
+    from model.db_data import construct_record
+
+    insert_record(construct_record(**kwargs), conn)
+    return 1
+
+
+def _structure_single(db_file: str, taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> Tuple[int, list]:
+    from data_access.sql_ops import AutoClosingConn
+
+    with AutoClosingConn(db_file) as conn:
+        load_cons_statuses(conn, taxonomy)
+        conn.commit()
+        # one construct_record and one committed insert_record per record, as insert_structure.py does
+        records, latencies = _timed([lambda kwargs=_structure_kwargs(record): _insert_structure(kwargs, conn)
+                                     for record in taxonomy.fields + taxonomy.ranks + taxonomy.genus_types])
+        suffixes, suffix_latencies = _timed([lambda kwargs=_structure_kwargs(record): _insert_structure(kwargs, conn)
+                                             for record in suffix_records(conn, taxonomy)])
+    return records + suffixes, latencies + suffix_latencies
+
+
+def _entity_single(db_file: str, taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> Tuple[int, list]:
+    from data_access.connections import DB_PATH_ENV
+    from data_access.sql_ops import AutoClosingConn
+    import insert_entity
+
+    with AutoClosingConn(db_file) as conn:
+        load_reference_data(conn, taxonomy)
+    # insert_entity.main opens the default database, which the environment points at ours
+    os.environ[DB_PATH_ENV] = db_file
+
+    def insert(row) -> int:
+        insert_entity.main(Namespace(name=row.name, pop_est=row.pop_est, cons_cd=row.cons_cd,
+                                     taxonomy=[f'{label}={value}' for (label, value) in row.taxonomy]))
+        return 1
+
+    return _timed([lambda row=row: insert(row) for row in taxonomy.entities[:options.single]])
+
+
+def _entity_batch(db_file: str, taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> Tuple[int, list]:
+    from data_access.bulk_ops import _chunked, insert_entity_chunk, resolve_entity_rows
+    from data_access.ranks import RankResolver
+    from data_access.ref_cache import ReferenceCache
+    from data_access.sql_ops import AutoClosingConn
+    from functional.dispatch import batch
+
+    with AutoClosingConn(db_file) as conn:
+        load_reference_data(conn, taxonomy)
+    with AutoClosingConn(db_file, bulk=True) as conn:
+        refs = ReferenceCache(conn)
+        entities = resolve_entity_rows(taxonomy.entities, RankResolver(rank_ids=refs.rank_ids), refs.cons_codes)
+        chunks = _chunked(entities, options.batch_size)
+
+        # the same per-transaction work as bulk_ops.insert_entities, timed one chunk at a time
+        def insert_chunk() -> int:
+            chunk = next(chunks, [])
+            if chunk:
+                with batch(conn):
+                    insert_entity_chunk(conn, chunk)
+            return len(chunk)
+
+        return _timed([insert_chunk] * math.ceil(len(taxonomy.entities) / options.batch_size))
+
+
+def _lookup_sample(taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> list:
+    rng = random.Random(options.seed)
+    return [rng.choice(taxonomy.entities) for _ in range(options.lookups)]
+
+
+def _lookup_entity(db_file: str, taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> Tuple[int, list]:
+    from data_access.sql_ops import AutoClosingConn
+    from model.constants import sql as sql_queries
+
+    query = sql_queries['select']['entity_id_by_name']
+    with AutoClosingConn(db_file) as conn:
+        return _timed([lambda name=row.name: len(conn.execute(query, (name,)).fetchone())
+                       for row in _lookup_sample(taxonomy, options)])
+
+
+# the same sample as lookup_entity, so the difference is what the read-through cache saves on repeated names
+def _lookup_entity_cached(db_file: str, taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> Tuple[int, list]:
+    from data_access.lookup_cache import LookupCache
+    from data_access.sql_ops import AutoClosingConn
+
+    with AutoClosingConn(db_file) as conn:
+        lookups = LookupCache(conn)
+        return _timed([lambda name=row.name: 1 if lookups.entity_id(name) is not None else 0
+                       for row in _lookup_sample(taxonomy, options)])
+
+
+def _lookup_lineage(db_file: str, taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> Tuple[int, list]:
+    from data_access.lineage import get_lineage
+    from data_access.sql_ops import AutoClosingConn
+
+    with AutoClosingConn(db_file) as conn:
+        return _timed([lambda name=row.name: 1 if get_lineage(conn, name) else 0
+                       for row in _lookup_sample(taxonomy, options)])
+
+
+def _lookup_members(db_file: str, taxonomy: SyntheticTaxonomy, options: BenchmarkOptions) -> Tuple[int, list]:
+    from data_access.lineage import iter_members
+    from data_access.ranks import RankResolver
+    from data_access.sql_ops import AutoClosingConn
+
+    with AutoClosingConn(db_file) as conn:
+        rank_id = RankResolver(conn)['family']
+        families = [dict(row.taxonomy)['FAMILY'] for row in _lookup_sample(taxonomy, options)]
+        return _timed([lambda name=name: 1 if list(iter_members(conn, rank_id, name)) else 0
+                       for name in families])
+
+
+_SCENARIO_FUNCTIONS = {
+    'structure_single': _structure_single,
+    'entity_single': _entity_single,
+    'entity_batch': _entity_batch,
+    'lookup_entity': _lookup_entity,
+    'lookup_entity_cached': _lookup_entity_cached,
+    'lookup_lineage': _lookup_lineage,
+    'lookup_members': _lookup_members
+}
+
+
+def run_scenario(name: str, db_file: str, options: BenchmarkOptions) -> ScenarioResult:
+    taxonomy = generate_taxonomy(options.entities, options.seed)
+    started = time.perf_counter()
+    records, latencies = _SCENARIO_FUNCTIONS[name](db_file, taxonomy, options)
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return ScenarioResult(
+        records=records,
+        seconds=round(seconds, 6),
+        records_per_sec=round(records / seconds, 2) if seconds else 0.0,
+        p50_ms=round(_percentile(latencies, 0.50) * 1000, 4) if latencies else 0.0,
+        p99_ms=round(_percentile(latencies, 0.99) * 1000, 4) if latencies else 0.0,
+        peak_rss_kib=_peak_rss_kib(),
+        db_bytes=_db_bytes(db_file)
+    )
+
+
+def _in_fresh_process(name: str, db_file: str, options: BenchmarkOptions) -> ScenarioResult:
+    # spawned rather than forked so peak RSS only covers the scenario, not whatever the parent had loaded
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_scenario, name, db_file, options).result()
+
+
+def run_benchmarks(options: BenchmarkOptions, scenarios=SCENARIOS) -> dict:
+    scenarios = [name for name in SCENARIOS if name in scenarios]
+    if _READS_BATCH_DB & set(scenarios) and 'entity_batch' not in scenarios:
+        scenarios.insert(0, 'entity_batch')
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='taxonomy-bench-') as workdir:
+        batch_db = os.path.join(workdir, 'entity_batch.db')
+        for name in scenarios:
+            db_file = batch_db if name in _READS_BATCH_DB else os.path.join(workdir, f'{name}.db')
+            results[name] = _in_fresh_process(name, db_file, options)._asdict()
+    return {
+        'meta': dict(options._asdict(), python=platform.python_version(), sqlite=sqlite3.sqlite_version,
+                     platform=platform.platform(), created=time.strftime('%Y-%m-%dT%H:%M:%S%z')),
+        'scenarios': results
+    }
+
+
+def compare_results(previous: dict, current: dict, tolerance: float = 0.20) -> List[Regression]:
+    mismatched = [key for key in _COMPARABLE_META if previous['meta'].get(key) != current['meta'].get(key)]
+    if mismatched:
+        raise ValueError(f'runs were made with different {", ".join(mismatched)} and can\'t be compared')
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = previous['scenarios'].get(name)
+        if before is None:
+            continue
+        for metric, higher_is_better in _METRICS.items():
+            old, new = before[metric], result[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(Regression(name, metric, old, new, round(change, 4)))
+    return regressions
+
+
+def format_results(results: dict) -> str:
+    lines = [f'{"scenario":<18}{"records":>9}{"rec/s":>12}{"p50 ms":>10}{"p99 ms":>10}{"peak RSS KiB":>14}'
+             f'{"db bytes":>12}']
+    for name, result in results['scenarios'].items():
+        lines.append(f'{name:<18}{result["records"]:>9}{result["records_per_sec"]:>12.1f}{result["p50_ms"]:>10.3f}'
+                     f'{result["p99_ms"]:>10.3f}{result["peak_rss_kib"]:>14}{result["db_bytes"]:>12}')
+    return '\n'.join(lines)
@@ -0,0 +1,187 @@
+import json
+import random
+from typing import List, NamedTuple, TextIO, Tuple
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.ranks import load_rank_ids
+from data_access.sql_ops import insert_many
+from functional.dispatch import batch
+from functional.entity_input import EntityRow
+from model.constants import sql as sql_queries
+from model.db_data import Field, GenusType, Rank, Suffix
+
+_FIELDS = ('ZOOLOGY', 'BIOLOGY', 'BOTANY', 'VIROLOGY', 'BACTERIOLOGY', 'LEPIDOPTEROLOGY', 'PROTISTOLOGY',
+           'ICHTHYOLOGY', 'MYCOLOGY', 'UNSPECIFIED')
+
+_GENUS_TYPES = ('BACTERIA', 'PLANTS', 'ALGAE', 'FUNGI', 'ANIMALS')
+
+# the genus types lineages are drawn from; each kingdom belongs to one of them
+_LINEAGE_GENUS_TYPES = ('ANIMALS', 'PLANTS', 'FUNGI')
+
+_CONS_STATUSES = (
+    ('EXTINCT', 'EX', 'GX'),
+    ('EXTINCT IN THE WILD', 'EW', 'GH'),
+    ('CRITICALLY ENDANGERED', 'CR', 'G1'),
+    ('ENDANGERED', 'EN', 'G2'),
+    ('VULNERABLE', 'VU', 'G3'),
+    ('NEAR THREATENED', 'NT', 'G4'),
+    ('LEAST CONCERN', 'LC', 'G5'),
+    ('DATA DEFICIENT', 'DD', 'U'),
+    ('NOT EVALUATED', 'NE', 'NR')
+)
+
+_CONS_WEIGHTS = (1, 1, 3, 5, 8, 8, 40, 10, 24)
+
+# (label, is_main), highest rank first; REL_INDEX is the position in this list
+_RANKS = (
+    ('domain', 1), ('kingdom', 1), ('subkingdom', 0), ('infrakingdom', 0), ('superphylum', 0), ('phylum', 1),
+    ('subphylum', 0), ('infraphylum', 0), ('superclass', 0), ('class', 1), ('subclass', 0), ('infraclass', 0),
+    ('superorder', 0), ('order', 1), ('suborder', 0), ('infraorder', 0), ('parvorder', 0), ('superfamily', 0),
+    ('family', 1), ('subfamily', 0), ('tribe', 0), ('subtribe', 0), ('genus', 1), ('subgenus', 0), ('section', 0),
+    ('series', 0), ('species', 1), ('subspecies', 0), ('variety', 0), ('form', 0)
+)
+
+_SUFFIXES = {
+    'ANIMALS': {'superfamily': 'oidea', 'family': 'idae', 'subfamily': 'inae', 'tribe': 'ini', 'subtribe': 'ina'},
+    'PLANTS': {'phylum': 'phyta', 'subphylum': 'phytina', 'class': 'opsida', 'subclass': 'idae', 'order': 'ales',
+               'suborder': 'ineae', 'family': 'aceae', 'subfamily': 'oideae', 'tribe': 'eae', 'subtribe': 'inae'},
+    'FUNGI': {'phylum': 'mycota', 'subphylum': 'mycotina', 'class': 'mycetes', 'subclass': 'mycetidae',
+              'order': 'ales', 'family': 'aceae', 'subfamily': 'oideae'}
+}
+
+# the average number of species per genus; it sets how much of each lineage entities share
+_SPECIES_PER_GENUS = 8
+
+_ONSETS = ('b', 'c', 'd', 'f', 'g', 'h', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'x', 'z', 'br', 'ch', 'cr', 'ph',
+           'pl', 'st', 'th', 'tr')
+_VOWELS = ('a', 'e', 'i', 'o', 'u', 'ae', 'ia', 'io', 'y')
+
+
+class SyntheticTaxonomy(NamedTuple):
+    fields: List[Field]
+    ranks: List[Rank]
+    genus_types: List[GenusType]
+    # (rank label, genus type, suffix); rank ids depend on how the ranks were inserted, see suffix_records
+    suffixes: List[Tuple[str, str, str]]
+    cons_statuses: List[Tuple[str, str, str]]
+    entities: List[EntityRow]
+
+
+class _Taxon(NamedTuple):
+    parent: int
+    genus_type: str
+    name: str
+
+
+def _word(rng: random.Random, syllables: int) -> str:
+    return ''.join(rng.choice(_ONSETS) + rng.choice(_VOWELS) for _ in range(syllables))
+
+
+def _unique_name(rng: random.Random, taken: set, suffix: str) -> str:
+    syllables = 2
+    while True:
+        name = (_word(rng, syllables) + suffix).upper()
+        if name not in taken:
+            taken.add(name)
+            return name
+        syllables += 1
+
+
+def _level_sizes(entities: int) -> List[int]:
+    species = [label for (label, _) in _RANKS].index('species')
+    genus = [label for (label, _) in _RANKS].index('genus')
+    genera = max(1, entities // _SPECIES_PER_GENUS)
+    sizes = []
+    for depth in range(len(_RANKS)):
+        # grows geometrically from one domain to the genera, then on to one species (and below) per entity
+        if depth <= genus:
+            size = genera ** (depth / genus)
+        elif depth <= species:
+            size = genera * (entities / genera) ** ((depth - genus) / (species - genus))
+        else:
+            size = entities
+        # below the domain there is at least one kingdom per lineage genus type
+        floor = 1 if depth == 0 else len(_LINEAGE_GENUS_TYPES)
+        sizes.append(max(1, min(entities, max(floor, round(size)))))
+    return sizes
+
+
+def generate_taxonomy(entities: int, seed: int = 0) -> SyntheticTaxonomy:
+    rng = random.Random(seed)
+    # fields are the first thing written and go in list order, so on an empty db each id is its position + 1
+    field_ids = {name: field_id for (field_id, name) in enumerate(_FIELDS, start=1)}
+
+    fields = [Field(name) for name in _FIELDS]
+    genus_types = [GenusType(name) for name in _GENUS_TYPES]
+    ranks = []
+    for rel_index, (label, is_main) in enumerate(_RANKS):
+        # every fifth rank is left without a field so both rank insert statements are exercised
+        field_id = None if rel_index % 5 == 4 else field_ids['BIOLOGY']
+        ranks.append(Rank(label.upper(), label, is_main, rel_index, field_id))
+    suffixes = [(label, genus_type, suffix)
+                for (genus_type, by_rank) in _SUFFIXES.items()
+                for (label, suffix) in by_rank.items()]
+
+    levels: List[List[_Taxon]] = []
+    for depth, size in enumerate(_level_sizes(entities)):
+        label = _RANKS[depth][0]
+        taken = set()
+        level = []
+        for index in range(size):
+            if depth == 0:
+                parent, genus_type = -1, _LINEAGE_GENUS_TYPES[0]
+            else:
+                above = levels[-1]
+                # the first pass gives every taxon above at least one child
+                parent = index if index < len(above) else rng.randrange(len(above))
+                genus_type = above[parent].genus_type
+                if label == 'kingdom':
+                    genus_type = _LINEAGE_GENUS_TYPES[index % len(_LINEAGE_GENUS_TYPES)]
+            level.append(_Taxon(parent, genus_type, _unique_name(rng, taken, _SUFFIXES[genus_type].get(label, ''))))
+        levels.append(level)
+
+    rows = []
+    cons_codes = [code for (_, code, _) in _CONS_STATUSES]
+    for line_no in range(1, entities + 1):
+        index = line_no - 1
+        lineage = []
+        for depth in range(len(levels) - 1, -1, -1):
+            taxon = levels[depth][index]
+            lineage.append((_RANKS[depth][0].upper(), taxon.name))
+            index = taxon.parent
+        lineage.reverse()
+        genus = dict(lineage)['GENUS']
+        species = dict(lineage)['SPECIES']
+        pop_est = None if rng.random() < 0.2 else int(rng.lognormvariate(8, 2))
+        cons_cd = rng.choices(cons_codes, weights=_CONS_WEIGHTS)[0]
+        rows.append(EntityRow(line_no, f'{genus.capitalize()} {species.lower()}', pop_est, cons_cd, tuple(lineage)))
+
+    return SyntheticTaxonomy(fields, ranks, genus_types, suffixes, list(_CONS_STATUSES), rows)
+
+
+def suffix_records(conn: Connection, taxonomy: SyntheticTaxonomy) -> List[Suffix]:
+    rank_ids = load_rank_ids(conn)
+    genus_type_ids = {name: genus_type_id
+                      for (genus_type_id, name) in conn.execute(sql_queries['select']['all_genus_type_ids'])}
+    return [Suffix(rank_ids[label], genus_type_ids[genus_type], suffix)
+            for (label, genus_type, suffix) in taxonomy.suffixes]
+
+
+def load_cons_statuses(conn: Connection, taxonomy: SyntheticTaxonomy) -> None:
+    # there is no record type for conservation statuses; the CLIs only ever read them
+    conn.executemany(sql_queries['insert']['conservation_status'], taxonomy.cons_statuses)
+
+
+def load_reference_data(conn: Connection, taxonomy: SyntheticTaxonomy) -> None:
+    with batch(conn):
+        load_cons_statuses(conn, taxonomy)
+        insert_many(taxonomy.fields + taxonomy.ranks + taxonomy.genus_types, conn)
+        insert_many(suffix_records(conn, taxonomy), conn)
+
+
+def write_ndjson(taxonomy: SyntheticTaxonomy, stream: TextIO) -> None:
+    for row in taxonomy.entities:
+        entity = {'name': row.name, 'pop_est': row.pop_est, 'cons_cd': row.cons_cd,
+                  'taxonomy': [f'{label}={value}' for (label, value) in row.taxonomy]}
+        stream.write(json.dumps(entity) + '\n')
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, NamedTuple, TypeVar
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.connections import ConnectionConfig, open_read_only
+from data_access.group_commit import DEFAULT_MAX_BATCH, DEFAULT_MAX_DELAY, GroupCommitWriter
+from data_access.lineage import LineageEntry, Member, get_lineage, iter_members
+from data_access.sql_ops import InsertReport, insert_many
+from functional.dispatch import insert_record
+from model.db_data import Record
+
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_READERS = 4
+
+T = TypeVar('T')
+
+
+# submitted to the writer as one item, so its records share a savepoint and land (or fail) together
+class _Many(NamedTuple):
+    records: List[Record]
+
+
+def _apply(item, conn: Connection) -> Any:
+    if isinstance(item, _Many):
+        return insert_many(item.records, conn)
+    return insert_record(item, conn)
+
+
+class AsyncStore:
+
+    def __init__(self, db_file: str = None, max_batch: int = DEFAULT_MAX_BATCH, max_delay: float = DEFAULT_MAX_DELAY,
+                 max_pending: int = DEFAULT_MAX_PENDING, readers: int = DEFAULT_READERS):
+        self.config = ConnectionConfig.for_path(db_file)
+        self.max_pending = max_pending
+        # the writer's own queue is unbounded; backpressure is applied on the event loop so waiting never blocks it
+        self._writer = GroupCommitWriter(self.config.db_file, apply=_apply, max_batch=max_batch, max_delay=max_delay)
+        self._slots = None
+        self._local = threading.local()
+        self._read_conns: List[Connection] = []
+        self._read_conns_lock = threading.Lock()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='taxonomy-reader')
+
+    # the writer opens (and migrates) the database before returning, so build the store off the event loop
+    @classmethod
+    async def open(cls, *args, **kwargs) -> 'AsyncStore':
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: cls(*args, **kwargs))
+
+    async def __aenter__(self) -> 'AsyncStore':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _pending_slots(self) -> asyncio.Semaphore:
+        # created on first use so it belongs to the loop the store is used from
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        return self._slots
+
+    async def _submit(self, item) -> Any:
+        async with self._pending_slots():
+            return await asyncio.wrap_future(self._writer.submit(item))
+
+    async def insert(self, record: Record) -> None:
+        await self._submit(record)
+
+    async def insert_many(self, records: Iterable[Record]) -> List[InsertReport]:
+        return await self._submit(_Many(list(records)))
+
+    def _read_conn(self) -> Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = open_read_only(self.config)
+            with self._read_conns_lock:
+                self._read_conns.append(conn)
+        return conn
+
+    def _run_read(self, query: Callable[..., T], args: tuple) -> T:
+        return query(self._read_conn(), *args)
+
+    async def read(self, query: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._readers, self._run_read, query, args)
+
+    async def lineage(self, entity_name: str) -> List[LineageEntry]:
+        return await self.read(get_lineage, entity_name)
+
+    async def members(self, rank_id: int, taxon_name: str) -> List[Member]:
+        return await self.read(lambda conn: list(iter_members(conn, rank_id, taxon_name)))
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        # close() drains whatever is still queued before the writer thread exits
+        await loop.run_in_executor(None, self._writer.close)
+        await loop.run_in_executor(None, self._readers.shutdown)
+        with self._read_conns_lock:
+            conns, self._read_conns = self._read_conns, []
+        for conn in conns:
+            conn.close()
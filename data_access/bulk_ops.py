@@ -0,0 +1,130 @@
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.ranks import RankResolver
+from functional.dispatch import MAX_PARAMS, batch, insert_record
+from functional.entity_input import EntityRow
+from model.constants import sql as sql_queries
+from model.db_data import ClassificationColumns, EntityColumns
+
+DEFAULT_BATCH_SIZE = 5000
+
+ResolvedEntity = Tuple[int, str, int, int or None, Tuple[Tuple[int, str], ...]]
+
+
+# an entity counts as updated when its own row or any of its classifications changed
+class SyncCounts(NamedTuple):
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __add__(self, other: 'SyncCounts') -> 'SyncCounts':
+        return SyncCounts(*(a + b for (a, b) in zip(self, other)))
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def resolve_entity_rows(rows: Iterable[EntityRow], ranks: RankResolver,
+                        cons_codes: Dict[str, int]) -> Iterator[ResolvedEntity]:
+    for row in rows:
+        if row.cons_cd not in cons_codes:
+            raise ValueError(f'line {row.line_no}: unknown conservation code "{row.cons_cd}"')
+        labels = [label for (label, _) in row.taxonomy]
+        rank_ids = ranks.resolve(labels, line_no=row.line_no)
+        pairs = tuple(zip(rank_ids, (classification for (_, classification) in row.taxonomy)))
+        yield row.line_no, row.name, cons_codes[row.cons_cd], row.pop_est, pairs
+
+
+def _select_entities(conn: Connection, names: List[str]) -> Dict[str, Tuple[int, int, int]]:
+    entities = {}
+    cur = conn.cursor()
+    for chunk in _chunked(names, MAX_PARAMS):
+        query = sql_queries['select']['entities_by_names'].format(', '.join('?' * len(chunk)))
+        for entity_id, name, cons_id, pop_est in cur.execute(query, chunk):
+            entities[name] = (entity_id, cons_id, pop_est)
+    return entities
+
+
+def _select_classifications(conn: Connection, entity_ids: List[int]) -> Dict[int, Dict[int, str]]:
+    classifications = {}
+    cur = conn.cursor()
+    for chunk in _chunked(entity_ids, MAX_PARAMS):
+        query = sql_queries['select']['classifications_by_entity_ids'].format(', '.join('?' * len(chunk)))
+        for entity_id, rank_id, name in cur.execute(query, chunk):
+            classifications.setdefault(entity_id, {})[rank_id] = name
+    return classifications
+
+
+# both chunk writers run inside the caller's transaction, so a chunk and anything recorded alongside it land together
+def insert_entity_chunk(conn: Connection, chunk: List[ResolvedEntity]) -> None:
+    # the ids come back from the upserts themselves, and every classification (and lineage) then goes in one write
+    entity_ids = insert_record(EntityColumns(entity[1:4] for entity in chunk), conn)
+    insert_record(ClassificationColumns((entity_ids[name], rank_id, classification)
+                                        for (_, name, _, _, pairs) in chunk
+                                        for (rank_id, classification) in pairs), conn)
+
+
+def sync_entity_chunk(conn: Connection, chunk: List[ResolvedEntity]) -> SyncCounts:
+    # a name repeated within the chunk ends up with its last values, as it would through the upserts
+    latest = {entity[1]: entity for entity in chunk}
+    existing = _select_entities(conn, list(latest))
+    current = _select_classifications(conn, [entity_id for (entity_id, _, _) in existing.values()])
+    new = []
+    changed_entities = []
+    changed_pairs = []
+    unchanged = 0
+    for name, entity in latest.items():
+        row = existing.get(name)
+        if row is None:
+            new.append(entity)
+            continue
+        _, _, cons_id, pop_est, pairs = entity
+        entity_id, current_cons_id, current_pop_est = row
+        # a missing population estimate leaves the stored one alone, as the weak upsert does
+        entity_changed = cons_id != current_cons_id or (pop_est is not None and pop_est != current_pop_est)
+        ranks = current.get(entity_id, {})
+        pair_changes = [(entity_id, rank_id, classification) for (rank_id, classification) in pairs
+                        if ranks.get(rank_id) != classification]
+        if entity_changed:
+            changed_entities.append(entity)
+        if pair_changes:
+            changed_pairs.extend(pair_changes)
+        if not entity_changed and not pair_changes:
+            unchanged += 1
+
+    if new:
+        insert_entity_chunk(conn, new)
+    if changed_entities:
+        insert_record(EntityColumns(entity[1:4] for entity in changed_entities), conn)
+    if changed_pairs:
+        insert_record(ClassificationColumns(changed_pairs), conn)
+    return SyncCounts(len(new), len(latest) - len(new) - unchanged, unchanged)
+
+
+def insert_entities(conn: Connection, entities: Iterable[ResolvedEntity],
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    inserted = 0
+    for chunk in _chunked(entities, batch_size):
+        with batch(conn):
+            insert_entity_chunk(conn, chunk)
+        inserted += len(chunk)
+    return inserted
+
+
+# reads what each chunk would overwrite first and writes only the rows that differ, so re-loading a mostly
+# unchanged dump costs little more than the reads
+def sync_entities(conn: Connection, entities: Iterable[ResolvedEntity],
+                  batch_size: int = DEFAULT_BATCH_SIZE) -> SyncCounts:
+    counts = SyncCounts()
+    for chunk in _chunked(entities, batch_size):
+        with batch(conn):
+            counts += sync_entity_chunk(conn, chunk)
+    return counts
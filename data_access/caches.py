@@ -0,0 +1,50 @@
+import weakref
+from typing import FrozenSet, List, Type, Union
+
+from sqlite3.dbapi2 import Connection
+
+from functional.dispatch import on_write
+from model.db_data import Record, Records
+
+_cache_types: List[Type['ConnectionCache']] = []
+
+
+# the base of every in-process cache of database rows. A cache hears about writes two ways: those made through
+# insert_record, on any connection, reach written() as they happen, while those committed by other connections (or
+# processes) only show up as a new PRAGMA data_version; data_version never moves for this connection's own commits,
+# so neither way alone is enough
+class ConnectionCache:
+
+    # the tables whose writes are passed to written()
+    tables: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._live = weakref.WeakSet()
+        _cache_types.append(cls)
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self._data_version = None
+        self._live.add(self)
+
+    # False on the first call, which only records where this connection stands
+    def committed_elsewhere(self) -> bool:
+        data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        changed = self._data_version is not None and data_version != self._data_version
+        self._data_version = data_version
+        return changed
+
+    # called once per write to one of `tables`, with every live cache of the kind (possibly none), so whatever the
+    # caches share, like reading the written rows back, is only done once
+    @classmethod
+    def written(cls, caches: List['ConnectionCache'], table: str, record: Union[Record, Records],
+                conn: Connection) -> None:
+        raise NotImplementedError
+
+
+@on_write
+def _invalidate_caches(table: str, record: Union[Record, Records], conn: Connection) -> None:
+    for cache_type in _cache_types:
+        if table in cache_type.tables:
+            cache_type.written(list(cache_type._live), table, record, conn)
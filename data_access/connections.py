@@ -0,0 +1,157 @@
+import atexit
+import os
+import pathlib
+import threading
+from typing import Dict, List, NamedTuple, Set
+
+import sqlite3
+from sqlite3.dbapi2 import Connection
+
+from model.constants import SCHEMA_VERSION
+
+DB_PATH_ENV = 'TAXONOMY_DB_PATH'
+
+_DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'taxonomy.db')
+
+
+def resolve_db_path(db_file: str = None) -> str:
+    return db_file or os.environ.get(DB_PATH_ENV) or _DEFAULT_DB_PATH
+
+
+class ConnectionConfig(NamedTuple):
+    db_file: str
+    journal_mode: str = 'WAL'
+    synchronous: str = 'FULL'
+    busy_timeout: float = 5.0
+    # negative values are KiB, as PRAGMA cache_size expects
+    cache_size: int = -16384
+    mmap_size: int = 256 * 1024 * 1024
+    pool_size: int = 4
+    migrate: bool = True
+
+    @classmethod
+    def for_path(cls, db_file: str = None, bulk: bool = False, **overrides) -> 'ConnectionConfig':
+        if bulk:
+            # in WAL mode NORMAL only risks the last transactions on power loss, never corruption
+            overrides.setdefault('synchronous', 'NORMAL')
+        return cls(db_file=resolve_db_path(db_file), **overrides)
+
+
+def configure_connection(conn: Connection, config: ConnectionConfig) -> Connection:
+    conn.execute(f'PRAGMA journal_mode = {config.journal_mode}')
+    conn.execute(f'PRAGMA synchronous = {config.synchronous}')
+    conn.execute(f'PRAGMA cache_size = {int(config.cache_size)}')
+    conn.execute(f'PRAGMA mmap_size = {int(config.mmap_size)}')
+    return conn
+
+
+_migrated_paths: Set[str] = set()
+_migrate_lock = threading.Lock()
+
+# replaced by data_access.profiling.enable(); plain sqlite3 connections cost nothing extra otherwise
+_connection_factory = sqlite3.Connection
+
+
+def set_connection_factory(factory: type) -> None:
+    global _connection_factory
+    _connection_factory = factory
+
+
+def open_connection(config: ConnectionConfig) -> Connection:
+    # every write path opens its connection here, so this is where the listeners that keep lineages, the search
+    # index and the reference caches in step with insert_record get registered, whatever else the process imports
+    from data_access import lineage, ref_cache, search  # noqa: F401
+    # the pool keeps each connection on the thread that acquired it, so the same-thread check only gets in the
+    # way of closing idle connections at shutdown
+    conn = sqlite3.connect(config.db_file, isolation_level=None, timeout=config.busy_timeout,
+                           check_same_thread=False, factory=_connection_factory)
+    configure_connection(conn, config)
+    if config.migrate and config.db_file not in _migrated_paths:
+        with _migrate_lock:
+            if config.db_file not in _migrated_paths:
+                # the migration modules are only worth importing when there is something to apply
+                if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                    from data_access.migrations import migrate
+                    migrate(conn)
+                _migrated_paths.add(config.db_file)
+    return conn
+
+
+# readers never write, so they skip the journal/synchronous pragmas (which need a writable db) and migrations
+def open_read_only(config: ConnectionConfig) -> Connection:
+    uri = pathlib.Path(config.db_file).absolute().as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None, timeout=config.busy_timeout, check_same_thread=False,
+                           factory=_connection_factory)
+    conn.execute(f'PRAGMA cache_size = {int(config.cache_size)}')
+    conn.execute(f'PRAGMA mmap_size = {int(config.mmap_size)}')
+    conn.execute('PRAGMA query_only = 1')
+    return conn
+
+
+class ConnectionPool:
+
+    def __init__(self, config: ConnectionConfig):
+        self.config = config
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all: List[Connection] = []
+
+    def _idle(self) -> List[Connection]:
+        idle = getattr(self._local, 'idle', None)
+        if idle is None:
+            idle = self._local.idle = []
+        return idle
+
+    def acquire(self) -> Connection:
+        idle = self._idle()
+        if idle:
+            return idle.pop()
+        conn = open_connection(self.config)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def release(self, conn: Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        idle = self._idle()
+        if len(idle) < self.config.pool_size:
+            idle.append(conn)
+        else:
+            self._discard(conn)
+
+    def _discard(self, conn: Connection) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+
+_pools: Dict[ConnectionConfig, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config: ConnectionConfig) -> ConnectionPool:
+    with _pools_lock:
+        pool = _pools.get(config)
+        if pool is None:
+            pool = _pools[config] = ConnectionPool(config)
+        return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
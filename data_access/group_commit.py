@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.sql_ops import create_connection
+from functional.dispatch import commit, insert_record
+
+DEFAULT_MAX_BATCH = 1000
+DEFAULT_MAX_DELAY = 0.002
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+
+    def __init__(self, db_file: str, apply: Callable[[Any, Connection], Any] = insert_record,
+                 max_batch: int = DEFAULT_MAX_BATCH, max_delay: float = DEFAULT_MAX_DELAY, max_pending: int = 0):
+        self.db_file = db_file
+        self.apply = apply
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='group-commit-writer', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def submit(self, item, block: bool = True, timeout: float = None) -> Future:
+        future = Future()
+        self._queue.put((item, future), block=block, timeout=timeout)
+        return future
+
+    def close(self) -> None:
+        self._queue.put((_STOP, None))
+        self._thread.join()
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if batch[-1][0] is _STOP:
+                break
+        return batch
+
+    def _write(self, conn: Connection, batch: list) -> None:
+        results = []
+        conn.execute('BEGIN')
+        try:
+            for item, future in batch:
+                if item is _STOP:
+                    continue
+                # a savepoint per item keeps one bad record from failing the rest of the group
+                conn.execute('SAVEPOINT item')
+                try:
+                    results.append((future, self.apply(item, conn), None))
+                    conn.execute('RELEASE item')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO item')
+                    conn.execute('RELEASE item')
+                    results.append((future, None, e))
+            commit(conn)
+        except Exception as e:
+            conn.rollback()
+            for item, future in batch:
+                if future is not None:
+                    future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _run(self) -> None:
+        conn = create_connection(self.db_file)
+        self._ready.set()
+        try:
+            while True:
+                batch = self._collect(self._queue.get())
+                self._write(conn, batch)
+                if batch[-1][0] is _STOP:
+                    break
+        finally:
+            conn.close()
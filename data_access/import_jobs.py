@@ -0,0 +1,107 @@
+import hashlib
+import io
+import os
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.bulk_ops import DEFAULT_BATCH_SIZE, SyncCounts, insert_entity_chunk, resolve_entity_rows, \
+    sync_entity_chunk
+from data_access.ranks import RankResolver
+from functional.dispatch import batch
+from functional.entity_input import iter_entity_rows, iter_line_groups
+from model.constants import sql as sql_queries
+
+# (first line number, byte offset of the first line, the raw lines)
+ByteChunk = Tuple[int, int, List[bytes]]
+
+
+class ImportJobError(ValueError):
+    pass
+
+
+class ImportJob(NamedTuple):
+    id: int
+    source: str
+    format: str
+    byte_offset: int
+    line_no: int
+    chunk_offset: int
+    chunk_hash: Optional[str]
+    entities: int
+    finished: int
+
+
+class ImportReport(NamedTuple):
+    source: str
+    # None when the job started from the beginning
+    resumed_at_line: Optional[int]
+    # across every run of the job, not just this one
+    entities: int
+    counts: Optional[SyncCounts]
+
+
+def _select_job(conn: Connection, source: str) -> Optional[ImportJob]:
+    row = conn.execute(sql_queries['select']['import_job'], (source,)).fetchone()
+    return ImportJob(*row) if row is not None else None
+
+
+def start_job(conn: Connection, source: str, fmt: str, restart: bool = False) -> ImportJob:
+    job = _select_job(conn, source)
+    # a finished job has nothing left to resume, so running it again means loading the whole file again
+    if job is None or restart or job.finished:
+        with batch(conn):
+            conn.execute(sql_queries['insert']['import_job'], (source, fmt))
+        job = _select_job(conn, source)
+    elif job.format != fmt:
+        raise ImportJobError(f'{source} was checkpointed as {job.format}, not {fmt}; rerun with --restart')
+    return job
+
+
+def _verify_checkpoint(stream: BinaryIO, job: ImportJob) -> None:
+    stream.seek(job.chunk_offset)
+    last_chunk = stream.read(job.byte_offset - job.chunk_offset)
+    if hashlib.sha256(last_chunk).hexdigest() != job.chunk_hash:
+        raise ImportJobError(f'{job.source} changed since its last checkpoint at line {job.line_no}; '
+                             f'rerun with --restart to load it from the beginning')
+
+
+def _iter_byte_chunks(stream: BinaryIO, line_no: int, size: int, fmt: str) -> Iterator[ByteChunk]:
+    offset = stream.tell()
+    for lines in iter_line_groups(stream, size, fmt):
+        yield line_no, offset, lines
+        line_no += len(lines)
+        offset += sum(len(line) for line in lines)
+
+
+# every chunk commits together with the checkpoint that points past it, so after a crash the job table never
+# claims more than the database holds, and a rerun repeats no committed work
+def run_import_job(conn: Connection, path: str, fmt: str, ranks: RankResolver, cons_codes: Dict[str, int],
+                   batch_size: int = DEFAULT_BATCH_SIZE, sync: bool = False, restart: bool = False) -> ImportReport:
+    source = os.path.abspath(path)
+    job = start_job(conn, source, fmt, restart=restart)
+    counts = SyncCounts() if sync else None
+    checkpoint = sql_queries['update']['import_job_checkpoint']
+    with open(source, 'rb') as stream:
+        header = [stream.readline()] if fmt == 'csv' else []
+        if job.byte_offset:
+            _verify_checkpoint(stream, job)
+            stream.seek(job.byte_offset)
+        line_no = max(job.line_no, len(header) + 1)
+        for start, offset, lines in _iter_byte_chunks(stream, line_no, batch_size, fmt):
+            # parsed behind its own copy of the header, exactly like a pipeline worker's chunk
+            text = b''.join(header + lines).decode('utf-8')
+            rows = iter_entity_rows(io.StringIO(text), fmt, start - len(header))
+            chunk = list(resolve_entity_rows(rows, ranks, cons_codes))
+            raw = b''.join(lines)
+            with batch(conn):
+                if sync:
+                    counts += sync_entity_chunk(conn, chunk)
+                else:
+                    insert_entity_chunk(conn, chunk)
+                conn.execute(checkpoint, (offset + len(raw), start + len(lines), offset,
+                                          hashlib.sha256(raw).hexdigest(), len(chunk), job.id))
+    with batch(conn):
+        conn.execute(sql_queries['update']['import_job_finished'], (job.id,))
+    finished = _select_job(conn, source)
+    return ImportReport(source, line_no if job.byte_offset else None, finished.entities, counts)
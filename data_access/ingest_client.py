@@ -0,0 +1,18 @@
+import json
+import socket
+from typing import Iterable, List
+
+# kept free of model imports so the client side of insert_structure.py starts quickly
+
+
+def send_records(socket_path: str, payloads: Iterable[dict]) -> List[dict]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sent = 0
+        with sock.makefile('rwb') as stream:
+            for payload in payloads:
+                stream.write(json.dumps(payload).encode() + b'\n')
+                sent += 1
+            stream.flush()
+            sock.shutdown(socket.SHUT_WR)
+            return [json.loads(stream.readline()) for _ in range(sent)]
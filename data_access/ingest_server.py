@@ -0,0 +1,75 @@
+import json
+import os
+import queue
+import socketserver
+import threading
+from concurrent.futures import Future
+
+from data_access.group_commit import GroupCommitWriter
+from model.db_data import construct_record
+
+_END = object()
+
+
+def _failed(error: Exception) -> Future:
+    future = Future()
+    future.set_exception(error)
+    return future
+
+
+def _response(future: Future) -> dict:
+    try:
+        future.result()
+        return {'ok': True}
+    except Exception as e:
+        return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+
+class _IngestHandler(socketserver.StreamRequestHandler):
+
+    def _respond(self, pending: queue.Queue) -> None:
+        # answers go out in request order, each once its record's group has been committed
+        while True:
+            future = pending.get()
+            if future is _END:
+                break
+            try:
+                self.wfile.write(json.dumps(_response(future)).encode() + b'\n')
+                self.wfile.flush()
+            except OSError:
+                break
+
+    def handle(self) -> None:
+        pending = queue.Queue()
+        responder = threading.Thread(target=self._respond, args=(pending,), daemon=True)
+        responder.start()
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                try:
+                    payload = json.loads(line)
+                    payload.pop('socket', None)
+                    future = self.server.writer.submit(construct_record(**payload))
+                except Exception as e:
+                    future = _failed(e)
+                pending.put(future)
+        finally:
+            pending.put(_END)
+            responder.join()
+
+
+class IngestServer(socketserver.ThreadingUnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, writer: GroupCommitWriter):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.writer = writer
+        super().__init__(socket_path, _IngestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
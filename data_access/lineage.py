@@ -0,0 +1,182 @@
+from itertools import groupby, islice
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Sequence, Tuple
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.caches import ConnectionCache
+from functional.dispatch import MAX_PARAMS, on_write, written_namedtuples
+from model.constants import sql as sql_queries
+from model.db_data import ColumnarRecords
+
+# bounds the per-writer memo of taxon ids so bulk loads stay flat in memory
+DEFAULT_MEMO_LIMIT = 100000
+
+# the PARENT_ID of a lineage's highest-ranked taxon; no taxon has it as its ID
+ROOT_TAXON = 0
+
+# entities relinked at a time by rebuild_lineages
+_REBUILD_CHUNK = 5000
+
+# how many connections' rank orders are kept before the oldest is dropped
+_RANK_ORDER_CONNECTIONS = 64
+
+
+class LineageEntry(NamedTuple):
+    rank: str
+    name: str
+    depth: int
+
+
+class Member(NamedTuple):
+    entity_id: int
+    name: str
+
+
+# rank id -> where its taxa sit in a lineage, so writing classifications doesn't read RANKS every time
+class RankOrder(ConnectionCache):
+
+    tables = frozenset({'RANKS'})
+
+    def __init__(self, conn: Connection):
+        super().__init__(conn)
+        self._order: Dict[int, Tuple[int, int]] = None
+
+    def current(self) -> Dict[int, Tuple[int, int]]:
+        if self.committed_elsewhere() or self._order is None:
+            self._order = {rank_id: (rel_index, rank_id) for (rank_id, rel_index)
+                           in self.conn.execute(sql_queries['select']['all_rank_rel_indexes'])}
+        return self._order
+
+    @classmethod
+    def written(cls, orders: List['RankOrder'], table: str, record, conn: Connection) -> None:
+        for order in orders:
+            order._order = None
+
+
+# keyed by id(conn), since sqlite3 connections can't be weakly referenced; the identity check catches a reused id
+_rank_orders: Dict[int, RankOrder] = {}
+
+
+def rank_order(conn: Connection) -> RankOrder:
+    order = _rank_orders.get(id(conn))
+    if order is None or order.conn is not conn:
+        if len(_rank_orders) >= _RANK_ORDER_CONNECTIONS:
+            del _rank_orders[next(iter(_rank_orders))]
+        order = _rank_orders[id(conn)] = RankOrder(conn)
+    return order
+
+
+class LineageWriter:
+
+    def __init__(self, conn: Connection, memo_limit: int = DEFAULT_MEMO_LIMIT):
+        self.conn = conn
+        self.memo_limit = memo_limit
+        self.rank_order = rank_order(conn)
+        self._taxa: Dict[Tuple[int, int, str], int] = {}
+
+    def _taxon_id(self, parent_id: int, rank_id: int, name: str) -> int:
+        key = (parent_id, rank_id, name)
+        taxon_id = self._taxa.get(key)
+        if taxon_id is None:
+            cur = self.conn.cursor()
+            row = cur.execute(sql_queries['select']['taxon_id'], key).fetchone()
+            if row is not None:
+                taxon_id = row[0]
+            else:
+                taxon_id = cur.execute(sql_queries['insert']['taxon'], key).lastrowid
+                cur.execute(sql_queries['insert']['taxon_closure'], {'parent': parent_id, 'taxon': taxon_id})
+            if len(self._taxa) >= self.memo_limit:
+                self._taxa.clear()
+            self._taxa[key] = taxon_id
+        return taxon_id
+
+    def _leaf_ids(self, entity_ids: List[int]) -> Dict[int, int]:
+        leaf_ids = {}
+        cur = self.conn.cursor()
+        for start in range(0, len(entity_ids), MAX_PARAMS):
+            chunk = entity_ids[start:start + MAX_PARAMS]
+            query = sql_queries['select']['entity_taxa_by_entity_ids'].format(', '.join('?' * len(chunk)))
+            leaf_ids.update(cur.execute(query, chunk))
+        return leaf_ids
+
+    # drops a taxon nothing uses anymore, then its parent if that was all the parent was used for, and so on up
+    def _prune(self, taxon_id: int) -> None:
+        cur = self.conn.cursor()
+        while taxon_id != ROOT_TAXON and not cur.execute(sql_queries['select']['taxon_in_use'],
+                                                         {'taxon': taxon_id}).fetchone()[0]:
+            key = cur.execute(sql_queries['select']['taxon_key'], (taxon_id,)).fetchone()
+            cur.execute(sql_queries['delete']['taxon_closure'], (taxon_id,))
+            cur.execute(sql_queries['delete']['taxon'], (taxon_id,))
+            self._taxa.pop(tuple(key), None)
+            taxon_id = key[0]
+
+    # entity id -> its (rank id, name) pairs, which replace whatever lineage the entity had
+    def link(self, lineages: Mapping[int, Sequence[Tuple[int, str]]]) -> None:
+        previous = self._leaf_ids(list(lineages))
+        cur = self.conn.cursor()
+        order = self.rank_order.current()
+        for entity_id, pairs in lineages.items():
+            taxon_id = ROOT_TAXON
+            for rank_id, name in sorted(pairs, key=lambda pair: order[pair[0]]):
+                taxon_id = self._taxon_id(taxon_id, rank_id, name)
+            previous_id = previous.get(entity_id)
+            if taxon_id == previous_id:
+                continue
+            if taxon_id == ROOT_TAXON:
+                cur.execute(sql_queries['delete']['entity_taxon'], (entity_id,))
+            else:
+                cur.execute(sql_queries['insert']['entity_taxon'], (entity_id, taxon_id))
+            if previous_id is not None:
+                self._prune(previous_id)
+
+
+# relinks each entity from every classification it has, not just the ones written, since a write may touch only some
+def update_lineages(conn: Connection, entity_ids: Sequence[int]) -> None:
+    lineages = {entity_id: [] for entity_id in entity_ids}
+    entity_ids = list(lineages)
+    cur = conn.cursor()
+    for start in range(0, len(entity_ids), MAX_PARAMS):
+        chunk = entity_ids[start:start + MAX_PARAMS]
+        query = sql_queries['select']['classifications_by_entity_ids'].format(', '.join('?' * len(chunk)))
+        for entity_id, rank_id, name in cur.execute(query, chunk):
+            lineages[entity_id].append((rank_id, name))
+    LineageWriter(conn).link(lineages)
+
+
+@on_write
+def _update_written_lineages(table: str, record, conn: Connection) -> None:
+    if table != 'CLASSIFICATIONS':
+        return
+    if isinstance(record, ColumnarRecords):
+        update_lineages(conn, record.column('entity_id'))
+    else:
+        update_lineages(conn, [nt.entity_id for nt in written_namedtuples(record)])
+
+
+def clear_lineages(conn: Connection) -> None:
+    conn.execute('DELETE FROM ENTITY_TAXA')
+    conn.execute('DELETE FROM TAXON_CLOSURE')
+    conn.execute('DELETE FROM TAXA')
+
+
+def rebuild_lineages(conn: Connection) -> None:
+    clear_lineages(conn)
+    writer = LineageWriter(conn)
+    rows = conn.cursor().execute(sql_queries['select']['all_classifications_by_entity'])
+    entities = groupby(rows, key=lambda row: row[0])
+    while True:
+        chunk = {entity_id: [(rank_id, name) for (_, rank_id, name) in entity_rows]
+                 for (entity_id, entity_rows) in islice(entities, _REBUILD_CHUNK)}
+        if not chunk:
+            break
+        writer.link(chunk)
+
+
+def get_lineage(conn: Connection, entity_name: str) -> List[LineageEntry]:
+    return [LineageEntry(*row) for row in conn.execute(sql_queries['select']['lineage_by_entity_name'],
+                                                       (entity_name,))]
+
+
+def iter_members(conn: Connection, rank_id: int, taxon_name: str) -> Iterator[Member]:
+    for row in conn.execute(sql_queries['select']['members_by_taxon'], (rank_id, taxon_name)):
+        yield Member(*row)
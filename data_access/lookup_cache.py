@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.caches import ConnectionCache
+from functional.dispatch import written_namedtuples
+from model.constants import sql as sql_queries
+
+DEFAULT_MAX_ENTRIES = 65536
+
+# the cached selects; each gets its own LRU of max_entries
+ENTITY_ID_BY_NAME = 'entity_id_by_name'
+RANK_ID_BY_NAME = 'rank_id_by_name'
+RANK_ID_BY_LABEL = 'rank_id_by_label'
+
+_SELECTS = (ENTITY_ID_BY_NAME, RANK_ID_BY_NAME, RANK_ID_BY_LABEL)
+
+_MISSING = object()
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    entries: int
+
+
+class LookupCache(ConnectionCache):
+
+    tables = frozenset({'ENTITIES', 'RANKS'})
+
+    def __init__(self, conn: Connection, max_entries: int = DEFAULT_MAX_ENTRIES):
+        super().__init__(conn)
+        self.max_entries = max_entries
+        self._entries: Dict[str, OrderedDict] = {select: OrderedDict() for select in _SELECTS}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # nothing deletes an entity or a rank and an upsert keeps the row's ID, so a name found once keeps its ID for
+    # good; only misses and label lookups (a label can move to another rank) can be outdated by another connection
+    def _is_stable(self, select: str, value: Optional[int]) -> bool:
+        return value is not None and select != RANK_ID_BY_LABEL
+
+    def _check_data_version(self) -> None:
+        if self.committed_elsewhere():
+            for select, entries in self._entries.items():
+                stale = [key for (key, value) in entries.items() if not self._is_stable(select, value)]
+                for key in stale:
+                    del entries[key]
+                self.invalidations += len(stale)
+
+    def _lookup(self, select: str, key: str) -> Optional[int]:
+        entries = self._entries[select]
+        if key in entries:
+            if not self._is_stable(select, entries[key]):
+                self._check_data_version()
+            if key in entries:
+                self.hits += 1
+                entries.move_to_end(key)
+                return entries[key]
+        elif self._data_version is None:
+            self._check_data_version()
+        self.misses += 1
+        row = self.conn.execute(sql_queries['select'][select], (key,)).fetchone()
+        value = row[0] if row is not None else None
+        entries[key] = value
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def entity_id(self, name: str) -> Optional[int]:
+        return self._lookup(ENTITY_ID_BY_NAME, name)
+
+    def rank_id_by_name(self, name: str) -> Optional[int]:
+        return self._lookup(RANK_ID_BY_NAME, name)
+
+    # RANKS stores its labels lower case
+    def rank_id_by_label(self, label: str) -> Optional[int]:
+        return self._lookup(RANK_ID_BY_LABEL, label.lower())
+
+    def invalidate(self, select: str, keys: Iterable[str]) -> None:
+        entries = self._entries[select]
+        for key in keys:
+            if entries.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def invalidate_rank_ids(self, rank_ids: Iterable[int]) -> None:
+        rank_ids = set(rank_ids)
+        entries = self._entries[RANK_ID_BY_LABEL]
+        self.invalidate(RANK_ID_BY_LABEL, [label for (label, rank_id) in entries.items() if rank_id in rank_ids])
+
+    def clear(self) -> None:
+        for entries in self._entries.values():
+            self.invalidations += len(entries)
+            entries.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions, self.invalidations,
+                          sum(len(entries) for entries in self._entries.values()))
+
+    @classmethod
+    def written(cls, caches: List['LookupCache'], table: str, record, conn: Connection) -> None:
+        if not caches:
+            return
+        names = [nt.name for nt in written_namedtuples(record)]
+        if table == 'ENTITIES':
+            for cache in caches:
+                cache.invalidate(ENTITY_ID_BY_NAME, names)
+            return
+        labels = [nt.label.lower() for nt in written_namedtuples(record)]
+        # an upsert may have moved a rank off its old label, which the record doesn't carry, so labels cached for
+        # the written ranks go too (the rows are read back on the writing connection, inside its transaction)
+        query = sql_queries['select'][RANK_ID_BY_NAME]
+        rank_ids = [row[0] for row in (conn.execute(query, (name,)).fetchone() for name in names) if row is not None]
+        for cache in caches:
+            cache.invalidate(RANK_ID_BY_NAME, names)
+            cache.invalidate(RANK_ID_BY_LABEL, labels)
+            cache.invalidate_rank_ids(rank_ids)
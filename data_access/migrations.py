@@ -0,0 +1,117 @@
+from typing import Callable, NamedTuple, Tuple, Union
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.lineage import rebuild_lineages
+from data_access.search import create_name_search, rebuild_search_index
+from model.constants import SCHEMA_VERSION, sql as sql_queries
+
+MigrationStep = Union[str, Callable[[Connection], None]]
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    steps: Tuple[MigrationStep, ...]
+
+
+def _table_exists(conn: Connection, table: str) -> bool:
+    row = conn.execute(''' SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ? ''', (table,)).fetchone()
+    return row is not None
+
+
+# the first DDL called the table TAX_RANKS while every query reads RANKS
+def _rename_tax_ranks(conn: Connection) -> None:
+    if _table_exists(conn, 'TAX_RANKS') and not _table_exists(conn, 'RANKS'):
+        conn.execute('ALTER TABLE TAX_RANKS RENAME TO RANKS')
+
+
+_create_tables = sql_queries['create']['table']
+_create_indexes = sql_queries['create']['index']
+_create_triggers = sql_queries['create']['trigger']
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(1, 'base tables, unique upsert keys and lookup indexes', (
+        _rename_tax_ranks,
+        _create_tables['field'],
+        _create_tables['rank'],
+        _create_tables['genus_type'],
+        _create_tables['suffix'],
+        _create_tables['conservation_status'],
+        _create_tables['entity'],
+        _create_tables['classification'],
+        _create_indexes['ranks_name'],
+        _create_indexes['fields_name'],
+        _create_indexes['genus_types_name'],
+        _create_indexes['cons_statuses_code'],
+        _create_indexes['ranks_label'],
+        _create_indexes['classifications_rank_name'],
+        _create_indexes['classifications_name']
+    )),
+    Migration(2, 'taxon closure table for lineage and subtree queries', (
+        _create_tables['taxon'],
+        _create_tables['taxon_closure'],
+        _create_tables['entity_taxon'],
+        _create_indexes['taxa_rank_name'],
+        _create_indexes['taxon_closure_descendant'],
+        _create_indexes['entity_taxa_taxon'],
+        rebuild_lineages
+    )),
+    Migration(3, 'name search over entities and taxa', (
+        _create_tables['search_names'],
+        _create_indexes['search_names_key'],
+        # skipped where SQLite lacks FTS5 trigrams; search then falls back to exact and prefix matches
+        create_name_search,
+        _create_triggers['entities_search_insert'],
+        _create_triggers['entities_search_update'],
+        _create_triggers['entities_search_delete'],
+        _create_triggers['taxa_search_insert'],
+        _create_triggers['taxa_search_delete'],
+        rebuild_search_index
+    )),
+    Migration(4, 'checkpoints for resumable bulk imports', (
+        _create_tables['import_jobs'],
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+if LATEST_VERSION != SCHEMA_VERSION:
+    raise RuntimeError(f'model.constants.SCHEMA_VERSION={SCHEMA_VERSION} but the last migration is {LATEST_VERSION}')
+
+
+def current_version(conn: Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _apply(conn: Connection, migration: Migration) -> None:
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # another process may have migrated between our version check and taking the write lock
+        if current_version(conn) >= migration.version:
+            conn.rollback()
+            return
+        for step in migration.steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+        # PRAGMA arguments can't be bound; version is always an int from MIGRATIONS
+        conn.execute(f'PRAGMA user_version = {int(migration.version)}')
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def migrate(conn: Connection, target: int = LATEST_VERSION) -> int:
+    version = current_version(conn)
+    if version >= target:
+        return version
+    for migration in MIGRATIONS:
+        if version < migration.version <= target:
+            _apply(conn, migration)
+            version = migration.version
+    # refresh the planner's statistics so the new indexes are actually chosen
+    conn.execute('ANALYZE')
+    return version
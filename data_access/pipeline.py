@@ -0,0 +1,73 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+from data_access.bulk_ops import ResolvedEntity, resolve_entity_rows
+from data_access.ranks import RankResolver
+from functional.entity_input import iter_entity_rows, iter_line_groups
+
+DEFAULT_CHUNK_LINES = 2000
+
+# chunks in flight per worker; enough to keep every worker busy without reading the whole dump ahead
+_CHUNKS_PER_WORKER = 4
+
+LineChunk = Tuple[int, List[str]]
+
+# set in each worker by _init_worker
+_worker_state = {}
+
+
+def _init_worker(rank_ids: Dict[str, int], cons_codes: Dict[str, int], fmt: str, header: List[str]) -> None:
+    _worker_state.update(ranks=RankResolver(rank_ids=rank_ids), cons_codes=cons_codes, fmt=fmt, header=header)
+
+
+def _resolve_chunk(chunk: LineChunk) -> Tuple[List[ResolvedEntity], Optional[Exception]]:
+    start, lines = chunk
+    header = _worker_state['header']
+    # a CSV chunk is read behind its own copy of the header, which stands in for the line before the chunk
+    rows = iter_entity_rows(io.StringIO(''.join(header + lines)), _worker_state['fmt'], start - len(header))
+    resolved = []
+    try:
+        for entity in resolve_entity_rows(rows, _worker_state['ranks'], _worker_state['cons_codes']):
+            resolved.append(entity)
+    except Exception as e:
+        # the rows before the bad one are still returned, so the writer stops exactly where a serial load would
+        return resolved, e
+    return resolved, None
+
+
+def _iter_line_chunks(stream: TextIO, start: int, size: int, fmt: str) -> Iterator[LineChunk]:
+    for lines in iter_line_groups(stream, size, fmt):
+        yield start, lines
+        start += len(lines)
+
+
+def _drain(future) -> Iterator[ResolvedEntity]:
+    resolved, error = future.result()
+    yield from resolved
+    if error is not None:
+        raise error
+
+
+def iter_resolved_parallel(stream: TextIO, fmt: str, rank_ids: Dict[str, int], cons_codes: Dict[str, int],
+                           workers: int = None, chunk_lines: int = DEFAULT_CHUNK_LINES) -> Iterator[ResolvedEntity]:
+    workers = workers or os.cpu_count() or 1
+    header = [stream.readline()] if fmt == 'csv' else []
+    chunks = _iter_line_chunks(stream, len(header) + 1, chunk_lines, fmt)
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(rank_ids, cons_codes, fmt, header)) as executor:
+        try:
+            for chunk in chunks:
+                in_flight.append(executor.submit(_resolve_chunk, chunk))
+                if len(in_flight) < workers * _CHUNKS_PER_WORKER:
+                    continue
+                # results are taken in submission order, so rows and errors come out exactly as a serial parse
+                yield from _drain(in_flight.popleft())
+            while in_flight:
+                yield from _drain(in_flight.popleft())
+        finally:
+            for future in in_flight:
+                future.cancel()
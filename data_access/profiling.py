@@ -0,0 +1,255 @@
+import atexit
+import math
+import re
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Optional
+
+from data_access import connections
+
+_TOP_N = 20
+
+# an IN list formatted with one '?' per value is still the same statement
+_IN_LIST = re.compile(r'IN \(\?(?:\s*,\s*\?)+\)', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_COMMIT_STATEMENTS = frozenset({'COMMIT', 'END'})
+
+# sqlite3 hands the trace callback the statement with every bound value expanded into it, again for each trigger
+# program it runs, which costs a multi-row INSERT far more than the INSERT itself
+_MAX_TRACED_PARAMS = 64
+
+
+def _normalize(sql: str) -> str:
+    return _IN_LIST.sub('IN (?, ...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+def _percentile(durations: array, fraction: float) -> float:
+    if not durations:
+        return 0.0
+    ordered = sorted(durations)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class StatementStats:
+
+    __slots__ = ('calls', 'rows', 'durations', 'fetched', 'fetch_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.durations = array('d')
+        self.fetched = 0
+        self.fetch_seconds = 0.0
+
+    def add(self, seconds: float, rows: int) -> None:
+        self.calls += 1
+        # sqlite3 reports -1 for statements that don't modify rows
+        if rows > 0:
+            self.rows += rows
+        self.durations.append(seconds)
+
+    def to_dict(self) -> dict:
+        total = sum(self.durations)
+        return {
+            'calls': self.calls,
+            'rows': self.rows,
+            'total_ms': round(total * 1000, 3),
+            'mean_ms': round(total * 1000 / self.calls, 4) if self.calls else 0.0,
+            'p99_ms': round(_percentile(self.durations, 0.99) * 1000, 4),
+            'max_ms': round(max(self.durations, default=0.0) * 1000, 4),
+            'rows_fetched': self.fetched,
+            'fetch_ms': round(self.fetch_seconds * 1000, 3)
+        }
+
+
+class Profiler:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements: Dict[str, StatementStats] = {}
+        self._by_sql: Dict[str, StatementStats] = {}
+        self.commits = StatementStats()
+        # every statement SQLite ran, including each executemany row and each trigger program
+        self.executed = 0
+        self._lock = threading.Lock()
+
+    # the same few statement strings are executed over and over, so each is only normalized once
+    def stats_for(self, sql: str) -> StatementStats:
+        stats = self._by_sql.get(sql)
+        if stats is None:
+            key = _normalize(sql)
+            with self._lock:
+                if key.upper() in _COMMIT_STATEMENTS:
+                    stats = self.commits
+                else:
+                    stats = self.statements.get(key)
+                    if stats is None:
+                        stats = self.statements[key] = StatementStats()
+                self._by_sql[sql] = stats
+        return stats
+
+    def record(self, stats: StatementStats, seconds: float, rows: int) -> None:
+        with self._lock:
+            stats.add(seconds, rows)
+
+    # rows are stepped through after execute() returns, so their time (which includes a little of this wrapper's
+    # own, once per row) is kept apart from the statement's latency
+    def record_fetch(self, stats: StatementStats, seconds: float, rows: int) -> None:
+        with self._lock:
+            stats.fetched += rows
+            stats.fetch_seconds += seconds
+
+    def record_commit(self, seconds: float) -> None:
+        with self._lock:
+            self.commits.add(seconds, 0)
+
+    def trace(self, statement: str) -> None:
+        self.executed += 1
+
+    def report(self) -> dict:
+        with self._lock:
+            statements = [dict(sql=sql, kind=sql.split(' ', 1)[0].upper(), **stats.to_dict())
+                          for (sql, stats) in self.statements.items()]
+            commits = self.commits.to_dict()
+        statements.sort(key=lambda statement: statement['total_ms'], reverse=True)
+        kinds = {}
+        for statement in statements:
+            kind = kinds.setdefault(statement['kind'], {'calls': 0, 'rows': 0, 'rows_fetched': 0, 'total_ms': 0.0})
+            kind['calls'] += statement['calls']
+            kind['rows'] += statement['rows']
+            kind['rows_fetched'] += statement['rows_fetched']
+            kind['total_ms'] = round(kind['total_ms'] + statement['total_ms'] + statement['fetch_ms'], 3)
+        return {
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'sqlite_statements': self.executed,
+            'commits': commits,
+            'kinds': kinds,
+            'statements': statements
+        }
+
+    def write_json(self, path: str) -> None:
+        import json
+
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_summary(self, file=None) -> None:
+        file = file or sys.stderr
+        report = self.report()
+        commits = report['commits']
+        print(f'sql profile: {report["seconds"] * 1000:.1f} ms total, {report["sqlite_statements"]} statements run '
+              f'by sqlite, {commits["calls"]} commits taking {commits["total_ms"]:.1f} ms '
+              f'(p99 {commits["p99_ms"]:.2f} ms)', file=file)
+        for kind, totals in sorted(report['kinds'].items(), key=lambda item: item[1]['total_ms'], reverse=True):
+            print(f'{kind:>10} {totals["calls"]:>9} calls {totals["rows"]:>9} rows written '
+                  f'{totals["rows_fetched"]:>9} rows read {totals["total_ms"]:>10.1f} ms', file=file)
+        print(f'{"total ms":>10} {"p99 ms":>8} {"fetch ms":>9} {"calls":>8} {"written":>8} {"read":>8}  statement',
+              file=file)
+        for statement in report['statements'][:_TOP_N]:
+            print(f'{statement["total_ms"]:>10.1f} {statement["p99_ms"]:>8.3f} {statement["fetch_ms"]:>9.1f} '
+                  f'{statement["calls"]:>8} {statement["rows"]:>8} {statement["rows_fetched"]:>8}  '
+                  f'{statement["sql"][:100]}', file=file)
+
+
+# set by enable(); ProfiledConnection reads it when it is opened
+_profiler: Optional[Profiler] = None
+
+
+class ProfiledCursor(sqlite3.Cursor):
+
+    _stats = None
+
+    def execute(self, sql, parameters=()):
+        self._stats = _profiler.stats_for(sql)
+        # so such a statement runs untraced, and counts as one statement whatever its triggers run
+        untraced = len(parameters) > _MAX_TRACED_PARAMS
+        if untraced:
+            self.connection.set_trace_callback(None)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _profiler.record(self._stats, time.perf_counter() - started, self.rowcount)
+            if untraced:
+                _profiler.trace(sql)
+                self.connection.set_trace_callback(_profiler.trace)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._stats = _profiler.stats_for(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _profiler.record(self._stats, time.perf_counter() - started, self.rowcount)
+
+    # sqlite3's own fetch methods step the statement directly, so each one is wrapped rather than just __next__
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        _profiler.record_fetch(self._stats, time.perf_counter() - started, 1)
+        return row
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        _profiler.record_fetch(self._stats, time.perf_counter() - started, row is not None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _profiler.record_fetch(self._stats, time.perf_counter() - started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        _profiler.record_fetch(self._stats, time.perf_counter() - started, len(rows))
+        return rows
+
+
+class ProfiledConnection(sqlite3.Connection):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_profiler.trace)
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    # sqlite3's execute shortcuts build their cursor without going through cursor(), so they are wrapped too
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    # commit time is dominated by the WAL fsync, so this is also the sync cost; a statement run in autocommit mode
+    # commits (and syncs) inside its own execute(), so that shows up in the statement's latency instead
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            _profiler.record_commit(time.perf_counter() - started)
+
+
+def _report(json_path: Optional[str]) -> None:
+    if json_path is not None:
+        _profiler.write_json(json_path)
+    else:
+        _profiler.print_summary()
+
+
+# connections opened after this are profiled, and the report is written (or printed to stderr) on exit
+def enable(json_path: str = None) -> Profiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+        connections.set_connection_factory(ProfiledConnection)
+        atexit.register(_report, json_path)
+    return _profiler
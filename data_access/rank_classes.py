@@ -0,0 +1,186 @@
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.caches import ConnectionCache
+from functional.dispatch import written_namedtuples
+from model.constants import sql as sql_queries
+from model.db_data import ClassificationColumns
+
+# fills the per-id tables for ids no rank has
+_NO_RANK = -1
+
+
+class RankRow(NamedTuple):
+    id: int
+    name: str
+    is_main: int
+    rel_index: int
+    field_id: Optional[int]
+
+
+# every rank sharing a REL_INDEX is a synonym of the others, e.g. PHYLUM and (in botany) DIVISION_B
+class RankClass(NamedTuple):
+    rel_index: int
+    canonical_id: int
+    member_ids: Tuple[int, ...]
+
+
+class ClassComparison(NamedTuple):
+    rel_index: int
+    canonical_id: int
+    left: Optional[str]
+    right: Optional[str]
+
+
+# a main rank stands for its class, then one that every field uses, then the oldest
+def _canonical_key(rank: RankRow) -> tuple:
+    return not rank.is_main, rank.field_id is not None, rank.id
+
+
+class RankEquivalence(ConnectionCache):
+
+    tables = frozenset({'RANKS'})
+
+    def __init__(self, conn: Connection):
+        super().__init__(conn)
+        self._ranks: Dict[int, RankRow] = {}
+        self._members: Dict[int, Dict[int, RankRow]] = {}
+        # both indexed by rank id, so normalizing a column is one list lookup per value
+        self._rel_index: List[int] = []
+        self._canonical: List[int] = []
+        self._loaded = False
+
+    def _load(self) -> None:
+        self._ranks = {row[0]: RankRow(*row) for row in self.conn.execute(sql_queries['select']['all_rank_classes'])}
+        self._members = {}
+        for rank in self._ranks.values():
+            self._members.setdefault(rank.rel_index, {})[rank.id] = rank
+        self._rel_index = []
+        self._canonical = []
+        self._grow(max(self._ranks, default=0))
+        for rel_index in list(self._members):
+            self._reindex(rel_index)
+        self._loaded = True
+
+    def _grow(self, rank_id: int) -> None:
+        missing = rank_id + 1 - len(self._canonical)
+        if missing > 0:
+            self._rel_index.extend([_NO_RANK] * missing)
+            self._canonical.extend([_NO_RANK] * missing)
+
+    def _reindex(self, rel_index: int) -> None:
+        members = self._members.get(rel_index)
+        if not members:
+            self._members.pop(rel_index, None)
+            return
+        canonical_id = min(members.values(), key=_canonical_key).id
+        for rank_id in members:
+            self._rel_index[rank_id] = rel_index
+            self._canonical[rank_id] = canonical_id
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.refresh()
+
+    # the single-rank methods below only load once; batch methods also pick up ranks other connections committed
+    def refresh(self) -> None:
+        if self.committed_elsewhere() or not self._loaded:
+            self._load()
+
+    def invalidate(self) -> None:
+        self._loaded = False
+
+    # moves one upserted rank between classes and re-picks the canonical rank of just the classes it touched
+    def apply(self, rank: RankRow) -> None:
+        if not self._loaded:
+            return
+        previous = self._ranks.get(rank.id)
+        self._ranks[rank.id] = rank
+        self._grow(rank.id)
+        if previous is not None and previous.rel_index != rank.rel_index:
+            del self._members[previous.rel_index][rank.id]
+            self._reindex(previous.rel_index)
+        self._members.setdefault(rank.rel_index, {})[rank.id] = rank
+        self._reindex(rank.rel_index)
+
+    def _checked(self, table: List[int], rank_id: int) -> int:
+        value = table[rank_id] if 0 <= rank_id < len(table) else _NO_RANK
+        if value == _NO_RANK:
+            raise KeyError(rank_id)
+        return value
+
+    def rank(self, rank_id: int) -> RankRow:
+        self._ensure_loaded()
+        return self._ranks[rank_id]
+
+    def rel_index(self, rank_id: int) -> int:
+        self._ensure_loaded()
+        return self._checked(self._rel_index, rank_id)
+
+    def canonical(self, rank_id: int) -> int:
+        self._ensure_loaded()
+        return self._checked(self._canonical, rank_id)
+
+    def equivalent(self, rank_id: int, other_id: int) -> bool:
+        return self.rel_index(rank_id) == self.rel_index(other_id)
+
+    # the synonym of rank_id a field uses: its own rank if it has one, otherwise one every field uses
+    def in_field(self, rank_id: int, field_id: Optional[int]) -> Optional[int]:
+        members = self._members[self.rel_index(rank_id)].values()
+        for candidates in ([rank for rank in members if rank.field_id == field_id],
+                           [rank for rank in members if rank.field_id is None]):
+            if candidates:
+                return min(candidates, key=_canonical_key).id
+        return None
+
+    def classes(self) -> List[RankClass]:
+        self.refresh()
+        return [RankClass(rel_index, self._canonical[next(iter(members))], tuple(sorted(members)))
+                for (rel_index, members) in sorted(self._members.items())]
+
+    def normalize(self, rank_ids: Sequence[int]) -> array:
+        self.refresh()
+        canonical = self._canonical
+        if rank_ids and min(rank_ids) < 0:
+            raise KeyError(min(rank_ids))
+        try:
+            normalized = array('q', map(canonical.__getitem__, rank_ids))
+        except IndexError:
+            normalized = array('q', (canonical[rank_id] if 0 <= rank_id < len(canonical) else _NO_RANK
+                                     for rank_id in rank_ids))
+        if _NO_RANK in normalized:
+            raise KeyError(rank_ids[normalized.index(_NO_RANK)])
+        return normalized
+
+    def normalize_classifications(self, classifications: ClassificationColumns) -> ClassificationColumns:
+        rank_ids = self.normalize(classifications.column('rank_id'))
+        return ClassificationColumns(zip(classifications.column('entity_id'), rank_ids,
+                                         classifications.column('name')))
+
+    # lines two classifications up class by class, whichever fields' ranks each was recorded under
+    def compare(self, left: Iterable[Tuple[int, str]], right: Iterable[Tuple[int, str]]) -> List[ClassComparison]:
+        self.refresh()
+        by_class: Dict[int, List[Optional[str]]] = {}
+        for side, pairs in enumerate((left, right)):
+            for rank_id, name in pairs:
+                by_class.setdefault(self._checked(self._rel_index, rank_id), [None, None])[side] = name
+        return [ClassComparison(rel_index, self._canonical[next(iter(self._members[rel_index]))], *names)
+                for (rel_index, names) in sorted(by_class.items())]
+
+    @classmethod
+    def written(cls, models: List['RankEquivalence'], table: str, record, conn: Connection) -> None:
+        if not models:
+            return
+        # read back on the writing connection, so each rank comes with its ID and whatever the upsert left in place
+        query = sql_queries['select']['rank_class_by_name']
+        rows = [conn.execute(query, (nt.name,)).fetchone() for nt in written_namedtuples(record)]
+        ranks = [RankRow(*row) for row in rows if row is not None]
+        for model in models:
+            if model.conn is conn:
+                for rank in ranks:
+                    model.apply(rank)
+            else:
+                # the write may be to another database; on this one data_version would catch it once it commits
+                model.invalidate()
@@ -0,0 +1,51 @@
+from typing import Dict, Iterable, List, Sequence
+
+from sqlite3.dbapi2 import Connection
+
+from model.constants import sql as sql_queries
+
+
+class UnknownRankError(ValueError):
+
+    def __init__(self, labels: Iterable[str], line_no: int = None):
+        self.labels = list(labels)
+        self.line_no = line_no
+        prefix = f'line {line_no}: ' if line_no is not None else ''
+        super().__init__(f'{prefix}unknown rank label(s): {", ".join(self.labels)}')
+
+    # rebuilt from its own arguments, not the message, when it crosses a process boundary
+    def __reduce__(self):
+        return type(self), (self.labels, self.line_no)
+
+
+def load_rank_ids(conn: Connection) -> Dict[str, int]:
+    by_label = {}
+    by_name = {}
+    cur = conn.cursor()
+    for rank_id, name, label in cur.execute(sql_queries['select']['all_rank_keys']):
+        # labels are not unique (e.g. DIVISION_B/DIVISION_Z); the first by ID wins, as with rank_id_by_label
+        by_label.setdefault(label.lower(), rank_id)
+        by_name[name.lower()] = rank_id
+    # a disambiguated NAME (e.g. DIVISION_Z) is accepted wherever a LABEL is
+    by_name.update(by_label)
+    return by_name
+
+
+class RankResolver:
+
+    def __init__(self, conn: Connection = None, rank_ids: Dict[str, int] = None):
+        self.rank_ids = rank_ids if rank_ids is not None else load_rank_ids(conn)
+
+    def __getitem__(self, label: str) -> int:
+        try:
+            return self.rank_ids[label.lower()]
+        except KeyError:
+            raise UnknownRankError([label]) from None
+
+    def resolve(self, labels: Sequence[str], line_no: int = None) -> List[int]:
+        rank_ids = self.rank_ids
+        resolved = [rank_ids.get(label.lower()) for label in labels]
+        if None in resolved:
+            unknown = [label for (label, rank_id) in zip(labels, resolved) if rank_id is None]
+            raise UnknownRankError(unknown, line_no=line_no)
+        return resolved
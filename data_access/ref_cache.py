@@ -0,0 +1,141 @@
+import os
+from typing import Callable, Dict, List
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.caches import ConnectionCache
+from data_access.ranks import load_rank_ids
+from model.constants import sql as sql_queries
+
+
+def _load_cons_codes(conn: Connection) -> Dict[str, int]:
+    return {code: cons_id for (cons_id, code) in conn.execute(sql_queries['select']['all_cons_codes'])}
+
+
+def _load_field_ids(conn: Connection) -> Dict[str, int]:
+    return {name: field_id for (field_id, name) in conn.execute(sql_queries['select']['all_field_ids'])}
+
+
+def _load_genus_type_ids(conn: Connection) -> Dict[str, int]:
+    return {name: genus_id for (genus_id, name) in conn.execute(sql_queries['select']['all_genus_type_ids'])}
+
+
+_loaders: Dict[str, Callable[[Connection], Dict[str, int]]] = {
+    'CONSERVATION_STATUSES': _load_cons_codes,
+    'RANKS': load_rank_ids,
+    'FIELDS': _load_field_ids,
+    'GENUS_TYPES': _load_genus_type_ids
+}
+
+REFERENCE_TABLES = tuple(_loaders)
+
+
+def default_sidecar_path(conn: Connection) -> str or None:
+    for _, name, path in conn.execute('PRAGMA database_list'):
+        if name == 'main':
+            return f'{path}.refcache.json' if path else None
+    return None
+
+
+class ReferenceCache(ConnectionCache):
+
+    tables = frozenset(REFERENCE_TABLES)
+
+    def __init__(self, conn: Connection, sidecar_path: str = None):
+        super().__init__(conn)
+        self.sidecar_path = sidecar_path
+        self._tables: Dict[str, Dict[str, int]] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._sidecar = None
+
+    def _current_fingerprints(self) -> Dict[str, str]:
+        selects = ', '.join(f'({sql_queries["select"]["table_fingerprint"].format(table)})'
+                            for table in REFERENCE_TABLES)
+        row = self.conn.execute(f'SELECT schema_version, {selects} FROM pragma_schema_version').fetchone()
+        schema_version = row[0]
+        return {table: f'{schema_version}:{fp}' for (table, fp) in zip(REFERENCE_TABLES, row[1:])}
+
+    def _check_data_version(self) -> None:
+        if self.committed_elsewhere():
+            self._tables.clear()
+            self._fingerprints.clear()
+
+    def _read_sidecar(self) -> dict:
+        import json
+
+        if self._sidecar is None:
+            self._sidecar = {'fingerprints': {}, 'tables': {}}
+            if self.sidecar_path is not None and os.path.exists(self.sidecar_path):
+                try:
+                    with open(self.sidecar_path) as f:
+                        self._sidecar = json.load(f)
+                except (OSError, ValueError):
+                    pass
+        return self._sidecar
+
+    def _write_sidecar(self) -> None:
+        import json
+
+        if self.sidecar_path is None or self._sidecar is None:
+            return
+        tmp_path = f'{self.sidecar_path}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._sidecar, f)
+            os.replace(tmp_path, self.sidecar_path)
+        except OSError as e:
+            print(e)
+
+    def get(self, table: str) -> Dict[str, int]:
+        self._check_data_version()
+        if table in self._tables:
+            return self._tables[table]
+
+        if not self._fingerprints:
+            self._fingerprints = self._current_fingerprints()
+        fingerprint = self._fingerprints[table]
+        sidecar = self._read_sidecar()
+        if sidecar['fingerprints'].get(table) == fingerprint:
+            values = sidecar['tables'][table]
+        else:
+            values = _loaders[table](self.conn)
+            sidecar['fingerprints'][table] = fingerprint
+            sidecar['tables'][table] = values
+            self._write_sidecar()
+        self._tables[table] = values
+        return values
+
+    def invalidate(self, table: str) -> None:
+        self._tables.pop(table, None)
+        self._fingerprints.clear()
+        sidecar = self._read_sidecar()
+        if sidecar['fingerprints'].pop(table, None) is not None:
+            sidecar['tables'].pop(table, None)
+            self._write_sidecar()
+
+    @property
+    def cons_codes(self) -> Dict[str, int]:
+        return self.get('CONSERVATION_STATUSES')
+
+    @property
+    def rank_ids(self) -> Dict[str, int]:
+        return self.get('RANKS')
+
+    @property
+    def field_ids(self) -> Dict[str, int]:
+        return self.get('FIELDS')
+
+    @property
+    def genus_type_ids(self) -> Dict[str, int]:
+        return self.get('GENUS_TYPES')
+
+    @classmethod
+    def written(cls, caches: List['ReferenceCache'], table: str, record, conn: Connection) -> None:
+        live_paths = set()
+        for cache in caches:
+            cache.invalidate(table)
+            live_paths.add(cache.sidecar_path)
+        # a sidecar written by another process can't see in-place upserts through its fingerprint
+        sidecar_path = default_sidecar_path(conn)
+        if sidecar_path not in live_paths and sidecar_path is not None and os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
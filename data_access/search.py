@@ -0,0 +1,159 @@
+from typing import Dict, List, NamedTuple, Set
+
+from sqlite3 import OperationalError
+from sqlite3.dbapi2 import Connection
+
+from functional.dispatch import before_commit
+from model.constants import sql as sql_queries
+
+DEFAULT_LIMIT = 10
+
+# the trigram index can't match anything shorter than a trigram
+MIN_SUBSTRING_LENGTH = 3
+
+# how many rows each index probe may return; a probe only runs while fewer than `limit` names were found
+_CANDIDATES_PER_PROBE = 64
+
+# the shortest query piece worth looking up in the fuzzy pass; shorter pieces match too much to be useful
+_MIN_PIECE_LENGTH = 4
+
+# one edit changes at most this many of a name's trigrams
+_TRIGRAMS_PER_EDIT = 3
+
+_create_triggers = sql_queries['create']['trigger']
+
+# these keep NAME_SEARCH in step with SEARCH_NAMES, so they only exist when NAME_SEARCH does
+_NAME_SEARCH_TRIGGERS = ('TRG_SEARCH_NAMES_AI', 'TRG_SEARCH_NAMES_AD', 'TRG_SEARCH_NAMES_AU')
+
+
+class NameMatch(NamedTuple):
+    kind: str
+    id: int
+    name: str
+    score: float
+
+
+def fts_trigram_available(conn: Connection) -> bool:
+    # FTS5 is a compile-time option and the trigram tokenizer needs SQLite 3.34
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.FTS_TRIGRAM_PROBE USING fts5(NAME, tokenize='trigram')")
+    except OperationalError:
+        return False
+    conn.execute('DROP TABLE temp.FTS_TRIGRAM_PROBE')
+    return True
+
+
+def create_name_search(conn: Connection) -> None:
+    if fts_trigram_available(conn):
+        conn.execute(sql_queries['create']['table']['name_search'])
+        conn.execute(sql_queries['create']['table']['search_pending'])
+
+
+def has_name_search(conn: Connection) -> bool:
+    row = conn.execute(''' SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'NAME_SEARCH' ''').fetchone()
+    return row is not None
+
+
+def rebuild_search_index(conn: Connection) -> None:
+    fts = has_name_search(conn)
+    # reloaded in bulk with the per-row triggers out of the way, then the trigram index is rebuilt in one pass
+    for trigger in _NAME_SEARCH_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DELETE FROM SEARCH_NAMES')
+    conn.execute(f'INSERT INTO SEARCH_NAMES(ID, NAME, NAME_KEY) {sql_queries["select"]["all_search_names"]}')
+    if fts:
+        conn.execute('DELETE FROM SEARCH_PENDING')
+        conn.execute("INSERT INTO NAME_SEARCH(NAME_SEARCH) VALUES('rebuild')")
+        conn.execute(_create_triggers['search_names_insert'])
+        conn.execute(_create_triggers['search_names_delete'])
+        conn.execute(_create_triggers['search_names_update'])
+
+
+@before_commit
+def flush_search_index(conn: Connection) -> None:
+    try:
+        if conn.execute('SELECT 1 FROM SEARCH_PENDING LIMIT 1').fetchone() is None:
+            return
+    except OperationalError:
+        # not migrated yet, or built without FTS5 trigrams
+        return
+    conn.execute(sql_queries['insert']['search_names_pending'])
+    conn.execute('DELETE FROM SEARCH_PENDING')
+
+
+def _decode(search_id: int) -> tuple:
+    return ('TAXON' if search_id & 1 else 'ENTITY'), search_id >> 1
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# exact > prefix > substring > fuzzy; within a tier, names closer in length to the query rank higher
+def _score(query_key: str, query_trigrams: Set[str], name: str) -> float:
+    key = name.lower()
+    if key == query_key:
+        return 4.0
+    if key.startswith(query_key):
+        return 3.0 + len(query_key) / len(key)
+    if query_key in key:
+        return 2.0 + len(query_key) / len(key)
+    # Dice coefficient of the two trigram sets, between 0 and 1
+    trigrams = _trigrams(key)
+    if not trigrams or not query_trigrams:
+        return 0.0
+    return 2 * len(query_trigrams & trigrams) / (len(query_trigrams) + len(trigrams))
+
+
+def _fuzzy_pieces(query_key: str) -> List[str]:
+    # a name within n edits of the query still contains at least one of n + 1 disjoint pieces of it unchanged
+    edits = 1 if len(query_key) < 12 else 2
+    size = len(query_key) // (edits + 1)
+    if size < _MIN_PIECE_LENGTH:
+        return []
+    return [query_key[i * size:(i + 1) * size if i < edits else len(query_key)] for i in range(edits + 1)]
+
+
+# for a query too short to split into pieces: names sharing any of its trigrams, best bm25 first, of which those
+# one edit away (or closer) still share all but _TRIGRAMS_PER_EDIT of them
+def _trigram_candidates(conn: Connection, query_trigrams: Set[str]) -> Dict[int, str]:
+    select = sql_queries['select']
+    cur = conn.cursor()
+    candidates = dict(cur.execute(select['search_names_by_ranked_match'],
+                                  (' OR '.join(_phrase(trigram) for trigram in sorted(query_trigrams)),
+                                   _CANDIDATES_PER_PROBE)))
+    for trigram in query_trigrams:
+        candidates.update(cur.execute(select['search_names_pending'], (trigram, _CANDIDATES_PER_PROBE)))
+    shared = max(1, len(query_trigrams) - _TRIGRAMS_PER_EDIT)
+    return {search_id: name for (search_id, name) in candidates.items()
+            if len(query_trigrams & _trigrams(name.lower())) >= shared}
+
+
+def search_names(conn: Connection, query: str, limit: int = DEFAULT_LIMIT) -> List[NameMatch]:
+    query_key = query.strip().lower()
+    if not query_key:
+        return []
+    select = sql_queries['select']
+    cur = conn.cursor()
+    candidates: Dict[int, str] = dict(cur.execute(select['search_names_by_prefix'],
+                                                  (query_key, query_key, _CANDIDATES_PER_PROBE)))
+    query_trigrams = _trigrams(query_key)
+    if len(candidates) < limit and len(query_key) >= MIN_SUBSTRING_LENGTH and has_name_search(conn):
+        pieces = _fuzzy_pieces(query_key)
+        # the whole query first, then the fuzzy pieces only if it didn't find enough
+        for piece in [query_key] + pieces:
+            if len(candidates) >= limit:
+                break
+            candidates.update(cur.execute(select['search_names_by_match'], (_phrase(piece), _CANDIDATES_PER_PROBE)))
+            # names written outside a batch are only indexed when the next batch commits
+            candidates.update(cur.execute(select['search_names_pending'], (piece, _CANDIDATES_PER_PROBE)))
+        if len(candidates) < limit and not pieces:
+            candidates.update(_trigram_candidates(conn, query_trigrams))
+    matches = [NameMatch(*_decode(search_id), name, round(_score(query_key, query_trigrams, name), 4))
+               for (search_id, name) in candidates.items()]
+    matches.sort(key=lambda match: (-match.score, len(match.name), match.name))
+    return matches[:limit]
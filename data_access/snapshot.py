@@ -0,0 +1,98 @@
+import os
+import pathlib
+import sqlite3
+import time
+from typing import NamedTuple
+
+from sqlite3.dbapi2 import Connection
+
+
+class SnapshotInfo(NamedTuple):
+    path: str
+    bytes: int
+    schema_version: int
+    seconds: float
+
+
+def _fsync_dir(path: str) -> None:
+    # the rename is only durable once the directory entry is; not every platform can open a directory
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def export_snapshot(conn: Connection, dest_path: str) -> SnapshotInfo:
+    started = time.perf_counter()
+    # written beside the destination so the final os.replace never crosses a filesystem
+    tmp_path = f'{dest_path}.tmp-{os.getpid()}'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        # VACUUM INTO reads one consistent snapshot of the source and writes it defragmented, without blocking writers
+        conn.execute('VACUUM INTO ?', (tmp_path,))
+        copy = sqlite3.connect(tmp_path, isolation_level=None)
+        try:
+            # immutable readers never look for a -wal file, so the copy must not be left in WAL mode
+            copy.execute('PRAGMA journal_mode = DELETE')
+            result = copy.execute('PRAGMA quick_check').fetchone()[0]
+            if result != 'ok':
+                raise sqlite3.DatabaseError(f'snapshot failed its integrity check: {result}')
+            schema_version = copy.execute('PRAGMA user_version').fetchone()[0]
+        finally:
+            copy.close()
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        # readers that already have the old snapshot open keep reading it; new opens see this one
+        os.replace(tmp_path, dest_path)
+        _fsync_dir(dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return SnapshotInfo(dest_path, os.path.getsize(dest_path), schema_version, time.perf_counter() - started)
+
+
+def open_snapshot(path: str) -> Connection:
+    # immutable=1 skips locking and change detection entirely, which is only safe because snapshots are
+    # never modified in place, only replaced
+    uri = pathlib.Path(path).absolute().as_uri() + '?mode=ro&immutable=1'
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+    # map the whole file so every process reading it shares the same page cache pages
+    conn.execute(f'PRAGMA mmap_size = {os.path.getsize(path)}')
+    conn.execute('PRAGMA query_only = 1')
+    return conn
+
+
+# follows a published snapshot path across swaps; current() is one stat() when nothing has changed
+class SnapshotReader:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._identity = None
+
+    def _stat_identity(self) -> tuple:
+        st = os.stat(self.path)
+        return st.st_dev, st.st_ino, st.st_mtime_ns
+
+    def current(self) -> Connection:
+        identity = self._stat_identity()
+        if identity != self._identity:
+            conn = open_snapshot(self.path)
+            if self._conn is not None:
+                self._conn.close()
+            self._conn, self._identity = conn, identity
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self._identity = None
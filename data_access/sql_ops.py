@@ -1,19 +1,23 @@
-from typing import List, Tuple
+import time
+from contextlib import ExitStack
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Type
 
-import sqlite3
 from sqlite3 import Error
 from sqlite3.dbapi2 import Connection
 
-from functional.dispatch import insert_record
-from model.db_data import Rank, Field, GenusType, Suffix, Record
+from data_access.connections import ConnectionConfig, get_pool, open_connection, resolve_db_path
+from functional.dispatch import batch, commit, in_batch, insert_record
+from model.db_data import Rank, Field, GenusType, Suffix, Entity, Classification, Record, ColumnarRecords, \
+    RankColumns, FieldColumns, GenusTypeColumns, SuffixColumns, EntityColumns, ClassificationColumns
 
-DB_TABLE_PATH = r'data_access/taxonomy.db'
+# TAXONOMY_DB_PATH overrides the taxonomy.db next to this module
+DB_TABLE_PATH = resolve_db_path()
 
 
-def create_connection(db_file: str) -> Connection:
+def create_connection(db_file: str, config: ConnectionConfig = None) -> Connection:
     conn = None
     try:
-        conn = sqlite3.connect(db_file, isolation_level=None)
+        conn = open_connection(config or ConnectionConfig.for_path(db_file))
         return conn
     except Error as e:
         print(e)
@@ -30,31 +34,80 @@ def create_table(conn: Connection, sql: str) -> None:
         print(e)
 
 
-def _extract_all_of_type(extract_from: list or tuple, extraction_type: type) -> Tuple[list, list]:
-    extracted = [x for x in extract_from if isinstance(x, extraction_type)]
-    diff = list(set(extract_from) - set(extracted))
-    return extracted, diff
-
-
-def split_list_by_record_type(records: List[Record] or Tuple[Record]) -> Tuple[list, list, list, list]:
-    ranks, records = _extract_all_of_type(records, Rank)
-    fields, records = _extract_all_of_type(records, Field)
-    genus_types, records = _extract_all_of_type(records, GenusType)
-    suffixes, _ = _extract_all_of_type(records, Suffix)
-    return ranks, fields, genus_types, suffixes
+# insertion order follows the foreign keys: fields before the ranks that use them, and so on down to classifications
+_insert_order: Tuple[Tuple[type, Type[ColumnarRecords], str], ...] = (
+    (Field, FieldColumns, 'FIELDS'),
+    (Rank, RankColumns, 'RANKS'),
+    (GenusType, GenusTypeColumns, 'GENUS_TYPES'),
+    (Suffix, SuffixColumns, 'SUFFIXES'),
+    (Entity, EntityColumns, 'ENTITIES'),
+    (Classification, ClassificationColumns, 'CLASSIFICATIONS')
+)
+
+
+class InsertReport(NamedTuple):
+    table: str
+    count: int
+    seconds: float
+
+
+def group_by_record_type(records: Iterable[Record]) -> Dict[type, ColumnarRecords]:
+    groups = {record_type: columns_type() for (record_type, columns_type, _) in _insert_order}
+    for record in records:
+        try:
+            columns = groups[type(record)]
+        except KeyError:
+            raise TypeError(f'Cannot insert record of type {type(record).__name__}') from None
+        columns.append_record(record)
+    return groups
+
+
+def split_list_by_record_type(records: Iterable[Record]) -> Tuple[list, list, list, list]:
+    split = {Rank: [], Field: [], GenusType: [], Suffix: []}
+    for record in records:
+        group = split.get(type(record))
+        if group is not None:
+            group.append(record)
+    return split[Rank], split[Field], split[GenusType], split[Suffix]
+
+
+def insert_many(records: Iterable[Record], conn: Connection) -> List[InsertReport]:
+    groups = group_by_record_type(records)
+    reports = []
+    with ExitStack() as stack:
+        # a transaction the caller already opened (a batch, or a group-commit writer's) is joined rather than nested
+        if not in_batch(conn) and not conn.in_transaction:
+            stack.enter_context(batch(conn))
+        for record_type, _, table in _insert_order:
+            columns = groups[record_type]
+            if not len(columns):
+                continue
+            started = time.perf_counter()
+            insert_record(columns, conn)
+            reports.append(InsertReport(table, len(columns), time.perf_counter() - started))
+    return reports
 
 
 def insert(record, conn: Connection) -> None:
     insert_record(record, conn)
 
 
+# hands out a pooled, tuned connection and returns it to the pool on exit
 class AutoClosingConn:
 
-    def __enter__(self, db_name: str = DB_TABLE_PATH):
-        self.conn = create_connection(db_name)
+    def __init__(self, db_name: str = None, bulk: bool = False, **config_overrides):
+        self.pool = get_pool(ConnectionConfig.for_path(db_name, bulk=bulk, **config_overrides))
+        self.conn = None
+
+    def __enter__(self) -> Connection:
+        self.conn = self.pool.acquire()
         return self.conn
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.conn is not None:
-            self.conn.commit()
-            self.conn.close()
+            if exc_type is None:
+                commit(self.conn)
+            else:
+                self.conn.rollback()
+            self.pool.release(self.conn)
+            self.conn = None
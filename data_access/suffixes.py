@@ -0,0 +1,116 @@
+from typing import Iterable, List, NamedTuple, Tuple
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.caches import ConnectionCache
+from model.constants import sql as sql_queries
+
+# (rank_id, genus_type_id, name), the shape validate and suggest take
+SuffixQuery = Tuple[int, int, str]
+
+_NO_SUFFIX = ()
+
+
+class SuffixMismatch(NamedTuple):
+    index: int
+    rank_id: int
+    genus_type_id: int
+    name: str
+    expected: Tuple[str, ...]
+    suggestion: str
+
+
+# a few rows hold alternatives, e.g. 'ad/iti'; classification names are stored upper case, so suffixes are too
+def _alternatives(suffix: str) -> Tuple[str, ...]:
+    return tuple(alternative.strip().upper() for alternative in suffix.split('/') if alternative.strip())
+
+
+class SuffixIndex(ConnectionCache):
+
+    tables = frozenset({'SUFFIXES'})
+
+    def __init__(self, conn: Connection):
+        super().__init__(conn)
+        self._table: List[List[Tuple[str, ...]]] = []
+        self._stems: List[Tuple[str, ...]] = []
+        self._loaded = False
+
+    def _load(self) -> None:
+        rows = [(rank_id, genus_type_id, _alternatives(suffix))
+                for (rank_id, genus_type_id, suffix) in self.conn.execute(sql_queries['select']['all_suffixes'])]
+        rank_count = max((rank_id for (rank_id, _, _) in rows), default=-1) + 1
+        genus_type_count = max((genus_type_id for (_, genus_type_id, _) in rows), default=-1) + 1
+        # ids are small dense integers, so a list of lists indexed [rank_id][genus_type_id] beats hashing tuples
+        table = [[_NO_SUFFIX] * genus_type_count for _ in range(rank_count)]
+        by_genus_type = [set() for _ in range(genus_type_count)]
+        for rank_id, genus_type_id, alternatives in rows:
+            table[rank_id][genus_type_id] = alternatives
+            by_genus_type[genus_type_id].update(alternatives)
+        self._table = table
+        # longest first, so a name's stem is found by stripping the most specific suffix it carries
+        self._stems = [tuple(sorted(suffixes, key=len, reverse=True)) for suffixes in by_genus_type]
+        self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if self.committed_elsewhere():
+            self._loaded = False
+        if not self._loaded:
+            self._load()
+
+    def invalidate(self) -> None:
+        self._loaded = False
+
+    @classmethod
+    def written(cls, indexes: List['SuffixIndex'], table: str, record, conn: Connection) -> None:
+        for index in indexes:
+            index.invalidate()
+
+    def _expected(self, rank_id: int, genus_type_id: int) -> Tuple[str, ...]:
+        table = self._table
+        if 0 <= rank_id < len(table):
+            row = table[rank_id]
+            if 0 <= genus_type_id < len(row):
+                return row[genus_type_id]
+        return _NO_SUFFIX
+
+    def _suggest(self, genus_type_id: int, name: str, expected: Tuple[str, ...]) -> str:
+        stem = name
+        if 0 <= genus_type_id < len(self._stems):
+            for suffix in self._stems[genus_type_id]:
+                if name.endswith(suffix) and len(name) > len(suffix):
+                    stem = name[:-len(suffix)]
+                    break
+        return stem + expected[0]
+
+    def expected_suffixes(self, rank_id: int, genus_type_id: int) -> Tuple[str, ...]:
+        self._ensure_loaded()
+        return self._expected(rank_id, genus_type_id)
+
+    def validate(self, queries: Iterable[SuffixQuery]) -> List[SuffixMismatch]:
+        self._ensure_loaded()
+        mismatches = []
+        for index, (rank_id, genus_type_id, name) in enumerate(queries):
+            expected = self._expected(rank_id, genus_type_id)
+            if not expected:
+                continue
+            upper = name.upper()
+            if not upper.endswith(expected):
+                mismatches.append(SuffixMismatch(index, rank_id, genus_type_id, name, expected,
+                                                 self._suggest(genus_type_id, upper, expected)))
+        return mismatches
+
+    # the name each query should have: unchanged when it already carries its rank's suffix (or there is none)
+    def suggest(self, queries: Iterable[SuffixQuery]) -> List[str]:
+        self._ensure_loaded()
+        suggestions = []
+        for rank_id, genus_type_id, name in queries:
+            expected = self._expected(rank_id, genus_type_id)
+            upper = name.upper()
+            if not expected or upper.endswith(expected):
+                suggestions.append(upper)
+            else:
+                suggestions.append(self._suggest(genus_type_id, upper, expected))
+        return suggestions
+
+    def is_valid(self, rank_id: int, genus_type_id: int, name: str) -> bool:
+        return not self.validate(((rank_id, genus_type_id, name),))
@@ -0,0 +1,145 @@
+import math
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Sequence
+
+import numpy as np
+
+from sqlite3.dbapi2 import Connection
+
+from data_access.rank_classes import RankEquivalence
+from model.constants import sql as sql_queries
+
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# interned taxon ids start at 1, so 0 is an entity with nothing at that rank
+_NO_TAXON = 0
+
+# what _compare holds per pair at once: its three results, one column's two gathered codes and a few masks
+_BYTES_PER_PAIR = 40
+
+
+class PairDistances(NamedTuple):
+    # the deepest rank both entities share, or -1 when they share none
+    lca_rank_ids: np.ndarray
+    # how many ranks they share down to it
+    depths: np.ndarray
+    # ranks from one entity up to the shared one and back down to the other
+    distances: np.ndarray
+
+
+class DistanceBlock(NamedTuple):
+    # where the block starts in the entity list, so a block on the diagonal can be told apart
+    row_offset: int
+    col_offset: int
+    row_ids: np.ndarray
+    col_ids: np.ndarray
+    pairs: PairDistances
+
+
+class TaxonMatrix:
+
+    # codes[row, column] is the interned name an entity is classified under at a rank; the last row is all
+    # _NO_TAXON and stands in for every entity without classifications
+    def __init__(self, entity_ids: np.ndarray, rank_ids: np.ndarray, codes: np.ndarray, taxon_names: List[str]):
+        self.entity_ids = entity_ids
+        self.rank_ids = rank_ids
+        self.codes = codes
+        self.taxon_names = taxon_names
+        self.classified = np.count_nonzero(codes, axis=1)
+        # entity ids are dense, so a table indexed by id finds rows far faster than a search of entity_ids would
+        self._row_of = np.full(int(entity_ids.max()) + 1 if len(entity_ids) else 0, len(entity_ids), dtype=np.intp)
+        self._row_of[entity_ids] = np.arange(len(entity_ids))
+
+    # one column per class of synonymous ranks (see rank_classes), ordered by REL_INDEX, so PHYLUM and
+    # DIVISION_B fill the same column
+    @classmethod
+    def load(cls, conn: Connection, ranks: RankEquivalence = None) -> 'TaxonMatrix':
+        ranks = ranks or RankEquivalence(conn)
+        classes = ranks.classes()
+        column_of = {rel_index: column for (column, (rel_index, _, _)) in enumerate(classes)}
+        columns = {rank_id: column_of[rank_class.rel_index]
+                   for rank_class in classes for rank_id in rank_class.member_ids}
+        interned: Dict[str, int] = {}
+        entity_ids = array('q')
+        cells = array('q')
+        values = array('q')
+        last_id = None
+        for entity_id, rank_id, name in conn.execute(sql_queries['select']['all_classifications_by_entity']):
+            if entity_id != last_id:
+                entity_ids.append(entity_id)
+                last_id = entity_id
+            code = interned.get(name)
+            if code is None:
+                code = interned[name] = len(interned) + 1
+            cells.append((len(entity_ids) - 1) * len(classes) + columns[rank_id])
+            values.append(code)
+        codes = np.zeros((len(entity_ids) + 1, len(classes)), dtype=np.int32)
+        codes.reshape(-1)[np.frombuffer(cells, dtype=np.int64)] = np.frombuffer(values, dtype=np.int64)
+        # most ranks classify nothing, and a column nobody fills can't be shared
+        used = np.flatnonzero(codes.any(axis=0))
+        rank_ids = np.array([rank_class.canonical_id for rank_class in classes], dtype=np.int64)
+        # column-major, since _compare reads one rank column at a time
+        return cls(np.frombuffer(entity_ids, dtype=np.int64), rank_ids[used], np.asfortranarray(codes[:, used]),
+                   [''] + list(interned))
+
+    def rows_for(self, entity_ids: Sequence[int]) -> np.ndarray:
+        entity_ids = np.asarray(entity_ids, dtype=np.int64)
+        rows = np.full(entity_ids.shape, len(self.entity_ids), dtype=np.intp)
+        inside = (entity_ids >= 0) & (entity_ids < len(self._row_of))
+        rows[inside] = self._row_of[entity_ids[inside]]
+        return rows
+
+    # one pass per rank column, each vectorized over every pair in the chunk; there are only ever a few dozen ranks
+    def _compare(self, left_rows: np.ndarray, right_rows: np.ndarray) -> PairDistances:
+        shape = np.broadcast_shapes(left_rows.shape, right_rows.shape)
+        diverged = np.zeros(shape, dtype=bool)
+        depths = np.zeros(shape, dtype=np.int64)
+        deepest = np.full(shape, -1, dtype=np.int64)
+        for column in range(self.codes.shape[1]):
+            codes = self.codes[:, column]
+            left = codes[left_rows]
+            right = codes[right_rows]
+            classified = (left != _NO_TAXON) & (right != _NO_TAXON)
+            # a rank both are classified under but disagree on ends their shared lineage, whatever matches below it
+            diverged |= classified & (left != right)
+            shared = classified & ~diverged
+            depths += shared
+            deepest[shared] = column
+        lca_rank_ids = np.full(shape, -1, dtype=np.int64)
+        found = deepest >= 0
+        lca_rank_ids[found] = self.rank_ids[deepest[found]]
+        distances = self.classified[left_rows] + self.classified[right_rows] - 2 * depths
+        return PairDistances(lca_rank_ids, depths, distances)
+
+    def _pairs_per_chunk(self, memory_budget: int) -> int:
+        return max(1, memory_budget // _BYTES_PER_PAIR)
+
+    def pairs(self, left_ids: Sequence[int], right_ids: Sequence[int],
+              memory_budget: int = DEFAULT_MEMORY_BUDGET) -> PairDistances:
+        left_rows = self.rows_for(left_ids)
+        right_rows = self.rows_for(right_ids)
+        if len(left_rows) != len(right_rows):
+            raise ValueError(f'Expected as many right entities as left ones, received {len(right_rows)} '
+                             f'for {len(left_rows)}')
+        size = self._pairs_per_chunk(memory_budget)
+        chunks = [self._compare(left_rows[start:start + size], right_rows[start:start + size])
+                  for start in range(0, len(left_rows), size)]
+        if not chunks:
+            empty = np.zeros(0, dtype=np.int64)
+            return PairDistances(empty, empty, empty)
+        return PairDistances(*(np.concatenate(parts) for parts in zip(*chunks)))
+
+    # every entity against every other in square blocks sized to the budget; only blocks on or above the
+    # diagonal are yielded, since the distances are symmetric
+    def iter_all_pairs(self, entity_ids: Sequence[int] = None,
+                       memory_budget: int = DEFAULT_MEMORY_BUDGET) -> Iterator[DistanceBlock]:
+        entity_ids = self.entity_ids if entity_ids is None else np.asarray(entity_ids, dtype=np.int64)
+        rows = self.rows_for(entity_ids)
+        side = max(1, math.isqrt(self._pairs_per_chunk(memory_budget)))
+        for row_start in range(0, len(rows), side):
+            row_block = rows[row_start:row_start + side]
+            for col_start in range(row_start, len(rows), side):
+                col_block = rows[col_start:col_start + side]
+                yield DistanceBlock(row_start, col_start, entity_ids[row_start:row_start + side],
+                                    entity_ids[col_start:col_start + side],
+                                    self._compare(row_block[:, None], col_block[None, :]))
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from data_access.connections import ConnectionConfig, open_connection
+from data_access.snapshot import export_snapshot
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description='A tool for publishing a read-only, immutable copy of taxonomy.db for read-heavy services'
+    )
+    argparser.add_argument(
+        'output', type=str, metavar='OUTPUT',
+        help='Where to publish the snapshot; an existing snapshot there is swapped out atomically'
+    )
+    argparser.add_argument(
+        '-d', '--db', type=str, dest='db_file', metavar='DB',
+        help='The database file to snapshot (defaults to $TAXONOMY_DB_PATH or data_access/taxonomy.db)'
+    )
+    return argparser.parse_args()
+
+
+def main(args):
+    conn = open_connection(ConnectionConfig.for_path(args.db_file))
+    try:
+        info = export_snapshot(conn, args.output)
+    finally:
+        conn.close()
+    print(f'{info.path}: {info.bytes} bytes, schema version {info.schema_version}, {info.seconds * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    argv = parse_args()
+    main(argv)
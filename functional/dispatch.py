@@ -1,9 +1,127 @@
 import functools
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from sqlite3.dbapi2 import Connection
 
 from model.constants import sql as sql_dict
-from model.db_data import Rank, Field, GenusType, Suffix, Ranks, Fields, GenusTypes, Suffixes
+from model.db_data import Rank, Field, GenusType, Suffix, Entity, Classification, Ranks, Fields, GenusTypes, \
+    Suffixes, Entities, Classifications, Record, Records, RecordNT, RankColumns, FieldColumns, GenusTypeColumns, \
+    SuffixColumns, EntityColumns, ClassificationColumns
+
+# stays below SQLITE_MAX_VARIABLE_NUMBER on every sqlite3 build
+MAX_PARAMS = 900
+
+WriteListener = Callable[[str, Union[Record, Records], Connection], None]
+CommitListener = Callable[[Connection], None]
+
+_write_listeners: List[WriteListener] = []
+_commit_listeners: List[CommitListener] = []
+
+
+# listeners are called with the written table's name, the record(s) written to it and the connection used, before the
+# write commits (inside a batch or not), so whatever they write commits along with it
+def on_write(listener: WriteListener) -> WriteListener:
+    _write_listeners.append(listener)
+    return listener
+
+
+# listeners run inside the transaction just before it commits, so whatever they write commits along with it
+def before_commit(listener: CommitListener) -> CommitListener:
+    _commit_listeners.append(listener)
+    return listener
+
+
+def commit(conn: Connection) -> None:
+    if conn.in_transaction:
+        for listener in _commit_listeners:
+            listener(conn)
+    conn.commit()
+
+
+def written_namedtuples(record: Union[Record, Records]) -> Iterator[RecordNT]:
+    if isinstance(record, Records):
+        return record.iter_namedtuples()
+    return iter((record.to_namedtuple(),))
+
+
+# keyed by id(conn), since sqlite3 connections can't be weakly referenced
+_open_batches: Dict[int, 'Batch'] = {}
+
+
+# an autocommit connection (isolation_level=None) is either already durable or inside a transaction its caller
+# opened with BEGIN, so only connections using sqlite3's implicit transactions outside a batch are committed here
+def _commit(conn: Connection) -> None:
+    if conn.isolation_level is not None and id(conn) not in _open_batches:
+        commit(conn)
+
+
+class Batch:
+
+    def __init__(self, conn: Connection, max_records: int = None, max_seconds: float = None):
+        self.conn = conn
+        self.max_records = max_records
+        self.max_seconds = max_seconds
+        self.pending = 0
+        self.total = 0
+        self.flushes = 0
+        self._started = None
+
+    def begin(self) -> None:
+        self.conn.execute('BEGIN')
+        self.pending = 0
+        self._started = time.monotonic()
+
+    def add(self, record) -> None:
+        insert_record(record, self.conn)
+        self.pending += 1
+        self.total += 1
+        if self.max_records is not None and self.pending >= self.max_records:
+            self.flush()
+        elif self.max_seconds is not None and time.monotonic() - self._started >= self.max_seconds:
+            self.flush()
+
+    def add_all(self, records: Iterable) -> None:
+        for record in records:
+            self.add(record)
+
+    def flush(self) -> None:
+        commit(self.conn)
+        self.flushes += 1
+        self.begin()
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+
+
+def in_batch(conn: Connection) -> bool:
+    return id(conn) in _open_batches
+
+
+# everything added since the last flush is committed on exit, or rolled back together if the block raises
+@contextmanager
+def batch(conn: Connection, max_records: int = None, max_seconds: float = None) -> Iterator[Batch]:
+    if id(conn) in _open_batches:
+        raise RuntimeError('a batch is already open on this connection')
+    unit = Batch(conn, max_records=max_records, max_seconds=max_seconds)
+    unit.begin()
+    _open_batches[id(conn)] = unit
+    try:
+        yield unit
+    except BaseException:
+        unit.rollback()
+        raise
+    else:
+        commit(conn)
+        unit.flushes += 1
+    finally:
+        del _open_batches[id(conn)]
+
+
+def notify_write(table: str, record: Union[Record, Records], conn: Connection) -> None:
+    for listener in _write_listeners:
+        listener(table, record, conn)
 
 
 @functools.singledispatch
@@ -18,53 +136,118 @@ def _(record: Rank, conn: Connection) -> None:
         cur.execute(sql_dict['insert']['rank'][1], record.to_namedtuple())
     else:
         cur.execute(sql_dict['insert']['rank'][0], record.to_namedtuple())
-    conn.commit()
+    notify_write('RANKS', record, conn)
+    _commit(conn)
 
 
 @insert_record.register(Field)
 def _(record: Field, conn: Connection) -> None:
     cur = conn.cursor()
     cur.execute(sql_dict['insert']['field'], record.to_namedtuple())
-    conn.commit()
+    notify_write('FIELDS', record, conn)
+    _commit(conn)
 
 
 @insert_record.register(GenusType)
 def _(record: GenusType, conn: Connection) -> None:
     cur = conn.cursor()
     cur.execute(sql_dict['insert']['genus_type'], record.to_namedtuple())
-    conn.commit()
+    notify_write('GENUS_TYPES', record, conn)
+    _commit(conn)
 
 
 @insert_record.register(Suffix)
 def _(record: Suffix, conn: Connection) -> None:
     cur = conn.cursor()
     cur.execute(sql_dict['insert']['suffix'], record.to_namedtuple())
-    conn.commit()
+    notify_write('SUFFIXES', record, conn)
+    _commit(conn)
 
 
 @insert_record.register(Ranks)
-def _(record: Ranks, conn: Connection) -> None:
+@insert_record.register(RankColumns)
+def _(record: Union[Ranks, RankColumns], conn: Connection) -> None:
     cur = conn.cursor()
-    cur.executemany(sql_dict['insert']['rank'][0], record.to_namedtuple_collection())
-    conn.commit()
+    # ranks without a field have no FIELD_ID parameter, so each kind goes through its own statement
+    cur.executemany(sql_dict['insert']['rank'][0], (params[:4] for params in record.iter_params()
+                                                    if len(params) == 4 or params[4] is None))
+    cur.executemany(sql_dict['insert']['rank'][1], (params for params in record.iter_params()
+                                                    if len(params) == 5 and params[4] is not None))
+    notify_write('RANKS', record, conn)
+    _commit(conn)
 
 
 @insert_record.register(Fields)
-def _(record: Fields, conn: Connection) -> None:
+@insert_record.register(FieldColumns)
+def _(record: Union[Fields, FieldColumns], conn: Connection) -> None:
     cur = conn.cursor()
-    cur.executemany(sql_dict['insert']['field'], record.to_namedtuple_collection())
-    conn.commit()
+    cur.executemany(sql_dict['insert']['field'], record.iter_params())
+    notify_write('FIELDS', record, conn)
+    _commit(conn)
 
 
 @insert_record.register(GenusTypes)
-def _(record: GenusTypes, conn: Connection) -> None:
+@insert_record.register(GenusTypeColumns)
+def _(record: Union[GenusTypes, GenusTypeColumns], conn: Connection) -> None:
     cur = conn.cursor()
-    cur.executemany(sql_dict['insert']['genus_type'], record.to_namedtuple_collection())
-    conn.commit()
+    cur.executemany(sql_dict['insert']['genus_type'], record.iter_params())
+    notify_write('GENUS_TYPES', record, conn)
+    _commit(conn)
 
 
 @insert_record.register(Suffixes)
-def _(record: Suffixes, conn: Connection) -> None:
+@insert_record.register(SuffixColumns)
+def _(record: Union[Suffixes, SuffixColumns], conn: Connection) -> None:
     cur = conn.cursor()
-    cur.executemany(sql_dict['insert']['suffix'], record.to_namedtuple_collection())
-    conn.commit()
+    cur.executemany(sql_dict['insert']['suffix'], record.iter_params())
+    notify_write('SUFFIXES', record, conn)
+    _commit(conn)
+
+
+# (name, cons_status_id, pop_est or None) -> name: id, one statement per MAX_PARAMS // 3 entities rather than per entity
+def upsert_entities(conn: Connection, rows: Sequence[Tuple[str, int, Optional[int]]]) -> Dict[str, int]:
+    entity_ids = {}
+    cur = conn.cursor()
+    per_statement = MAX_PARAMS // 3
+    for start in range(0, len(rows), per_statement):
+        chunk = rows[start:start + per_statement]
+        query = sql_dict['insert']['entities_returning'].format(', '.join(['(?, ?, ?)'] * len(chunk)))
+        entity_ids.update((name, entity_id) for (entity_id, name) in
+                          cur.execute(query, [value for row in chunk for value in row]))
+    # an upsert with nothing to change returns no row, so only those names are read back
+    unchanged = [row[0] for row in rows if row[0] not in entity_ids]
+    for start in range(0, len(unchanged), MAX_PARAMS):
+        chunk = unchanged[start:start + MAX_PARAMS]
+        query = sql_dict['select']['entity_ids_by_names'].format(', '.join('?' * len(chunk)))
+        entity_ids.update((name, entity_id) for (entity_id, name) in cur.execute(query, chunk))
+    return entity_ids
+
+
+@insert_record.register(Entities)
+@insert_record.register(EntityColumns)
+def _(record: Union[Entities, EntityColumns], conn: Connection) -> Dict[str, int]:
+    # weak entities' namedtuples have no POP_EST to pass
+    entity_ids = upsert_entities(conn, [params + (None,) * (3 - len(params)) for params in record.iter_params()])
+    notify_write('ENTITIES', record, conn)
+    _commit(conn)
+    return entity_ids
+
+
+@insert_record.register(Classifications)
+@insert_record.register(ClassificationColumns)
+def _(record: Union[Classifications, ClassificationColumns], conn: Connection) -> None:
+    cur = conn.cursor()
+    cur.executemany(sql_dict['insert']['classification'], record.iter_params())
+    notify_write('CLASSIFICATIONS', record, conn)
+    _commit(conn)
+
+
+# a lone entity or classification goes through its table's bulk path, which is where the upsert and lineage live
+@insert_record.register(Entity)
+def _(record: Entity, conn: Connection) -> Dict[str, int]:
+    return insert_record(Entities(record), conn)
+
+
+@insert_record.register(Classification)
+def _(record: Classification, conn: Connection) -> None:
+    insert_record(Classifications(record), conn)
@@ -0,0 +1,92 @@
+import csv
+import json
+from collections import namedtuple
+from typing import AnyStr, Iterable, Iterator, List, TextIO, Tuple
+
+EntityRow = namedtuple('EntityRow', ['line_no', 'name', 'pop_est', 'cons_cd', 'taxonomy'])
+
+_csv_entity_columns = {'name', 'pop_est', 'cons_cd'}
+
+
+def infer_format(path: str) -> str:
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def parse_taxonomy_pairs(pairs: Iterable[str]) -> Tuple[Tuple[str, str], ...]:
+    parsed = []
+    for _p in pairs:
+        label, _, classification = _p.upper().partition('=')
+        if not classification:
+            raise ValueError(f'Expected RANK=VALUE, received "{_p}"')
+        parsed.append((label, classification))
+    return tuple(parsed)
+
+
+def _optional_int(value) -> int or None:
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def _ndjson_row(line_no: int, line: str) -> EntityRow:
+    try:
+        obj = json.loads(line.rstrip())
+    except json.JSONDecodeError as e:
+        # the decoder only ever sees this one line, so its own line number is always 1
+        raise ValueError(f'{e.msg} at column {e.colno}') from None
+    if not isinstance(obj, dict):
+        raise ValueError(f'expected a JSON object, received {type(obj).__name__}')
+    name = obj.get('name')
+    if not isinstance(name, str) or not name:
+        raise ValueError('expected a non-empty "name" string')
+    taxonomy = obj.get('taxonomy') or []
+    # a null rank is left out, like an empty cell in a CSV dump
+    if isinstance(taxonomy, dict):
+        taxonomy = [f'{k}={v}' for (k, v) in taxonomy.items() if v is not None and v != '']
+    elif not isinstance(taxonomy, list) or not all(isinstance(pair, str) for pair in taxonomy):
+        raise ValueError('expected "taxonomy" to be an object or a list of RANK=VALUE strings')
+    return EntityRow(line_no=line_no, name=name, pop_est=_optional_int(obj.get('pop_est')),
+                     cons_cd=obj.get('cons_cd'), taxonomy=parse_taxonomy_pairs(taxonomy))
+
+
+def _iter_ndjson(stream: TextIO, start: int) -> Iterator[EntityRow]:
+    for line_no, line in enumerate(stream, start=start):
+        if not line.strip():
+            continue
+        try:
+            row = _ndjson_row(line_no, line)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'line {line_no}: {e}') from e
+        yield row
+
+
+def _iter_csv(stream: TextIO, start: int) -> Iterator[EntityRow]:
+    reader = csv.DictReader(stream)
+    rank_columns = [c for c in reader.fieldnames or () if c not in _csv_entity_columns]
+    for row in reader:
+        taxonomy = tuple((c.upper(), row[c].upper()) for c in rank_columns if row[c])
+        yield EntityRow(line_no=reader.line_num + start - 1, name=row['name'], pop_est=_optional_int(row.get('pop_est')),
+                        cons_cd=row.get('cons_cd') or None, taxonomy=taxonomy)
+
+
+# groups a dump's lines (text or bytes) into runs of at least `size`; a quoted CSV field can span lines, so a run only
+# ends where every quote is closed
+def iter_line_groups(lines: Iterable[AnyStr], size: int, fmt: str) -> Iterator[List[AnyStr]]:
+    group = []
+    in_quotes = False
+    for line in lines:
+        group.append(line)
+        if fmt == 'csv' and line.count('"' if isinstance(line, str) else b'"') % 2:
+            in_quotes = not in_quotes
+        if len(group) >= size and not in_quotes:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+# start is the line number of the stream's first line, for streams that are a slice of a larger file
+def iter_entity_rows(stream: TextIO, fmt: str, start: int = 1) -> Iterator[EntityRow]:
+    if fmt == 'csv':
+        return _iter_csv(stream, start)
+    return _iter_ndjson(stream, start)
@@ -1,70 +1,91 @@
-import copy
-
-
-_attr_sets_dict = {
-    'RANK': {'value', 'label', 'is_main', 'rel_index', 'field_id'},
-    'WEAKRANK': {'value', 'label', 'is_main', 'rel_index'},
-    'FIELD': {'value'},
-    'GENUSTYPE': {'value'},
-    'SUFFIX': {'value', 'rank_id', 'genus_type_id'},
-    'ENTITY': {}
-}
-
-
-class ArgSet:
-
-    def __init__(self, **kwargs):
-        args_to_pass = copy.deepcopy(kwargs)
-        args_to_pass.pop('type')
-        self.type, self.attrs = _filter_argset(kwargs['type'], filter_nones=True, **args_to_pass)
-
-
-def _delegate_rank_arg(record_type: str, **kwargs):
-    if record_type.upper() != 'RANK' or 'field_id' in kwargs:
-        return record_type.upper()
-    else:
-        return 'WEAKRANK'
-
-
-def _filter_argset(record_type: str, filter_nones: bool = None, **kwargs):
-    if filter_nones:
-        kwargs = {k: v for (k, v) in kwargs.items() if k is not None and v is not None}
-
-    filter_on = _attr_sets_dict[_delegate_rank_arg(record_type, **kwargs)]
-    filtered_keys = set(kwargs) & filter_on
-    type_to_pass = record_type if record_type != 'WEAKRANK' else 'RANK'
-    new_dict = {
-        'value': kwargs['value']
-    }
-
-    for _key in filtered_keys:
-        new_dict[_key] = kwargs[_key]
-
-    return type_to_pass, new_dict
-
-
-def filter_args(filter_nones: bool = None, **kwargs):
-    if filter_nones:
-        kwargs = {k: v for (k, v) in kwargs.items() if k is not None and v is not None}
-
-    filter_on = _attr_sets_dict[kwargs['type']]
-    filtered_keys = set(kwargs) & filter_on
-    new_dict = {
-        'type': kwargs['type'],
-        'value': kwargs['value']
-    }
-    for _key in filtered_keys:
-        new_dict[_key] = kwargs[_key]
-    return new_dict
-
-
-def validate_args(**kwargs):
-    # 'type' arg exists
-    assert 'type' in kwargs, f'No "type" in arguments={kwargs}'
-
-    args = filter_args(filter_nones=True, **kwargs)
-    # required args for appropriate 'type' are present
-    assert set(args.keys()) >= _attr_sets_dict[args['type']], \
-        f'Expected args={_attr_sets_dict[args["type"]]}, Received args={set(args.keys())}'
-    # there are no values that are None
-    assert not [x for x in args.values() if x is None]
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Sequence, Tuple
+
+# int parameters accept bools nowhere, even though bool is an int subclass
+_STRICT_INT = object()
+
+
+class ValidationError(ValueError):
+
+    def __init__(self, record_type: str, problems: Sequence[str], index: int = None):
+        self.record_type = record_type
+        self.problems = list(problems)
+        self.index = index
+        prefix = f'record {index}: ' if index is not None else ''
+        super().__init__(f'{prefix}invalid {record_type}: {"; ".join(self.problems)}')
+
+    # rebuilt from its own arguments, not the message, when it crosses a process boundary
+    def __reduce__(self):
+        return type(self), (self.record_type, self.problems, self.index)
+
+
+def _type_problem(key: str, value: Any, expected) -> str or None:
+    if expected is _STRICT_INT:
+        if isinstance(value, bool) or not isinstance(value, int):
+            return f'{key} must be an int, not {type(value).__name__}'
+    elif not isinstance(value, expected):
+        return f'{key} must be a {expected.__name__}, not {type(value).__name__}'
+    return None
+
+
+# everything a kwargs dict is checked against is worked out once, here, rather than on every record
+class RecordValidator:
+
+    __slots__ = ('record_type', 'constructor', '_keys', '_required', '_types')
+
+    def __init__(self, record_type: str, constructor: Callable[..., Any], required: Mapping[str, type],
+                 optional: Mapping[str, type] = None, aliases: Mapping[str, str] = None):
+        self.record_type = record_type
+        self.constructor = constructor
+        types = dict(required, **(optional or {}))
+        self._types: Tuple[Tuple[str, Any], ...] = tuple((k, _STRICT_INT if t is int else t)
+                                                         for (k, t) in types.items())
+        # (key read from the kwargs, constructor parameter it fills)
+        self._keys: Tuple[Tuple[str, str], ...] = tuple((k, k) for k in types) + \
+            tuple((alias, k) for (alias, k) in (aliases or {}).items())
+        self._required = frozenset(required)
+
+    def _params(self, kwargs: Mapping[str, Any]) -> Dict[str, Any]:
+        params = {}
+        for key, param in self._keys:
+            value = kwargs.get(key)
+            # None means "not given", as it does for every optional argparse flag
+            if value is not None and param not in params:
+                params[param] = value
+        return params
+
+    def problems(self, kwargs: Mapping[str, Any]) -> List[str]:
+        params = self._params(kwargs)
+        problems = [f'missing {k}' for k in sorted(self._required.difference(params))]
+        for key, expected in self._types:
+            if key in params:
+                problem = _type_problem(key, params[key], expected)
+                if problem is not None:
+                    problems.append(problem)
+        return problems
+
+    def build(self, kwargs: Mapping[str, Any], index: int = None):
+        params = self._params(kwargs)
+        if not self._required.issubset(params) or any(_type_problem(k, params[k], t) for (k, t) in self._types
+                                                      if k in params):
+            raise ValidationError(self.record_type, self.problems(kwargs), index)
+        return self.constructor(**params)
+
+
+def validator_for(validators: Mapping[str, RecordValidator], record_type: Any, index: int = None) -> RecordValidator:
+    validator = validators.get(record_type.upper() if isinstance(record_type, str) else record_type)
+    if validator is None:
+        raise ValidationError(str(record_type), [f'type must be one of {sorted(validators)}'], index)
+    return validator
+
+
+# every candidate is checked, so one pass reports all the bad records instead of stopping at the first
+def validate_all(validators: Mapping[str, RecordValidator],
+                 candidates: Iterable[Mapping[str, Any]]) -> Tuple[List[Any], List[ValidationError]]:
+    built = []
+    errors = []
+    for index, kwargs in enumerate(candidates):
+        try:
+            built.append(validator_for(validators, kwargs.get('type'), index).build(kwargs, index))
+        except ValidationError as e:
+            errors.append(e)
+    return built, errors
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import argparse
+import signal
+
+from data_access.group_commit import DEFAULT_MAX_BATCH, DEFAULT_MAX_DELAY, GroupCommitWriter
+from data_access.ingest_server import IngestServer
+from data_access.sql_ops import DB_TABLE_PATH
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description='A long-running server that keeps taxonomy.db open and group-commits records sent to a socket'
+    )
+    argparser.add_argument(
+        'socket', type=str, metavar='SOCKET', help='The path of the Unix socket to listen on'
+    )
+    argparser.add_argument(
+        '-d', '--db', type=str, dest='db_file', default=DB_TABLE_PATH, metavar='DB',
+        help='The database file to write to'
+    )
+    argparser.add_argument(
+        '--max-batch', type=int, dest='max_batch', default=DEFAULT_MAX_BATCH, metavar='SIZE',
+        help='The most records committed in one transaction'
+    )
+    argparser.add_argument(
+        '--max-delay', type=float, dest='max_delay', default=DEFAULT_MAX_DELAY, metavar='SECONDS',
+        help='How long to wait for more records before committing a group'
+    )
+    return argparser.parse_args()
+
+
+def main(args):
+    # shut down cleanly (draining the writer and removing the socket) on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    writer = GroupCommitWriter(args.db_file, max_batch=args.max_batch, max_delay=args.max_delay)
+    with IngestServer(args.socket, writer) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    writer.close()
+
+
+if __name__ == '__main__':
+    argv = parse_args()
+    main(argv)
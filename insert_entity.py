@@ -1,18 +1,32 @@
 #!/usr/bin/env python3
 
+import sys
+
+import startup_profile
+
+# must run before anything else is imported for the breakdown to be complete
+startup_profile.enable_if_requested()
+
 import argparse
 
 from sqlite3.dbapi2 import Connection
 
+from args import profile_requested
+from data_access.bulk_ops import DEFAULT_BATCH_SIZE, insert_entities, resolve_entity_rows, sync_entities
+from data_access.ranks import RankResolver
+from data_access.ref_cache import ReferenceCache, default_sidecar_path
 from data_access.sql_ops import AutoClosingConn
+from functional.dispatch import batch, insert_record
+from functional.entity_input import infer_format, iter_entity_rows, parse_taxonomy_pairs
 from model.constants import sql as sql_queries
-from model.db_data import Entity, Classification
+from model.db_data import Classification, Classifications, Entities, Entity
 
 
 def parse_args():
     argparser = argparse.ArgumentParser(description='A tool for inserting taxonomy information on an entity to a db')
     argparser.add_argument(
-        'name', type=str, metavar='NAME', help='The entity\'s common name (if any, otherwise its genus-species name)'
+        'name', type=str, metavar='NAME', nargs='?',
+        help='The entity\'s common name (if any, otherwise its genus-species name)'
     )
     argparser.add_argument(
         '-p', '--pop', type=int, dest='pop_est', metavar='POPEST', help='The estimated population of this entity'
@@ -25,7 +39,59 @@ def parse_args():
         '-t', '--taxonomy', type=str.upper, nargs='+', dest='taxonomy', metavar='TAXONOMY',
         help='The entity\'s taxonomy, with each rank and that rank\'s value joined by an equals (=) sign'
     )
-    return argparser.parse_args()
+    argparser.add_argument(
+        '--from-file', type=str, dest='from_file', metavar='PATH',
+        help='Bulk-load entities from an NDJSON or CSV file instead of the command line ("-" reads stdin)'
+    )
+    argparser.add_argument(
+        '--format', type=str.lower, dest='input_format', choices=['ndjson', 'csv'],
+        help='The format of --from-file (inferred from its extension when omitted)'
+    )
+    argparser.add_argument(
+        '--batch-size', type=int, dest='batch_size', default=DEFAULT_BATCH_SIZE, metavar='SIZE',
+        help='The number of entities written per transaction in bulk mode'
+    )
+    argparser.add_argument(
+        '-w', '--workers', type=int, dest='workers', default=1, metavar='COUNT',
+        help='Parses and validates --from-file in COUNT worker processes while this one writes (0 uses every core)'
+    )
+    argparser.add_argument(
+        '--resume', dest='resume', action='store_true',
+        help='Checkpoints --from-file after every committed batch, and continues after the last checkpoint when an '
+             'earlier run on the same file stopped early'
+    )
+    argparser.add_argument(
+        '--restart', dest='restart', action='store_true',
+        help='Like --resume, but discards any checkpoint and loads the file from the beginning'
+    )
+    argparser.add_argument(
+        '--sync', dest='sync', action='store_true',
+        help='Compares --from-file against the stored entities and only writes those that changed, '
+             'then prints how many were inserted, updated and unchanged'
+    )
+    argparser.add_argument(
+        '--profile', dest='profile', action='store_true',
+        help='Prints per-statement SQL counts, latencies and rows, and commit time, to stderr on exit'
+    )
+    argparser.add_argument(
+        '--profile-json', type=str, dest='profile_json', metavar='PATH',
+        help='Writes the --profile report to PATH as JSON instead'
+    )
+    argparser.add_argument(
+        startup_profile.FLAG, dest='startup_profile', action='store_true',
+        help='Prints a per-module import time breakdown to stderr on exit'
+    )
+    args = argparser.parse_args()
+    if args.name is None and args.from_file is None:
+        argparser.error('either NAME or --from-file is required')
+    if args.from_file is None and args.cons_cd is None:
+        argparser.error('NAME needs a conservation status code (-c)')
+    if args.resume or args.restart:
+        if args.from_file in (None, '-'):
+            argparser.error('--resume and --restart need a --from-file path to checkpoint')
+        if args.workers != 1:
+            argparser.error('--resume and --restart read the file in this process, so they can\'t use --workers')
+    return args
 
 
 def get_cons_status_codes(conn: Connection) -> dict:
@@ -36,43 +102,82 @@ def get_cons_status_codes(conn: Connection) -> dict:
     return status_codes
 
 
-def get_entity_id(conn: Connection, name: str) -> int:
-    cur = conn.cursor()
-    cur.execute(sql_queries['select']['entity_id_by_name'], (name,))
-    return cur.fetchone()
-
-
-def get_rank_id(conn: Connection, rank: str):
-    cur = conn.cursor()
-    cur.execute(sql_queries['select']['rank_id_by_label'], (rank.lower(),))
-    return cur.fetchone()
+def resumable_main(args):
+    from data_access.import_jobs import ImportJobError, run_import_job
+
+    fmt = args.input_format or infer_format(args.from_file)
+    with AutoClosingConn(bulk=True) as conn:
+        refs = ReferenceCache(conn, default_sidecar_path(conn))
+        try:
+            report = run_import_job(conn, args.from_file, fmt, RankResolver(rank_ids=refs.rank_ids), refs.cons_codes,
+                                    batch_size=args.batch_size, sync=args.sync, restart=args.restart)
+        except (ImportJobError, ValueError) as e:
+            sys.exit(str(e))
+    if report.resumed_at_line is not None:
+        print(f'resumed {report.source} at line {report.resumed_at_line}')
+    if report.counts is not None:
+        counts = report.counts
+        print(f'inserted {counts.inserted}, updated {counts.updated}, unchanged {counts.unchanged}')
+
+
+def bulk_main(args):
+    fmt = args.input_format or infer_format(args.from_file)
+    stream = sys.stdin if args.from_file == '-' else open(args.from_file, newline='')
+    try:
+        with AutoClosingConn(bulk=True) as conn:
+            refs = ReferenceCache(conn, default_sidecar_path(conn))
+            if args.workers == 1:
+                rows = iter_entity_rows(stream, fmt)
+                entities = resolve_entity_rows(rows, RankResolver(rank_ids=refs.rank_ids), refs.cons_codes)
+            else:
+                from data_access.pipeline import iter_resolved_parallel
+
+                entities = iter_resolved_parallel(stream, fmt, refs.rank_ids, refs.cons_codes,
+                                                  workers=args.workers or None)
+            try:
+                if args.sync:
+                    counts = sync_entities(conn, entities, batch_size=args.batch_size)
+                    print(f'inserted {counts.inserted}, updated {counts.updated}, unchanged {counts.unchanged}')
+                else:
+                    insert_entities(conn, entities, batch_size=args.batch_size)
+            # an unknown rank label or conservation code, or a malformed line; UnknownRankError is a ValueError
+            except ValueError as e:
+                sys.exit(str(e))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
 
 
 def main(args):
     with AutoClosingConn() as conn:
-        cons_codes = get_cons_status_codes(conn)
-        entity_cur = conn.cursor()
-        if args.pop_est is not None:
-            pop_est = args.pop_est
-            entity_type = 'entity'
-        else:
-            pop_est = None
-            entity_type = 'weak_entity'
-        entity_to_insert = Entity.build_namedtuple(name=args.name,
-                                                   cons_status_id=cons_codes[args.cons_cd],
-                                                   pop_est=pop_est)
-        entity_cur.execute(sql_queries['insert'][entity_type], entity_to_insert)
-
-        entity_id = entity_cur.lastrowid
-
-        pairs_list = []
-        for _p in args.taxonomy:
-            label, classification = _p.split('=')
-            rank_id = get_rank_id(conn, label.lower())
-            pairs_list.append(Classification.build_namedtuple(entity_id=entity_id, rank_id=rank_id[0], name=label))
-        entity_cur.executemany(sql_queries['insert']['classification'], pairs_list)
+        refs = ReferenceCache(conn, default_sidecar_path(conn))
+        cons_codes = refs.cons_codes
+        # check the code and resolve every rank up front so bad input fails before anything is written
+        try:
+            if args.cons_cd not in cons_codes:
+                raise ValueError(f'unknown conservation code "{args.cons_cd}"')
+            taxonomy = parse_taxonomy_pairs(args.taxonomy or ())
+            rank_ids = RankResolver(rank_ids=refs.rank_ids).resolve([label for (label, _) in taxonomy])
+        except ValueError as e:
+            sys.exit(str(e))
+        entity = Entity(args.name, cons_codes[args.cons_cd], args.pop_est)
+        # the entity, its classifications and its lineage commit together or not at all
+        with batch(conn):
+            # the upsert returns the id whether it inserted, updated or (via a select) left the row alone
+            entity_id = insert_record(Entities(entity), conn)[args.name]
+            classifications = Classifications(*(Classification(entity_id, rank_id, classification)
+                                                for (rank_id, (_, classification)) in zip(rank_ids, taxonomy)))
+            insert_record(classifications, conn)
 
 
 if __name__ == '__main__':
     argv = parse_args()
-    main(argv)
+    if profile_requested(argv):
+        from data_access import profiling
+        profiling.enable(argv.profile_json)
+    if argv.resume or argv.restart:
+        resumable_main(argv)
+    elif argv.from_file is not None:
+        bulk_main(argv)
+    else:
+        main(argv)
@@ -1,18 +1,49 @@
 #!/usr/bin/env python3
 
+import sys
+
+import startup_profile
+
+# must run before anything else is imported for the breakdown to be complete
+startup_profile.enable_if_requested()
+
 from argparse import Namespace
 
-from args import parse_args
-from data_access.sql_ops import AutoClosingConn, insert_record
-from model.db_data import construct_record
+from args import parse_args, profile_requested
+
+
+# options that only mean something to this process, not to the server the record is sent to
+_LOCAL_ONLY_ARGS = ('socket', 'startup_profile', 'profile', 'profile_json')
+
+
+def send(cli_args: Namespace):
+    from data_access.ingest_client import send_records
+
+    payload = {k: v for (k, v) in vars(cli_args).items() if k not in _LOCAL_ONLY_ARGS}
+    response, = send_records(cli_args.socket, [payload])
+    if not response['ok']:
+        sys.exit(response['error'])
 
 
 def main(cli_args: Namespace):
-    with AutoClosingConn() as conn:
+    from data_access.sql_ops import AutoClosingConn, insert_record
+    from functional.validation import ValidationError
+    from model.db_data import construct_record
+
+    try:
         record = construct_record(**vars(cli_args))
+    except ValidationError as e:
+        sys.exit(str(e))
+    if profile_requested(cli_args):
+        from data_access import profiling
+        profiling.enable(cli_args.profile_json)
+    with AutoClosingConn() as conn:
         insert_record(record, conn)
 
 
 if __name__ == '__main__':
     argv = parse_args()
-    main(argv)
+    if argv.socket is not None:
+        send(argv)
+    else:
+        main(argv)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import argparse
+
+from data_access.connections import ConnectionConfig, open_connection
+from data_access.migrations import LATEST_VERSION, current_version, migrate
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(description='A tool for bringing taxonomy.db up to the current schema')
+    argparser.add_argument(
+        '-d', '--db', type=str, dest='db_file', metavar='DB',
+        help='The database file to migrate (defaults to $TAXONOMY_DB_PATH or data_access/taxonomy.db)'
+    )
+    argparser.add_argument(
+        '-t', '--target', type=int, dest='target', default=LATEST_VERSION, metavar='VERSION',
+        help='The schema version to migrate to'
+    )
+    return argparser.parse_args()
+
+
+def main(args):
+    conn = open_connection(ConnectionConfig.for_path(args.db_file, migrate=False))
+    try:
+        before = current_version(conn)
+        after = migrate(conn, target=args.target)
+        print(f'schema version {before} -> {after}')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    argv = parse_args()
+    main(argv)
@@ -1,9 +1,12 @@
-from box import Box
+from types import MappingProxyType
+from typing import Mapping
 
+# bumped with every migration added to data_access.migrations
+SCHEMA_VERSION = 4
 
-_create_table_ranks = ''' CREATE TABLE IF NOT EXISTS TAX_RANKS (
+_create_table_ranks = ''' CREATE TABLE IF NOT EXISTS RANKS (
                             ID INTEGER PRIMARY KEY,
-                            NAME TEXT NOT NULL,
+                            NAME TEXT UNIQUE NOT NULL,
                             LABEL TEXT NOT NULL,
                             IS_MAIN INTEGER NOT NULL,
                             REL_INDEX INTEGER NOT NULL,
@@ -14,12 +17,12 @@ _create_table_ranks = ''' CREATE TABLE IF NOT EXISTS TAX_RANKS (
 
 _create_table_fields = ''' CREATE TABLE IF NOT EXISTS FIELDS (
                             ID INTEGER PRIMARY KEY,
-                            NAME TEXT NOT NULL
+                            NAME TEXT UNIQUE NOT NULL
                         ) '''
 
 _create_table_genus_types = ''' CREATE TABLE IF NOT EXISTS GENUS_TYPES (
                                     ID INTEGER PRIMARY KEY,
-                                    NAME TEXT NOT NULL
+                                    NAME TEXT UNIQUE NOT NULL
                                 ) '''
 
 _create_table_suffixes = ''' CREATE TABLE IF NOT EXISTS SUFFIXES (
@@ -28,7 +31,7 @@ _create_table_suffixes = ''' CREATE TABLE IF NOT EXISTS SUFFIXES (
                                 SUFFIX TEXT NOT NULL,
                                 CONSTRAINT RANK_GENUS_RANK_FK
                                     FOREIGN KEY (RANK_ID)
-                                        REFERENCES TAX_RANKS (ID),
+                                        REFERENCES RANKS (ID),
                                 CONSTRAINT RANK_GENUS_GENUS_FK
                                     FOREIGN KEY (GENUS_TYPE_ID)
                                         REFERENCES GENUS_TYPES (ID),
@@ -43,59 +46,290 @@ _create_table_entity = ''' CREATE TABLE IF NOT EXISTS ENTITIES (
                             POP_EST INTEGER
                             ) '''
 
+_create_table_classifications = ''' CREATE TABLE IF NOT EXISTS CLASSIFICATIONS (
+                                        ENTITY_ID INTEGER NOT NULL,
+                                        RANK_ID INTEGER NOT NULL,
+                                        NAME TEXT NOT NULL,
+                                        CONSTRAINT ENTITY_RANK_ENTITY_FK
+                                            FOREIGN KEY (ENTITY_ID)
+                                                REFERENCES ENTITIES (ID),
+                                        CONSTRAINT ENTITY_RANK_RANK_FK
+                                            FOREIGN KEY (RANK_ID)
+                                                REFERENCES RANKS (ID),
+                                        CONSTRAINT ENTITY_RANK_PK
+                                            PRIMARY KEY (ENTITY_ID, RANK_ID)
+                                    ) '''
+
+_create_table_conservation_statuses = ''' CREATE TABLE IF NOT EXISTS CONSERVATION_STATUSES (
+                                            ID INTEGER PRIMARY KEY AUTOINCREMENT,
+                                            NAME TEXT UNIQUE NOT NULL,
+                                            CODE_RL TEXT UNIQUE NOT NULL,
+                                            CODE_NS TEXT NOT NULL
+                                        ) '''
+
+# a taxon is one node of the classification tree: a (rank, name) pair under one parent taxon, so a homonym under
+# another parent, or an entity reclassified under one, never shares a node (and its ancestors) with it. PARENT_ID is 0
+# for the highest-ranked taxon of a lineage
+_create_table_taxa = ''' CREATE TABLE IF NOT EXISTS TAXA (
+                            ID INTEGER PRIMARY KEY,
+                            PARENT_ID INTEGER NOT NULL,
+                            RANK_ID INTEGER NOT NULL,
+                            NAME TEXT NOT NULL,
+                            CONSTRAINT TAXA_RANK_FK
+                                FOREIGN KEY (RANK_ID)
+                                    REFERENCES RANKS (ID),
+                            CONSTRAINT TAXA_PARENT_RANK_NAME_UK
+                                UNIQUE (PARENT_ID, RANK_ID, NAME)
+                        ) '''
+
+# every (ancestor, descendant) taxon pair, including each taxon with itself at DEPTH 0;
+# clustered on ANCESTOR_ID so a subtree is one contiguous range
+_create_table_taxon_closure = ''' CREATE TABLE IF NOT EXISTS TAXON_CLOSURE (
+                                    ANCESTOR_ID INTEGER NOT NULL,
+                                    DESCENDANT_ID INTEGER NOT NULL,
+                                    DEPTH INTEGER NOT NULL,
+                                    CONSTRAINT TAXON_CLOSURE_PK
+                                        PRIMARY KEY (ANCESTOR_ID, DESCENDANT_ID)
+                                ) WITHOUT ROWID '''
+
+# the lowest-ranked taxon of each entity; its ancestors in TAXON_CLOSURE are the entity's lineage
+_create_table_entity_taxa = ''' CREATE TABLE IF NOT EXISTS ENTITY_TAXA (
+                                    ENTITY_ID INTEGER PRIMARY KEY,
+                                    TAXON_ID INTEGER NOT NULL,
+                                    CONSTRAINT ENTITY_TAXA_ENTITY_FK
+                                        FOREIGN KEY (ENTITY_ID)
+                                            REFERENCES ENTITIES (ID),
+                                    CONSTRAINT ENTITY_TAXA_TAXON_FK
+                                        FOREIGN KEY (TAXON_ID)
+                                            REFERENCES TAXA (ID)
+                                ) '''
+
+# one row per searchable name: ENTITIES.ID * 2 for entities and TAXA.ID * 2 + 1 for taxa, so either kind is
+# found (and kept in sync) by primary key. A taxon name under several parents is one row, for its lowest TAXA.ID
+# when the index is rebuilt and otherwise whichever taxon had it first. NAME_KEY is lower(NAME) for
+# case-insensitive exact and prefix lookups
+_create_table_search_names = ''' CREATE TABLE IF NOT EXISTS SEARCH_NAMES (
+                                    ID INTEGER PRIMARY KEY,
+                                    NAME TEXT NOT NULL,
+                                    NAME_KEY TEXT NOT NULL
+                                ) '''
+
+# a trigram index over SEARCH_NAMES for substring and fuzzy matching; it stores no copy of the names
+_create_table_name_search = ''' CREATE VIRTUAL TABLE IF NOT EXISTS NAME_SEARCH USING fts5(
+                                    NAME,
+                                    content='SEARCH_NAMES',
+                                    content_rowid='ID',
+                                    tokenize='trigram'
+                                ) '''
+
+# names land in SEARCH_PENDING rather than straight in NAME_SEARCH: FTS5 flushes its pending terms at every
+# statement boundary, so indexing row by row writes a segment per name; flush_search_index indexes the queue in one
+# statement just before the transaction commits. A name still in the queue was never indexed, so it needs no 'delete'
+_create_table_search_pending = ''' CREATE TABLE IF NOT EXISTS SEARCH_PENDING (
+                                    ID INTEGER PRIMARY KEY
+                                ) '''
+
+# one row per resumable bulk import, keyed by the input's absolute path. BYTE_OFFSET and LINE_NO are where the next
+# chunk starts; CHUNK_HASH is the SHA-256 of the last committed chunk, the bytes from CHUNK_OFFSET up to BYTE_OFFSET,
+# so a rerun can tell whether the file it is resuming is still the one that was checkpointed
+_create_table_import_jobs = ''' CREATE TABLE IF NOT EXISTS IMPORT_JOBS (
+                                    ID INTEGER PRIMARY KEY,
+                                    SOURCE TEXT UNIQUE NOT NULL,
+                                    FORMAT TEXT NOT NULL,
+                                    BYTE_OFFSET INTEGER NOT NULL,
+                                    LINE_NO INTEGER NOT NULL,
+                                    CHUNK_OFFSET INTEGER NOT NULL,
+                                    CHUNK_HASH TEXT,
+                                    ENTITIES INTEGER NOT NULL,
+                                    FINISHED INTEGER NOT NULL,
+                                    UPDATED_AT TEXT NOT NULL
+                                ) '''
+
+_create_trigger_search_names_insert = ''' CREATE TRIGGER IF NOT EXISTS TRG_SEARCH_NAMES_AI
+                                            AFTER INSERT ON SEARCH_NAMES BEGIN
+                                                INSERT OR IGNORE INTO SEARCH_PENDING(ID) VALUES(new.ID);
+                                            END '''
+
+_create_trigger_search_names_delete = ''' CREATE TRIGGER IF NOT EXISTS TRG_SEARCH_NAMES_AD
+                                            AFTER DELETE ON SEARCH_NAMES BEGIN
+                                                INSERT INTO NAME_SEARCH(NAME_SEARCH, rowid, NAME)
+                                                    SELECT 'delete', old.ID, old.NAME
+                                                    WHERE NOT EXISTS (SELECT 1 FROM SEARCH_PENDING WHERE ID = old.ID);
+                                                DELETE FROM SEARCH_PENDING WHERE ID = old.ID;
+                                            END '''
+
+_create_trigger_search_names_update = ''' CREATE TRIGGER IF NOT EXISTS TRG_SEARCH_NAMES_AU
+                                            AFTER UPDATE OF NAME ON SEARCH_NAMES BEGIN
+                                                INSERT INTO NAME_SEARCH(NAME_SEARCH, rowid, NAME)
+                                                    SELECT 'delete', old.ID, old.NAME
+                                                    WHERE NOT EXISTS (SELECT 1 FROM SEARCH_PENDING WHERE ID = old.ID);
+                                                INSERT OR IGNORE INTO SEARCH_PENDING(ID) VALUES(new.ID);
+                                            END '''
+
+_create_trigger_entities_insert = ''' CREATE TRIGGER IF NOT EXISTS TRG_ENTITIES_SEARCH_AI
+                                        AFTER INSERT ON ENTITIES BEGIN
+                                            INSERT INTO SEARCH_NAMES(ID, NAME, NAME_KEY)
+                                                VALUES(new.ID * 2, new.NAME, lower(new.NAME));
+                                        END '''
+
+# the upserts rewrite NAME with the same value, which shouldn't cost a trip through the trigram index
+_create_trigger_entities_update = ''' CREATE TRIGGER IF NOT EXISTS TRG_ENTITIES_SEARCH_AU
+                                        AFTER UPDATE OF NAME ON ENTITIES WHEN old.NAME IS NOT new.NAME BEGIN
+                                            UPDATE SEARCH_NAMES SET NAME = new.NAME, NAME_KEY = lower(new.NAME)
+                                                WHERE ID = new.ID * 2;
+                                        END '''
+
+_create_trigger_entities_delete = ''' CREATE TRIGGER IF NOT EXISTS TRG_ENTITIES_SEARCH_AD
+                                        AFTER DELETE ON ENTITIES BEGIN
+                                            DELETE FROM SEARCH_NAMES WHERE ID = old.ID * 2;
+                                        END '''
+
+_create_trigger_taxa_insert = ''' CREATE TRIGGER IF NOT EXISTS TRG_TAXA_SEARCH_AI
+                                    AFTER INSERT ON TAXA BEGIN
+                                        INSERT INTO SEARCH_NAMES(ID, NAME, NAME_KEY)
+                                            SELECT new.ID * 2 + 1, new.NAME, lower(new.NAME)
+                                            WHERE NOT EXISTS (SELECT 1 FROM TAXA WHERE RANK_ID = new.RANK_ID
+                                                                AND NAME = new.NAME AND ID <> new.ID);
+                                    END '''
+
+# a deleted taxon that stood for its (RANK_ID, NAME) hands the search row to another taxon of that name, if any
+_create_trigger_taxa_delete = ''' CREATE TRIGGER IF NOT EXISTS TRG_TAXA_SEARCH_AD
+                                    AFTER DELETE ON TAXA BEGIN
+                                        DELETE FROM SEARCH_NAMES WHERE ID = old.ID * 2 + 1;
+                                        INSERT INTO SEARCH_NAMES(ID, NAME, NAME_KEY)
+                                            SELECT t.ID * 2 + 1, t.NAME, lower(t.NAME) FROM TAXA t
+                                            WHERE t.RANK_ID = old.RANK_ID AND t.NAME = old.NAME
+                                            AND NOT EXISTS (SELECT 1 FROM TAXA o
+                                                                JOIN SEARCH_NAMES s ON s.ID = o.ID * 2 + 1
+                                                                WHERE o.RANK_ID = old.RANK_ID AND o.NAME = old.NAME)
+                                            ORDER BY t.ID LIMIT 1;
+                                    END '''
+
+# the ON CONFLICT targets of the upserts below need these on databases created before the UNIQUE columns
+_create_index_ranks_name = ''' CREATE UNIQUE INDEX IF NOT EXISTS IDX_RANKS_NAME ON RANKS(NAME) '''
+
+_create_index_fields_name = ''' CREATE UNIQUE INDEX IF NOT EXISTS IDX_FIELDS_NAME ON FIELDS(NAME) '''
+
+_create_index_genus_types_name = ''' CREATE UNIQUE INDEX IF NOT EXISTS IDX_GENUS_TYPES_NAME ON GENUS_TYPES(NAME) '''
+
+_create_index_cons_statuses_code = ''' CREATE UNIQUE INDEX IF NOT EXISTS IDX_CONSERVATION_STATUSES_CODE_RL
+                                        ON CONSERVATION_STATUSES(CODE_RL) '''
+
+# covering: rank_id_by_label never touches the table
+_create_index_ranks_label = ''' CREATE INDEX IF NOT EXISTS IDX_RANKS_LABEL ON RANKS(LABEL, ID) '''
+
+# covering for "every entity with this rank" and "every entity in this taxon"
+_create_index_classifications_rank_name = ''' CREATE INDEX IF NOT EXISTS IDX_CLASSIFICATIONS_RANK_NAME
+                                                ON CLASSIFICATIONS(RANK_ID, NAME, ENTITY_ID) '''
+
+# covering for taxon-name lookups where the rank isn't known
+_create_index_classifications_name = ''' CREATE INDEX IF NOT EXISTS IDX_CLASSIFICATIONS_NAME
+                                            ON CLASSIFICATIONS(NAME, RANK_ID, ENTITY_ID) '''
+
+# members_by_taxon looks taxa up without knowing their parents
+_create_index_taxa_rank_name = ''' CREATE INDEX IF NOT EXISTS IDX_TAXA_RANK_NAME ON TAXA(RANK_ID, NAME) '''
+
+_create_index_taxon_closure_descendant = ''' CREATE INDEX IF NOT EXISTS IDX_TAXON_CLOSURE_DESCENDANT
+                                                ON TAXON_CLOSURE(DESCENDANT_ID, ANCESTOR_ID, DEPTH) '''
+
+_create_index_entity_taxa_taxon = ''' CREATE INDEX IF NOT EXISTS IDX_ENTITY_TAXA_TAXON
+                                        ON ENTITY_TAXA(TAXON_ID, ENTITY_ID) '''
+
+_create_index_search_names_key = ''' CREATE INDEX IF NOT EXISTS IDX_SEARCH_NAMES_KEY
+                                        ON SEARCH_NAMES(NAME_KEY) '''
+
+# each upsert only rewrites a row whose values actually differ, so re-importing unchanged data dirties no pages, adds
+# nothing to the WAL and fires no update triggers; key columns are never reassigned to themselves
 _insert_rank_no_field = ''' INSERT INTO RANKS(NAME, LABEL, IS_MAIN, REL_INDEX)
                                 VALUES(?, ?, ?, ?)
                                 ON CONFLICT(NAME) DO UPDATE SET
-                                    NAME=excluded.NAME,
                                     LABEL=excluded.LABEL,
                                     IS_MAIN=excluded.IS_MAIN,
-                                    REL_INDEX=excluded.REL_INDEX '''
+                                    REL_INDEX=excluded.REL_INDEX
+                                WHERE LABEL IS NOT excluded.LABEL
+                                    OR IS_MAIN IS NOT excluded.IS_MAIN
+                                    OR REL_INDEX IS NOT excluded.REL_INDEX '''
 
 _insert_rank_with_field = ''' INSERT INTO RANKS(NAME, LABEL, IS_MAIN, REL_INDEX, FIELD_ID)
                                 VALUES(?, ?, ?, ?, ? )
                                 ON CONFLICT(NAME) DO UPDATE SET
-                                    NAME=excluded.NAME,
                                     LABEL=excluded.LABEL,
                                     IS_MAIN=excluded.IS_MAIN,
                                     REL_INDEX=excluded.REL_INDEX,
-                                    FIELD_ID=excluded.FIELD_ID;'''
+                                    FIELD_ID=excluded.FIELD_ID
+                                WHERE LABEL IS NOT excluded.LABEL
+                                    OR IS_MAIN IS NOT excluded.IS_MAIN
+                                    OR REL_INDEX IS NOT excluded.REL_INDEX
+                                    OR FIELD_ID IS NOT excluded.FIELD_ID;'''
 
 _insert_field = ''' INSERT INTO FIELDS(NAME)
                         VALUES(?)
-                        ON CONFLICT(NAME) DO UPDATE SET
-                            NAME=excluded.NAME '''
+                        ON CONFLICT(NAME) DO NOTHING '''
 
 _insert_genus_type = ''' INSERT INTO GENUS_TYPES(NAME)
                             VALUES(?)
-                            ON CONFLICT(NAME) DO UPDATE SET
-                                NAME=excluded.NAME '''
+                            ON CONFLICT(NAME) DO NOTHING '''
 
 _insert_suffix = ''' INSERT INTO SUFFIXES(RANK_ID, GENUS_TYPE_ID, SUFFIX)
                         VALUES(?, ?, ?)
                         ON CONFLICT(RANK_ID, GENUS_TYPE_ID) DO UPDATE SET
-                            RANK_ID=excluded.RANK_ID,
-                            GENUS_TYPE_ID=excluded.GENUS_TYPE_ID,
-                            SUFFIX=excluded.SUFFIX '''
+                            SUFFIX=excluded.SUFFIX
+                        WHERE SUFFIX IS NOT excluded.SUFFIX '''
 
 _insert_entity_with_pop = ''' INSERT INTO ENTITIES(NAME, CONS_STATUS_ID, POP_EST)
                                 VALUES (?, ?, ?)
                                 ON CONFLICT(NAME) DO UPDATE SET
-                                   NAME=excluded.NAME,
                                    CONS_STATUS_ID=excluded.CONS_STATUS_ID,
-                                   POP_EST=excluded.POP_EST '''
+                                   POP_EST=excluded.POP_EST
+                                WHERE CONS_STATUS_ID IS NOT excluded.CONS_STATUS_ID
+                                   OR POP_EST IS NOT excluded.POP_EST '''
 
 _insert_entity_no_pop = ''' INSERT INTO ENTITIES(NAME, CONS_STATUS_ID)
                                 VALUES(?, ?) 
                                 ON CONFLICT(NAME) DO UPDATE SET
-                                   NAME=excluded.NAME,
-                                   CONS_STATUS_ID=excluded.CONS_STATUS_ID '''
+                                   CONS_STATUS_ID=excluded.CONS_STATUS_ID
+                                WHERE CONS_STATUS_ID IS NOT excluded.CONS_STATUS_ID '''
+
+# formatted with one '(?, ?, ?)' per entity; a NULL POP_EST keeps the stored estimate, as the weak upsert does, so
+# both kinds go through one statement. Rows the WHERE leaves alone aren't returned
+_insert_entities_returning = ''' INSERT INTO ENTITIES(NAME, CONS_STATUS_ID, POP_EST)
+                                    VALUES {}
+                                    ON CONFLICT(NAME) DO UPDATE SET
+                                       CONS_STATUS_ID=excluded.CONS_STATUS_ID,
+                                       POP_EST=COALESCE(excluded.POP_EST, POP_EST)
+                                    WHERE CONS_STATUS_ID IS NOT excluded.CONS_STATUS_ID
+                                       OR POP_EST IS NOT COALESCE(excluded.POP_EST, POP_EST)
+                                    RETURNING ID, NAME '''
 
 _insert_classification = ''' INSERT INTO CLASSIFICATIONS(ENTITY_ID, RANK_ID, NAME) 
                                 VALUES(?, ?, ?)
                                 ON CONFLICT(ENTITY_ID, RANK_ID) DO UPDATE SET 
-                                    ENTITY_ID=excluded.ENTITY_ID,
-                                    RANK_ID=excluded.RANK_ID,
-                                    NAME=excluded.NAME '''
+                                    NAME=excluded.NAME
+                                WHERE NAME IS NOT excluded.NAME '''
+
+_insert_conservation_status = ''' INSERT INTO CONSERVATION_STATUSES(NAME, CODE_RL, CODE_NS)
+                                    VALUES(?, ?, ?)
+                                    ON CONFLICT(CODE_RL) DO UPDATE SET
+                                        NAME=excluded.NAME,
+                                        CODE_NS=excluded.CODE_NS
+                                    WHERE NAME IS NOT excluded.NAME
+                                        OR CODE_NS IS NOT excluded.CODE_NS '''
+
+_insert_taxon = ''' INSERT INTO TAXA(PARENT_ID, RANK_ID, NAME)
+                        VALUES(?, ?, ?) '''
+
+# a taxon never moves, so its closure is written once, when it is added: every ancestor of :parent (the parent
+# included) one level further up, and the taxon itself at DEPTH 0
+_insert_taxon_closure = ''' INSERT INTO TAXON_CLOSURE(ANCESTOR_ID, DESCENDANT_ID, DEPTH)
+                                SELECT ANCESTOR_ID, :taxon, DEPTH + 1 FROM TAXON_CLOSURE WHERE DESCENDANT_ID = :parent
+                                UNION ALL
+                                SELECT :taxon, :taxon, 0 '''
+
+_insert_entity_taxon = ''' INSERT INTO ENTITY_TAXA(ENTITY_ID, TAXON_ID)
+                                VALUES(?, ?)
+                                ON CONFLICT(ENTITY_ID) DO UPDATE SET
+                                    TAXON_ID=excluded.TAXON_ID
+                                WHERE TAXON_ID IS NOT excluded.TAXON_ID '''
 
 # with this, you have to know if it's a disambiguation rank (e.g. DIVISION_B vs DIVISION_Z)
 _select_rank_id_by_name = ''' SELECT ID FROM RANKS
@@ -108,14 +342,168 @@ _select_conservation_status_codes = ''' SELECT ID, CODE_RL FROM CONSERVATION_STA
 
 _select_entity_id_by_name = ''' SELECT ID FROM ENTITIES WHERE NAME = ? '''
 
-sql = Box({
+# formatted with one '?' per name, e.g. _select_entity_ids_by_names.format(', '.join('?' * len(names)))
+_select_entity_ids_by_names = ''' SELECT ID, NAME FROM ENTITIES WHERE NAME IN ({}) '''
+
+# formatted like _select_entity_ids_by_names; the current values a diff-aware load compares incoming rows against
+_select_entities_by_names = ''' SELECT ID, NAME, CONS_STATUS_ID, POP_EST FROM ENTITIES WHERE NAME IN ({}) '''
+
+# formatted with one '?' per entity id
+_select_classifications_by_entity_ids = ''' SELECT ENTITY_ID, RANK_ID, NAME FROM CLASSIFICATIONS
+                                                WHERE ENTITY_ID IN ({}) '''
+
+_select_all_rank_keys = ''' SELECT ID, NAME, LABEL FROM RANKS ORDER BY ID '''
+
+_select_all_entity_names = ''' SELECT ID, NAME FROM ENTITIES '''
+
+_select_all_field_ids = ''' SELECT ID, NAME FROM FIELDS '''
+
+_select_all_genus_type_ids = ''' SELECT ID, NAME FROM GENUS_TYPES '''
+
+_select_all_rank_rel_indexes = ''' SELECT ID, REL_INDEX FROM RANKS '''
+
+_select_all_rank_classes = ''' SELECT ID, NAME, IS_MAIN, REL_INDEX, FIELD_ID FROM RANKS '''
+
+_select_rank_class_by_name = ''' SELECT ID, NAME, IS_MAIN, REL_INDEX, FIELD_ID FROM RANKS WHERE NAME = ? '''
+
+_select_all_suffixes = ''' SELECT RANK_ID, GENUS_TYPE_ID, SUFFIX FROM SUFFIXES '''
+
+_select_taxon_id = ''' SELECT ID FROM TAXA WHERE PARENT_ID = ? AND RANK_ID = ? AND NAME = ? '''
+
+_select_taxon_key = ''' SELECT PARENT_ID, RANK_ID, NAME FROM TAXA WHERE ID = ? '''
+
+# a taxon is still needed while an entity ends at it or another taxon hangs off it
+_select_taxon_in_use = ''' SELECT EXISTS (SELECT 1 FROM ENTITY_TAXA WHERE TAXON_ID = :taxon)
+                                OR EXISTS (SELECT 1 FROM TAXA WHERE PARENT_ID = :taxon) '''
+
+# formatted with one '?' per entity id
+_select_entity_taxa_by_entity_ids = ''' SELECT ENTITY_ID, TAXON_ID FROM ENTITY_TAXA WHERE ENTITY_ID IN ({}) '''
+
+_select_all_classifications_by_entity = ''' SELECT ENTITY_ID, RANK_ID, NAME FROM CLASSIFICATIONS ORDER BY ENTITY_ID '''
+
+_select_lineage_by_entity_name = ''' SELECT r.NAME, t.NAME, tc.DEPTH
+                                        FROM ENTITIES e
+                                        JOIN ENTITY_TAXA et ON et.ENTITY_ID = e.ID
+                                        JOIN TAXON_CLOSURE tc ON tc.DESCENDANT_ID = et.TAXON_ID
+                                        JOIN TAXA t ON t.ID = tc.ANCESTOR_ID
+                                        JOIN RANKS r ON r.ID = t.RANK_ID
+                                        WHERE e.NAME = ?
+                                        ORDER BY r.REL_INDEX, r.ID '''
+
+_select_members_by_taxon = ''' SELECT DISTINCT e.ID, e.NAME
+                                FROM TAXA a
+                                JOIN TAXON_CLOSURE tc ON tc.ANCESTOR_ID = a.ID
+                                JOIN ENTITY_TAXA et ON et.TAXON_ID = tc.DESCENDANT_ID
+                                JOIN ENTITIES e ON e.ID = et.ENTITY_ID
+                                WHERE a.RANK_ID = ? AND a.NAME = ? '''
+
+# both parameters are the query; char(1114111) is the highest code point, so this is every key it prefixes
+_select_search_names_by_prefix = ''' SELECT ID, NAME FROM SEARCH_NAMES
+                                        WHERE NAME_KEY >= lower(?) AND NAME_KEY < lower(?) || char(1114111)
+                                        ORDER BY NAME_KEY
+                                        LIMIT ? '''
+
+_select_search_names_by_match = ''' SELECT rowid, NAME FROM NAME_SEARCH WHERE NAME_SEARCH MATCH ? LIMIT ? '''
+
+# for an OR of trigrams; bm25 puts names sharing more (and rarer) trigrams with the query first
+_select_search_names_by_ranked_match = ''' SELECT rowid, NAME FROM NAME_SEARCH WHERE NAME_SEARCH MATCH ?
+                                            ORDER BY rank LIMIT ? '''
+
+# names queued for the trigram index but not yet in it, matched by plain substring instead; CROSS JOIN keeps the
+# (normally tiny) queue as the outer loop
+_select_search_names_pending = ''' SELECT S.ID, S.NAME FROM SEARCH_PENDING P CROSS JOIN SEARCH_NAMES S ON S.ID = P.ID
+                                    WHERE instr(S.NAME_KEY, ?) > 0 LIMIT ? '''
+
+_insert_search_names_pending = ''' INSERT INTO NAME_SEARCH(rowid, NAME)
+                                    SELECT S.ID, S.NAME FROM SEARCH_PENDING P JOIN SEARCH_NAMES S ON S.ID = P.ID '''
+
+_insert_import_job = ''' INSERT INTO IMPORT_JOBS(SOURCE, FORMAT, BYTE_OFFSET, LINE_NO, CHUNK_OFFSET, CHUNK_HASH,
+                                                 ENTITIES, FINISHED, UPDATED_AT)
+                            VALUES(?, ?, 0, 1, 0, NULL, 0, 0, datetime('now'))
+                            ON CONFLICT(SOURCE) DO UPDATE SET
+                                FORMAT=excluded.FORMAT,
+                                BYTE_OFFSET=0,
+                                LINE_NO=1,
+                                CHUNK_OFFSET=0,
+                                CHUNK_HASH=NULL,
+                                ENTITIES=0,
+                                FINISHED=0,
+                                UPDATED_AT=excluded.UPDATED_AT '''
+
+_select_import_job = ''' SELECT ID, SOURCE, FORMAT, BYTE_OFFSET, LINE_NO, CHUNK_OFFSET, CHUNK_HASH, ENTITIES, FINISHED
+                            FROM IMPORT_JOBS WHERE SOURCE = ? '''
+
+_update_import_job_checkpoint = ''' UPDATE IMPORT_JOBS SET
+                                        BYTE_OFFSET = ?,
+                                        LINE_NO = ?,
+                                        CHUNK_OFFSET = ?,
+                                        CHUNK_HASH = ?,
+                                        ENTITIES = ENTITIES + ?,
+                                        UPDATED_AT = datetime('now')
+                                    WHERE ID = ? '''
+
+_update_import_job_finished = ''' UPDATE IMPORT_JOBS SET FINISHED = 1, UPDATED_AT = datetime('now') WHERE ID = ? '''
+
+_delete_entity_taxon = ''' DELETE FROM ENTITY_TAXA WHERE ENTITY_ID = ? '''
+
+# only ever run on a taxon with nothing below it, whose one remaining descendant is itself
+_delete_taxon_closure = ''' DELETE FROM TAXON_CLOSURE WHERE DESCENDANT_ID = ? '''
+
+_delete_taxon = ''' DELETE FROM TAXA WHERE ID = ? '''
+
+_select_all_search_names = ''' SELECT ID * 2, NAME, lower(NAME) FROM ENTITIES
+                                UNION ALL
+                                SELECT MIN(ID) * 2 + 1, NAME, lower(NAME) FROM TAXA GROUP BY RANK_ID, NAME '''
+
+# formatted with a table name; cheap enough to run on every cache load since it only reads the rowid b-tree
+_select_table_fingerprint = ''' SELECT COUNT(*) || ':' || IFNULL(MAX(ROWID), 0) FROM {} '''
+
+
+# a read-only view all the way down, so the statements can't be rebound at runtime
+def _freeze(statements: dict) -> Mapping:
+    return MappingProxyType({k: _freeze(v) if isinstance(v, dict) else v for (k, v) in statements.items()})
+
+
+sql = _freeze({
     'create': {
         'table': {
             'rank': _create_table_ranks,
             'field': _create_table_fields,
             'genus_type': _create_table_genus_types,
             'suffix': _create_table_suffixes,
-            'entity': _create_table_entity
+            'entity': _create_table_entity,
+            'classification': _create_table_classifications,
+            'conservation_status': _create_table_conservation_statuses,
+            'taxon': _create_table_taxa,
+            'taxon_closure': _create_table_taxon_closure,
+            'entity_taxon': _create_table_entity_taxa,
+            'search_names': _create_table_search_names,
+            'name_search': _create_table_name_search,
+            'search_pending': _create_table_search_pending,
+            'import_jobs': _create_table_import_jobs
+        },
+        'trigger': {
+            'search_names_insert': _create_trigger_search_names_insert,
+            'search_names_delete': _create_trigger_search_names_delete,
+            'search_names_update': _create_trigger_search_names_update,
+            'entities_search_insert': _create_trigger_entities_insert,
+            'entities_search_update': _create_trigger_entities_update,
+            'entities_search_delete': _create_trigger_entities_delete,
+            'taxa_search_insert': _create_trigger_taxa_insert,
+            'taxa_search_delete': _create_trigger_taxa_delete
+        },
+        'index': {
+            'ranks_name': _create_index_ranks_name,
+            'fields_name': _create_index_fields_name,
+            'genus_types_name': _create_index_genus_types_name,
+            'cons_statuses_code': _create_index_cons_statuses_code,
+            'ranks_label': _create_index_ranks_label,
+            'classifications_rank_name': _create_index_classifications_rank_name,
+            'classifications_name': _create_index_classifications_name,
+            'taxa_rank_name': _create_index_taxa_rank_name,
+            'taxon_closure_descendant': _create_index_taxon_closure_descendant,
+            'entity_taxa_taxon': _create_index_entity_taxa_taxon,
+            'search_names_key': _create_index_search_names_key
         }
     },
     'insert': {
@@ -125,14 +513,53 @@ sql = Box({
         'suffix': _insert_suffix,
         'entity': _insert_entity_with_pop,
         'weak_entity': _insert_entity_no_pop,
-        'classification': _insert_classification
+        'entities_returning': _insert_entities_returning,
+        'classification': _insert_classification,
+        'conservation_status': _insert_conservation_status,
+        'taxon': _insert_taxon,
+        'taxon_closure': _insert_taxon_closure,
+        'entity_taxon': _insert_entity_taxon,
+        'search_names_pending': _insert_search_names_pending,
+        'import_job': _insert_import_job
     },
     'select': {
         'rank_id_by_name': _select_rank_id_by_name,
         'rank_id_by_label': _select_rank_id_by_label,
         'all_cons_codes': _select_conservation_status_codes,
-        'entity_id_by_name': _select_entity_id_by_name
+        'entity_id_by_name': _select_entity_id_by_name,
+        'entity_ids_by_names': _select_entity_ids_by_names,
+        'entities_by_names': _select_entities_by_names,
+        'classifications_by_entity_ids': _select_classifications_by_entity_ids,
+        'all_rank_keys': _select_all_rank_keys,
+        'all_entity_names': _select_all_entity_names,
+        'all_field_ids': _select_all_field_ids,
+        'all_genus_type_ids': _select_all_genus_type_ids,
+        'table_fingerprint': _select_table_fingerprint,
+        'all_rank_rel_indexes': _select_all_rank_rel_indexes,
+        'all_rank_classes': _select_all_rank_classes,
+        'rank_class_by_name': _select_rank_class_by_name,
+        'all_suffixes': _select_all_suffixes,
+        'taxon_id': _select_taxon_id,
+        'taxon_key': _select_taxon_key,
+        'taxon_in_use': _select_taxon_in_use,
+        'entity_taxa_by_entity_ids': _select_entity_taxa_by_entity_ids,
+        'all_classifications_by_entity': _select_all_classifications_by_entity,
+        'lineage_by_entity_name': _select_lineage_by_entity_name,
+        'members_by_taxon': _select_members_by_taxon,
+        'search_names_by_prefix': _select_search_names_by_prefix,
+        'search_names_by_match': _select_search_names_by_match,
+        'search_names_by_ranked_match': _select_search_names_by_ranked_match,
+        'search_names_pending': _select_search_names_pending,
+        'all_search_names': _select_all_search_names,
+        'import_job': _select_import_job
+    },
+    'update': {
+        'import_job_checkpoint': _update_import_job_checkpoint,
+        'import_job_finished': _update_import_job_finished
     },
-    'update': {},
-    'drop': {}
+    'delete': {
+        'entity_taxon': _delete_entity_taxon,
+        'taxon_closure': _delete_taxon_closure,
+        'taxon': _delete_taxon
+    }
 })
@@ -1,9 +1,9 @@
-import copy
+from array import array
 from collections import namedtuple
 from abc import ABC, abstractmethod
-from typing import NamedTuple, Union, List, Iterable
+from typing import Any, Mapping, NamedTuple, Union, List, Iterable, Iterator, Optional, Sequence, Tuple
 
-from functional.validation import ArgSet
+from functional.validation import RecordValidator, ValidationError, validate_all, validator_for
 
 WeakRankNT = namedtuple('WeakRank', ['name', 'label', 'is_main', 'rel_index'])
 RankNT = namedtuple('Rank', ['name', 'label', 'is_main', 'rel_index', 'field_id'])
@@ -17,15 +17,16 @@ ClassificationNT = namedtuple('Classification', ['entity_id', 'rank_id', 'name']
 RecordNT = Union[RankNT, FieldNT, GenusTypeNT, SuffixNT, EntityNT]
 
 
-def _validate_kwargs(required: set, **kwargs) -> None:
-    assert required <= set(kwargs.keys())
+def _validate_kwargs(record_type: str, required: set, **kwargs) -> None:
+    missing = required.difference(kwargs)
+    if missing:
+        raise ValidationError(record_type, [f'missing {k}' for k in sorted(missing)])
 
 
 def _instance_to_comma_sep_pairs(instance: 'Record') -> str:
-    instance_attrs_dict = vars(instance)
     instance_attrs_list = []
-    for attr in instance_attrs_dict.keys():
-        instance_attrs_list.append(f'attr={instance_attrs_dict[attr]}')
+    for attr in instance.__slots__:
+        instance_attrs_list.append(f'{attr}={getattr(instance, attr)}')
     return ', '.join(instance_attrs_list)
 
 
@@ -35,6 +36,8 @@ def _iterable_to_comma_sep_strs(some_iterable: Iterable['Record']):
 
 class Record(ABC):
 
+    __slots__ = ()
+
     @classmethod
     @abstractmethod
     def from_namedtuple(cls, nt: RecordNT):
@@ -52,14 +55,25 @@ class Record(ABC):
 
 class Records(ABC):
 
+    __slots__ = ()
+
     @abstractmethod
-    def to_namedtuple_collection(self) -> List[RecordNT]:
+    def iter_namedtuples(self) -> Iterator[RecordNT]:
         raise NotImplementedError
 
+    def to_namedtuple_collection(self) -> List[RecordNT]:
+        return list(self.iter_namedtuples())
+
+    # the parameter tuples handed to executemany; namedtuples already are tuples
+    def iter_params(self) -> Iterator[tuple]:
+        return self.iter_namedtuples()
+
 
 class Rank(Record):
 
-    valid_weak = {'value', 'label', 'is_main', 'rel_index', 'field_id'}
+    __slots__ = ('name', 'label', 'is_main', 'rel_index', 'field_id')
+
+    valid_weak = {'name', 'label', 'is_main', 'rel_index'}
     valid_strong = valid_weak | {'field_id'}
 
     def __init__(self, value: str, label: str, is_main: int, rel_index: int, field_id: int = None):
@@ -79,11 +93,11 @@ class Rank(Record):
     @classmethod
     def build_namedtuple(cls, **kwargs) -> Union[RankNT, WeakRankNT]:
         if 'field_id' in kwargs:
-            _validate_kwargs(required=Rank.valid_strong, **kwargs)
+            _validate_kwargs('RANK', Rank.valid_strong, **kwargs)
             return RankNT(name=kwargs['name'], label=kwargs['label'], is_main=kwargs['is_main'],
                           rel_index=kwargs['rel_index'], field_id=kwargs['field_id'])
         else:
-            _validate_kwargs(required=Rank.valid_weak, **kwargs)
+            _validate_kwargs('RANK', Rank.valid_weak, **kwargs)
             return WeakRankNT(name=kwargs['name'], label=kwargs['label'], is_main=kwargs['is_main'],
                               rel_index=kwargs['rel_index'])
 
@@ -97,21 +111,25 @@ class Rank(Record):
 
 class Ranks(Records):
 
+    __slots__ = ('ranks',)
+
     def __init__(self, *ranks: Rank):
         self.ranks = ranks
 
     def __str__(self):
         return f'Ranks=[{_iterable_to_comma_sep_strs(self.ranks)}]'
 
-    def to_namedtuple_collection(self) -> List[RankNT]:
-        list_to_return = []
-        for rank in self.ranks:
-            list_to_return.append(rank.to_namedtuple())
-        return list_to_return
+    def __len__(self) -> int:
+        return len(self.ranks)
+
+    def iter_namedtuples(self) -> Iterator[RankNT]:
+        return (rank.to_namedtuple() for rank in self.ranks)
 
 
 class Field(Record):
 
+    __slots__ = ('name',)
+
     valid = {'name'}
 
     def __init__(self, value: str):
@@ -126,7 +144,7 @@ class Field(Record):
 
     @classmethod
     def build_namedtuple(cls, **kwargs) -> FieldNT:
-        _validate_kwargs(required=Field.valid)
+        _validate_kwargs('FIELD', Field.valid, **kwargs)
         return FieldNT(name=kwargs['name'])
 
     def to_namedtuple(self) -> FieldNT:
@@ -135,21 +153,25 @@ class Field(Record):
 
 class Fields(Records):
 
+    __slots__ = ('fields',)
+
     def __init__(self, *fields: Field):
         self.fields = fields
 
     def __str__(self):
         return f'Fields=[{_iterable_to_comma_sep_strs(self.fields)}]'
 
-    def to_namedtuple_collection(self) -> List[FieldNT]:
-        list_to_return = []
-        for field in self.fields:
-            list_to_return.append(field.to_namedtuple())
-        return list_to_return
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def iter_namedtuples(self) -> Iterator[FieldNT]:
+        return (field.to_namedtuple() for field in self.fields)
 
 
 class GenusType(Record):
 
+    __slots__ = ('name',)
+
     def __init__(self, value: str):
         self.name = value
 
@@ -170,21 +192,25 @@ class GenusType(Record):
 
 class GenusTypes(Records):
 
+    __slots__ = ('genus_types',)
+
     def __init__(self, *genus_types: GenusType):
         self.genus_types = genus_types
 
     def __str__(self):
         return f'GenusTypes=[{_iterable_to_comma_sep_strs(self.genus_types)}]'
 
-    def to_namedtuple_collection(self) -> List[GenusTypeNT]:
-        list_to_return = []
-        for genus_type in self.genus_types:
-            list_to_return.append(genus_type.to_namedtuple())
-        return list_to_return
+    def __len__(self) -> int:
+        return len(self.genus_types)
+
+    def iter_namedtuples(self) -> Iterator[GenusTypeNT]:
+        return (genus_type.to_namedtuple() for genus_type in self.genus_types)
 
 
 class Suffix(Record):
 
+    __slots__ = ('rank_id', 'genus_type_id', 'suffix')
+
     def __init__(self, rank_id: int, genus_type_id: int, value: str):
         self.rank_id = rank_id
         self.genus_type_id = genus_type_id
@@ -207,21 +233,25 @@ class Suffix(Record):
 
 class Suffixes(Records):
 
+    __slots__ = ('suffixes',)
+
     def __init__(self, *suffixes: Suffix):
         self.suffixes = suffixes
 
     def __str__(self):
         return f'Suffixes=[{_iterable_to_comma_sep_strs(self.suffixes)}]'
 
-    def to_namedtuple_collection(self) -> List[SuffixNT]:
-        list_to_return = []
-        for suffix in self.suffixes:
-            list_to_return.append(suffix.to_namedtuple())
-        return list_to_return
+    def __len__(self) -> int:
+        return len(self.suffixes)
+
+    def iter_namedtuples(self) -> Iterator[SuffixNT]:
+        return (suffix.to_namedtuple() for suffix in self.suffixes)
 
 
 class Entity(Record):
 
+    __slots__ = ('name', 'cons_status_id', 'pop_est')
+
     def __init__(self, name: str, cons_status_id: int, pop_est: int = None):
         self.name = name
         self.cons_status_id = cons_status_id
@@ -244,7 +274,7 @@ class Entity(Record):
                                 cons_status_id=kwargs['cons_status_id'])
 
     def to_namedtuple(self) -> EntityNT or WeakEntityNT:
-        if self.pop_est:
+        if self.pop_est is not None:
             return EntityNT(name=self.name, cons_status_id=self.cons_status_id,
                             pop_est=self.pop_est)
         else:
@@ -253,21 +283,25 @@ class Entity(Record):
 
 class Entities(Records):
 
+    __slots__ = ('entities',)
+
     def __init__(self, *entities: Entity):
         self.entities = entities
 
     def __str__(self):
         return f'Entities=[{_iterable_to_comma_sep_strs(self.entities)}]'
 
-    def to_namedtuple_collection(self) -> List[EntityNT]:
-        list_to_return = []
-        for entity in self.entities:
-            list_to_return.append(entity.to_namedtuple())
-        return list_to_return
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def iter_namedtuples(self) -> Iterator[EntityNT]:
+        return (entity.to_namedtuple() for entity in self.entities)
 
 
 class Classification(Record):
 
+    __slots__ = ('entity_id', 'rank_id', 'name')
+
     def __init__(self, entity_id: int, rank_id: int, name: str):
         self.entity_id = entity_id
         self.rank_id = rank_id
@@ -290,33 +324,139 @@ class Classification(Record):
 
 class Classifications(Records):
 
+    __slots__ = ('classifications',)
+
     def __init__(self, *classifications: Classification):
         self.classifications = classifications
 
     def __str__(self):
         return f'Classification=[{_iterable_to_comma_sep_strs(self.classifications)}]'
 
-    def to_namedtuple_collection(self) -> List[ClassificationNT]:
-        list_to_return = []
-        for classification in self.classifications:
-            list_to_return.append(classification.to_namedtuple())
-        return list_to_return
+    def __len__(self) -> int:
+        return len(self.classifications)
+
+    def iter_namedtuples(self) -> Iterator[ClassificationNT]:
+        return (classification.to_namedtuple() for classification in self.classifications)
+
+
+class ColumnarRecords(Records):
+
+    __slots__ = ('_columns',)
+
+    namedtuple_type = None
+    # one array typecode per namedtuple field; None keeps that column in a list (text or nullable values)
+    typecodes: Tuple[Optional[str], ...] = ()
+
+    def __init__(self, rows: Iterable[tuple] = ()):
+        self._columns = tuple(array(code) if code else [] for code in self.typecodes)
+        self.extend(rows)
+
+    def __str__(self):
+        return f'{type(self).__name__}[{len(self)}]'
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    def append(self, *values) -> None:
+        if len(values) != len(self._columns):
+            raise TypeError(f'Expected {len(self._columns)} values, received {len(values)}')
+        size = len(self)
+        try:
+            for column, value in zip(self._columns, values):
+                column.append(value)
+        except (TypeError, ValueError, OverflowError):
+            # keep the columns aligned when a value doesn't fit its array
+            for column in self._columns:
+                del column[size:]
+            raise
+
+    def extend(self, rows: Iterable[tuple]) -> None:
+        for row in rows:
+            self.append(*row)
+
+    # weak namedtuples (no FIELD_ID / POP_EST) are padded with None for the missing trailing columns
+    def append_record(self, record: Record) -> None:
+        values = record.to_namedtuple()
+        self.append(*values, *((None,) * (len(self.typecodes) - len(values))))
+
+    def column(self, name: str) -> Sequence:
+        return self._columns[self.namedtuple_type._fields.index(name)]
+
+    def iter_params(self) -> Iterator[tuple]:
+        return zip(*self._columns)
+
+    def iter_namedtuples(self) -> Iterator[RecordNT]:
+        return map(self.namedtuple_type._make, self.iter_params())
+
+
+class RankColumns(ColumnarRecords):
+
+    __slots__ = ()
+
+    namedtuple_type = RankNT
+    typecodes = (None, None, 'b', 'q', None)
+
+
+class FieldColumns(ColumnarRecords):
+
+    __slots__ = ()
+
+    namedtuple_type = FieldNT
+    typecodes = (None,)
+
+
+class GenusTypeColumns(ColumnarRecords):
+
+    __slots__ = ()
+
+    namedtuple_type = GenusTypeNT
+    typecodes = (None,)
+
+
+class SuffixColumns(ColumnarRecords):
+
+    __slots__ = ()
+
+    namedtuple_type = SuffixNT
+    typecodes = ('q', 'q', None)
+
+
+class EntityColumns(ColumnarRecords):
+
+    __slots__ = ()
+
+    namedtuple_type = EntityNT
+    typecodes = (None, 'q', None)
+
+
+class ClassificationColumns(ColumnarRecords):
+
+    __slots__ = ()
+
+    namedtuple_type = ClassificationNT
+    typecodes = ('q', 'q', None)
 
 
 RecordType = Union[Rank, Field, GenusType, Suffix, Entity]
 
-_type_dict = {
-    'RANK': Rank,
-    'FIELD': Field,
-    'GENUSTYPE': GenusType,
-    'SUFFIX': Suffix,
-    'ENTITY': Entity,
-    'CLASSIFICATION': Classification
+# keyed by the CLI's TYPE; optional arguments that are None count as not given
+_validators = {
+    'RANK': RecordValidator('RANK', Rank, {'value': str, 'label': str, 'is_main': int, 'rel_index': int},
+                            optional={'field_id': int}),
+    'FIELD': RecordValidator('FIELD', Field, {'value': str}),
+    'GENUSTYPE': RecordValidator('GENUSTYPE', GenusType, {'value': str}),
+    'SUFFIX': RecordValidator('SUFFIX', Suffix, {'rank_id': int, 'genus_type_id': int, 'value': str}),
+    'ENTITY': RecordValidator('ENTITY', Entity, {'name': str, 'cons_status_id': int}, optional={'pop_est': int},
+                              aliases={'value': 'name'}),
+    'CLASSIFICATION': RecordValidator('CLASSIFICATION', Classification,
+                                      {'entity_id': int, 'rank_id': int, 'name': str}, aliases={'value': 'name'})
 }
 
 
-# kwargs are assumed to have already been validated
+# raises ValidationError naming every missing or mistyped argument; keys the record type doesn't use are ignored
 def construct_record(**kwargs) -> RecordType:
-    new_args = copy.deepcopy(kwargs)
-    argset = ArgSet(**new_args)
-    return _type_dict[argset.type](**argset.attrs)
+    return validator_for(_validators, kwargs.get('type')).build(kwargs)
+
+
+def construct_records(candidates: Iterable[Mapping[str, Any]]) -> Tuple[List[RecordType], List[ValidationError]]:
+    return validate_all(_validators, candidates)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+from data_access.lineage import get_lineage, iter_members, rebuild_lineages
+from data_access.lookup_cache import LookupCache
+from data_access.rank_classes import RankEquivalence
+from data_access.ranks import RankResolver, UnknownRankError
+from data_access.ref_cache import ReferenceCache
+from data_access.search import DEFAULT_LIMIT, rebuild_search_index, search_names
+from data_access.sql_ops import AutoClosingConn
+from data_access.suffixes import SuffixIndex
+from functional.dispatch import batch
+from model.constants import sql as sql_queries
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(description='A tool for reading taxonomy information back out of a db')
+    subparsers = argparser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+
+    lineage_parser = subparsers.add_parser('lineage', help='Prints an entity\'s lineage, highest rank first')
+    lineage_parser.add_argument('name', type=str, metavar='NAME', help='The entity\'s name')
+
+    members_parser = subparsers.add_parser('members', help='Prints every entity classified under a taxon')
+    members_parser.add_argument(
+        '-r', '--rank', type=str, dest='rank', required=True, metavar='RANK', help='The taxon\'s rank label or name'
+    )
+    members_parser.add_argument(
+        '-n', '--name', type=str.upper, dest='taxon', required=True, metavar='NAME', help='The taxon\'s name'
+    )
+
+    compare_parser = subparsers.add_parser(
+        'compare', help='Lines two entities\' classifications up rank by rank, treating synonymous ranks as one'
+    )
+    compare_parser.add_argument('names', type=str, nargs=2, metavar='NAME', help='The entities\' names')
+
+    suffix_parser = subparsers.add_parser('suffix', help='Checks taxon names against their rank\'s suffix')
+    suffix_parser.add_argument(
+        '-r', '--rank', type=str, dest='rank', required=True, metavar='RANK', help='The taxa\'s rank label or name'
+    )
+    suffix_parser.add_argument(
+        '-g', '--genustype', type=str.upper, dest='genus_type', required=True, metavar='GENUSTYPE',
+        help='The genus type whose suffixes apply (e.g. ANIMALS)'
+    )
+    suffix_parser.add_argument('names', type=str.upper, nargs='+', metavar='NAME', help='The taxon names to check')
+
+    search_parser = subparsers.add_parser(
+        'search', help='Finds entity and taxon names by prefix, substring or a near miss, best match first'
+    )
+    search_parser.add_argument('query', type=str, metavar='QUERY', help='All or part of a name')
+    search_parser.add_argument(
+        '-l', '--limit', type=int, dest='limit', default=DEFAULT_LIMIT, metavar='LIMIT',
+        help='The most matches to print'
+    )
+
+    subparsers.add_parser('reindex', help='Rebuilds the name search index from ENTITIES and TAXA')
+    subparsers.add_parser('rebuild', help='Recomputes the lineage tables from CLASSIFICATIONS')
+    return argparser.parse_args()
+
+
+def _rank_id(conn, rank: str) -> int:
+    try:
+        return RankResolver(conn)[rank]
+    except UnknownRankError as e:
+        sys.exit(str(e))
+
+
+def main(args):
+    with AutoClosingConn() as conn:
+        if args.command == 'lineage':
+            for entry in get_lineage(conn, args.name):
+                print(f'{entry.rank}\t{entry.name}')
+        elif args.command == 'members':
+            rank_id = _rank_id(conn, args.rank)
+            for member in iter_members(conn, rank_id, args.taxon):
+                print(f'{member.entity_id}\t{member.name}')
+        elif args.command == 'compare':
+            lookups = LookupCache(conn)
+            entity_ids = [lookups.entity_id(name) for name in args.names]
+            for name, entity_id in zip(args.names, entity_ids):
+                if entity_id is None:
+                    sys.exit(f'no entity named {name}')
+            query = sql_queries['select']['classifications_by_entity_ids'].format('?, ?')
+            pairs = {entity_id: [] for entity_id in entity_ids}
+            for entity_id, rank_id, name in conn.execute(query, entity_ids):
+                pairs[entity_id].append((rank_id, name))
+            ranks = RankEquivalence(conn)
+            for row in ranks.compare(*(pairs[entity_id] for entity_id in entity_ids)):
+                marker = '=' if row.left == row.right else '!='
+                print(f'{ranks.rank(row.canonical_id).name}\t{row.left or "-"}\t{marker}\t{row.right or "-"}')
+        elif args.command == 'suffix':
+            rank_id = _rank_id(conn, args.rank)
+            genus_type_id = ReferenceCache(conn).genus_type_ids.get(args.genus_type)
+            if genus_type_id is None:
+                sys.exit(f'unknown genus type "{args.genus_type}"')
+            queries = [(rank_id, genus_type_id, name) for name in args.names]
+            for name, suggestion in zip(args.names, SuffixIndex(conn).suggest(queries)):
+                print(f'{name}\tok' if name == suggestion else f'{name}\t{suggestion}')
+        elif args.command == 'search':
+            for match in search_names(conn, args.query, args.limit):
+                print(f'{match.score:.3f}\t{match.kind}\t{match.id}\t{match.name}')
+        elif args.command == 'reindex':
+            with batch(conn):
+                rebuild_search_index(conn)
+        else:
+            with batch(conn):
+                rebuild_lineages(conn)
+
+
+if __name__ == '__main__':
+    argv = parse_args()
+    main(argv)
@@ -0,0 +1,77 @@
+import atexit
+import sys
+import time
+from importlib.abc import MetaPathFinder
+from typing import List, Tuple
+
+# kept to stdlib modules the interpreter has already loaded, so enabling the profile doesn't skew it
+
+FLAG = '--startup-profile'
+
+_TOP_N = 25
+
+_records: List[Tuple[str, float, float]] = []
+_stack: List[float] = []
+_enabled_at = None
+
+
+class _TimedLoader:
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        started = time.perf_counter()
+        _stack.append(0.0)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = _stack.pop()
+            if _stack:
+                _stack[-1] += elapsed
+            _records.append((module.__name__, elapsed - children, elapsed))
+
+
+class _TimingFinder(MetaPathFinder):
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+def _report() -> None:
+    total = time.perf_counter() - _enabled_at
+    imports = sum(self_time for (_, self_time, _) in _records)
+    print(f'startup profile: {total * 1000:.1f} ms from enable to exit, {imports * 1000:.1f} ms importing '
+          f'{len(_records)} modules', file=sys.stderr)
+    print(f'{"cumulative ms":>14} {"self ms":>8}  module', file=sys.stderr)
+    for name, self_time, cumulative in sorted(_records, key=lambda record: record[2], reverse=True)[:_TOP_N]:
+        print(f'{cumulative * 1000:>14.2f} {self_time * 1000:>8.2f}  {name}', file=sys.stderr)
+
+
+def enable() -> None:
+    global _enabled_at
+    if _enabled_at is not None:
+        return
+    _enabled_at = time.perf_counter()
+    sys.meta_path.insert(0, _TimingFinder())
+    atexit.register(_report)
+
+
+def enable_if_requested(argv: List[str] = None) -> None:
+    if FLAG in (sys.argv if argv is None else argv):
+        enable()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+import numpy as np
+
+from data_access.lookup_cache import LookupCache
+from data_access.rank_classes import RankEquivalence
+from data_access.sql_ops import AutoClosingConn
+from data_access.taxon_matrix import DEFAULT_MEMORY_BUDGET, PairDistances, TaxonMatrix
+from model.constants import sql as sql_queries
+
+
+def parse_args():
+    argparser = argparse.ArgumentParser(
+        description='A tool for finding the lowest shared rank and taxonomic distance between entities'
+    )
+    argparser.add_argument(
+        '-m', '--memory-mb', type=int, dest='memory_mb', default=DEFAULT_MEMORY_BUDGET // (1024 * 1024),
+        metavar='MB', help='Roughly how much memory each chunk of comparisons may take'
+    )
+    subparsers = argparser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+
+    pairs_parser = subparsers.add_parser('pairs', help='Compares the TAB-separated pairs of entity names in FILE')
+    pairs_parser.add_argument(
+        'pairs_file', type=str, nargs='?', default='-', metavar='FILE',
+        help='One LEFT<TAB>RIGHT pair of names per line (defaults to stdin)'
+    )
+
+    all_parser = subparsers.add_parser(
+        'all', help='Compares every entity with every other (only those named, if any are) and prints each pair once'
+    )
+    all_parser.add_argument('names', type=str, nargs='*', metavar='NAME', help='The entities\' names')
+    all_parser.add_argument(
+        '-d', '--max-distance', type=int, dest='max_distance', metavar='DISTANCE',
+        help='Only prints pairs at most DISTANCE ranks apart (e.g. 0 for likely duplicates)'
+    )
+    return argparser.parse_args()
+
+
+def _read_pairs(pairs_file: str) -> list:
+    stream = sys.stdin if pairs_file == '-' else open(pairs_file)
+    try:
+        return [tuple(line.rstrip('\n').split('\t')) for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _entity_ids(lookups: LookupCache, names) -> list:
+    entity_ids = []
+    for name in names:
+        entity_id = lookups.entity_id(name)
+        if entity_id is None:
+            sys.exit(f'no entity named {name}')
+        entity_ids.append(entity_id)
+    return entity_ids
+
+
+def _print_pairs(left_names, right_names, distances: PairDistances, ranks: RankEquivalence) -> None:
+    for left, right, rank_id, depth, distance in zip(left_names, right_names,
+                                                      *(values.tolist() for values in distances)):
+        rank = ranks.rank(rank_id).name if rank_id >= 0 else '-'
+        print(f'{left}\t{right}\t{rank}\t{depth}\t{distance}')
+
+
+def main(args):
+    memory_budget = args.memory_mb * 1024 * 1024
+    with AutoClosingConn() as conn:
+        ranks = RankEquivalence(conn)
+        matrix = TaxonMatrix.load(conn, ranks)
+        lookups = LookupCache(conn)
+        if args.command == 'pairs':
+            pairs = _read_pairs(args.pairs_file)
+            for line_no, pair in enumerate(pairs, 1):
+                if len(pair) != 2:
+                    received = '\t'.join(pair)
+                    sys.exit(f'line {line_no}: expected LEFT<TAB>RIGHT, received "{received}"')
+            left_names = [left for (left, _) in pairs]
+            right_names = [right for (_, right) in pairs]
+            distances = matrix.pairs(_entity_ids(lookups, left_names), _entity_ids(lookups, right_names),
+                                     memory_budget)
+            _print_pairs(left_names, right_names, distances, ranks)
+        else:
+            if args.names:
+                entity_ids = _entity_ids(lookups, args.names)
+                names = dict(zip(entity_ids, args.names))
+            else:
+                entity_ids = matrix.entity_ids
+                names = dict(conn.execute(sql_queries['select']['all_entity_names']))
+            for block in matrix.iter_all_pairs(entity_ids, memory_budget):
+                keep = block.row_offset + np.arange(len(block.row_ids))[:, None] < \
+                    block.col_offset + np.arange(len(block.col_ids))[None, :]
+                if args.max_distance is not None:
+                    keep &= block.pairs.distances <= args.max_distance
+                rows, cols = np.nonzero(keep)
+                _print_pairs([names[entity_id] for entity_id in block.row_ids[rows].tolist()],
+                             [names[entity_id] for entity_id in block.col_ids[cols].tolist()],
+                             PairDistances(*(values[rows, cols] for values in block.pairs)), ranks)
+
+
+if __name__ == '__main__':
+    argv = parse_args()
+    main(argv)
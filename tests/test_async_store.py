@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+
+from data_access.async_store import AsyncStore
+from data_access.connections import ConnectionConfig, open_connection
+from data_access.group_commit import GroupCommitWriter
+from data_access.ingest_client import send_records
+from data_access.ingest_server import IngestServer
+from data_access.lineage import get_lineage
+from functional.dispatch import batch, insert_record
+from model.db_data import Classification, Entity, Rank, Ranks
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    db_file = str(tmp_path / 'taxonomy.db')
+    conn = open_connection(ConnectionConfig.for_path(db_file))
+    with batch(conn):
+        insert_record(Ranks(Rank('KINGDOM', 'kingdom', 1, 0), Rank('FAMILY', 'family', 1, 1)), conn)
+    conn.close()
+    return db_file
+
+
+def _ids(db_file: str) -> tuple:
+    conn = open_connection(ConnectionConfig.for_path(db_file))
+    entity_id = conn.execute(''' SELECT ID FROM ENTITIES WHERE NAME = 'Lion' ''').fetchone()[0]
+    ranks = dict(conn.execute(''' SELECT NAME, ID FROM RANKS '''))
+    conn.close()
+    return entity_id, ranks
+
+
+def test_async_store_inserts_single_entities_and_classifications(db_file):
+    async def run():
+        async with AsyncStore(db_file) as store:
+            await store.insert(Entity('Lion', 1))
+            entity_id, ranks = _ids(db_file)
+            await store.insert(Classification(entity_id, ranks['FAMILY'], 'FELIDAE'))
+            await store.insert(Classification(entity_id, ranks['KINGDOM'], 'ANIMALIA'))
+            return await store.lineage('Lion')
+
+    lineage = asyncio.run(run())
+    assert [(entry.rank, entry.name) for entry in lineage] == [('KINGDOM', 'ANIMALIA'), ('FAMILY', 'FELIDAE')]
+
+
+def test_ingest_server_accepts_entity_and_classification_payloads(db_file, tmp_path):
+    writer = GroupCommitWriter(db_file)
+    server = IngestServer(str(tmp_path / 'ingest.sock'), writer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        socket_path = str(tmp_path / 'ingest.sock')
+        assert send_records(socket_path, [{'type': 'ENTITY', 'value': 'Lion', 'cons_status_id': 1}]) == [{'ok': True}]
+        entity_id, ranks = _ids(db_file)
+        responses = send_records(socket_path, [
+            {'type': 'CLASSIFICATION', 'entity_id': entity_id, 'rank_id': ranks['KINGDOM'], 'value': 'ANIMALIA'}
+        ])
+        assert responses == [{'ok': True}]
+    finally:
+        server.shutdown()
+        server.server_close()
+        writer.close()
+    conn = open_connection(ConnectionConfig.for_path(db_file))
+    assert [(entry.rank, entry.name) for entry in get_lineage(conn, 'Lion')] == [('KINGDOM', 'ANIMALIA')]
+    conn.close()
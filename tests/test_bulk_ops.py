@@ -0,0 +1,68 @@
+import pytest
+
+from data_access.bulk_ops import SyncCounts, insert_entities, sync_entities, sync_entity_chunk
+from data_access.connections import ConnectionConfig, open_connection
+from data_access.lineage import get_lineage
+from data_access.ranks import RankResolver
+from functional.dispatch import batch, insert_record
+from model.db_data import Rank, Ranks
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = open_connection(ConnectionConfig.for_path(str(tmp_path / 'taxonomy.db')))
+    with batch(conn):
+        insert_record(Ranks(Rank('FAMILY', 'family', 1, 0), Rank('GENUS', 'genus', 1, 1)), conn)
+    yield conn
+    conn.close()
+
+
+def _entity(conn, line_no: int, name: str, cons_id: int, pop_est, family: str, genus: str) -> tuple:
+    return line_no, name, cons_id, pop_est, tuple(zip(RankResolver(conn).resolve(('FAMILY', 'GENUS')),
+                                                      (family, genus)))
+
+
+def _rows(conn) -> dict:
+    return {name: (cons_id, pop_est) for (name, cons_id, pop_est)
+            in conn.execute(''' SELECT NAME, CONS_STATUS_ID, POP_EST FROM ENTITIES ''')}
+
+
+def test_sync_counts_inserted_updated_and_unchanged(conn):
+    insert_entities(conn, [_entity(conn, 1, 'Lion', 1, 100, 'FELIDAE', 'PANTHERA'),
+                           _entity(conn, 2, 'Tiger', 1, 200, 'FELIDAE', 'PANTHERA'),
+                           _entity(conn, 3, 'Puma', 1, 300, 'FELIDAE', 'PUMA'),
+                           _entity(conn, 4, 'Wolf', 1, 400, 'CANIDAE', 'CANIS')])
+    chunk = [
+        # unchanged, and a missing population estimate leaves the stored one alone
+        _entity(conn, 1, 'Lion', 1, 100, 'FELIDAE', 'PANTHERA'),
+        _entity(conn, 2, 'Tiger', 1, None, 'FELIDAE', 'PANTHERA'),
+        # the entity row changed
+        _entity(conn, 3, 'Puma', 2, 300, 'FELIDAE', 'PUMA'),
+        # only a classification changed
+        _entity(conn, 4, 'Wolf', 1, 400, 'CANIDAE', 'LUPUS'),
+        _entity(conn, 5, 'Lynx', 1, None, 'FELIDAE', 'LYNX'),
+    ]
+    with batch(conn):
+        counts = sync_entity_chunk(conn, chunk)
+    assert counts == SyncCounts(inserted=1, updated=2, unchanged=2)
+    assert _rows(conn) == {'Lion': (1, 100), 'Tiger': (1, 200), 'Puma': (2, 300), 'Wolf': (1, 400),
+                           'Lynx': (1, None)}
+    assert [(entry.rank, entry.name) for entry in get_lineage(conn, 'Wolf')] == [('FAMILY', 'CANIDAE'),
+                                                                                  ('GENUS', 'LUPUS')]
+
+
+def test_a_name_repeated_in_a_chunk_counts_once_with_its_last_values(conn):
+    insert_entities(conn, [_entity(conn, 1, 'Lion', 1, 100, 'FELIDAE', 'PANTHERA')])
+    counts = sync_entities(conn, [_entity(conn, 1, 'Lion', 1, 150, 'FELIDAE', 'PANTHERA'),
+                                  _entity(conn, 2, 'Lion', 1, 100, 'FELIDAE', 'PANTHERA')])
+    assert counts == SyncCounts(inserted=0, updated=0, unchanged=1)
+    assert _rows(conn) == {'Lion': (1, 100)}
+
+
+def test_resyncing_the_same_dump_changes_nothing(conn):
+    dump = [_entity(conn, line_no, f'Species {line_no}', 1, line_no, 'FELIDAE', f'GENUS{line_no % 3}')
+            for line_no in range(1, 8)]
+    assert sync_entities(conn, dump, batch_size=3) == SyncCounts(inserted=7)
+    before = conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes
+    assert sync_entities(conn, dump, batch_size=3) == SyncCounts(unchanged=7)
+    assert (conn.execute('PRAGMA data_version').fetchone()[0], conn.total_changes) == before
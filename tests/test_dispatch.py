@@ -0,0 +1,66 @@
+import pytest
+
+from data_access.connections import ConnectionConfig, open_connection
+from functional.dispatch import batch, in_batch, insert_record
+from model.db_data import Field, Fields
+
+
+@pytest.fixture
+def conns(tmp_path):
+    config = ConnectionConfig.for_path(str(tmp_path / 'taxonomy.db'))
+    writer, reader = open_connection(config), open_connection(config)
+    yield writer, reader
+    writer.close()
+    reader.close()
+
+
+def _fields(conn) -> list:
+    return sorted(name for (name,) in conn.execute(''' SELECT NAME FROM FIELDS '''))
+
+
+def test_batch_commits_everything_on_exit(conns):
+    writer, reader = conns
+    with batch(writer):
+        insert_record(Field('ZOOLOGY'), writer)
+        insert_record(Fields(Field('BOTANY'), Field('MYCOLOGY')), writer)
+        # insert_record doesn't commit inside a batch, so nothing shows on another connection yet
+        assert _fields(reader) == []
+    assert _fields(reader) == ['BOTANY', 'MYCOLOGY', 'ZOOLOGY']
+    assert not writer.in_transaction and not in_batch(writer)
+
+
+def test_batch_rolls_everything_back_when_the_block_raises(conns):
+    writer, reader = conns
+    with pytest.raises(KeyError):
+        with batch(writer):
+            insert_record(Field('ZOOLOGY'), writer)
+            raise KeyError('boom')
+    assert _fields(writer) == [] and _fields(reader) == []
+    assert not writer.in_transaction and not in_batch(writer)
+    # the connection is usable again afterwards
+    with batch(writer):
+        insert_record(Field('BOTANY'), writer)
+    assert _fields(reader) == ['BOTANY']
+
+
+def test_nested_batch_is_refused_and_the_outer_one_rolls_back(conns):
+    writer, reader = conns
+    with pytest.raises(RuntimeError):
+        with batch(writer):
+            insert_record(Field('ZOOLOGY'), writer)
+            with batch(writer):
+                insert_record(Field('BOTANY'), writer)
+    assert _fields(reader) == []
+    assert not in_batch(writer)
+
+
+def test_max_records_flushes_as_it_goes(conns):
+    writer, reader = conns
+    with pytest.raises(KeyError):
+        with batch(writer, max_records=2) as unit:
+            unit.add_all(Field(name) for name in ('A', 'B', 'C'))
+            assert unit.flushes == 1 and unit.pending == 1
+            assert _fields(reader) == ['A', 'B']
+            raise KeyError('boom')
+    # only what was added since the last flush is lost
+    assert _fields(reader) == ['A', 'B']
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+from functional.entity_input import iter_entity_rows, iter_line_groups
+
+
+def _rows(text: str, fmt: str = 'ndjson') -> list:
+    return list(iter_entity_rows(io.StringIO(text), fmt))
+
+
+def test_null_ranks_are_left_out():
+    row, = _rows('{"name": "Lion", "cons_cd": "VU", "taxonomy": {"family": "Felidae", "genus": null}}\n')
+    assert row.taxonomy == (('FAMILY', 'FELIDAE'),)
+
+
+@pytest.mark.parametrize('line, message', [
+    ('{"cons_cd": "VU"}', 'line 3: expected a non-empty "name" string'),
+    ('["Lion"]', 'line 3: expected a JSON object, received list'),
+    ('{"name": "Lion", "taxonomy": "family=felidae"}', 'line 3: expected "taxonomy" to be an object'),
+    ('{"name": "Lion", "pop_est": "many"}', 'line 3: invalid literal'),
+    ('{"name": "Lion", "taxonomy": ["family"]}', 'line 3: Expected RANK=VALUE'),
+    ('{"name": "Lion",', 'line 3: Expecting property name enclosed in double quotes at column 17'),
+])
+def test_malformed_lines_name_their_line(line, message):
+    with pytest.raises(ValueError) as excinfo:
+        _rows('{"name": "Tiger"}\n\n' + line + '\n')
+    assert str(excinfo.value).startswith(message)
+
+
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_line_groups_never_split_a_quoted_csv_field(as_bytes):
+    lines = ['name,pop_est\n', 'Lion,1\n', '"Tiger\n', 'of Bengal",2\n', 'Puma,3\n']
+    if as_bytes:
+        lines = [line.encode() for line in lines]
+    assert [len(group) for group in iter_line_groups(lines, 2, 'csv')] == [2, 2, 1]
+    assert [len(group) for group in iter_line_groups(lines, 3, 'csv')] == [4, 1]
+    assert [len(group) for group in iter_line_groups(lines, 3, 'ndjson')] == [3, 2]
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from data_access import import_jobs
+from data_access.connections import ConnectionConfig, open_connection
+from data_access.import_jobs import ImportJobError, run_import_job
+from data_access.ranks import RankResolver
+from functional.dispatch import batch, insert_record
+from model.db_data import Rank, Ranks
+
+_CONS_CODES = {'LC': 1}
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = open_connection(ConnectionConfig.for_path(str(tmp_path / 'taxonomy.db')))
+    with batch(conn):
+        insert_record(Ranks(Rank('FAMILY', 'family', 1, 0)), conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / 'dump.ndjson'
+    path.write_text(''.join(json.dumps({'name': f'Species {i}', 'cons_cd': 'LC', 'taxonomy': {'family': f'F{i}'}})
+                            + '\n' for i in range(1, 8)))
+    return str(path)
+
+
+def _run(conn, dump: str, **kwargs):
+    return run_import_job(conn, dump, 'ndjson', RankResolver(conn), _CONS_CODES, batch_size=2, **kwargs)
+
+
+def _loaded(conn) -> list:
+    return [name for (name,) in conn.execute(''' SELECT NAME FROM ENTITIES ORDER BY ID ''')]
+
+
+# the crash comes after the chunk's rows were written, but before the chunk (and its checkpoint) committed
+def _crash_after(chunks: int, write_chunk):
+    written = []
+
+    def write(conn, chunk):
+        write_chunk(conn, chunk)
+        if len(written) == chunks:
+            raise KeyboardInterrupt
+        written.append(chunk)
+    return write
+
+
+def test_resume_after_a_crash_continues_after_the_last_committed_chunk(conn, dump, monkeypatch):
+    write_chunk = import_jobs.insert_entity_chunk
+    monkeypatch.setattr(import_jobs, 'insert_entity_chunk', _crash_after(2, write_chunk))
+    with pytest.raises(KeyboardInterrupt):
+        _run(conn, dump)
+    # the third chunk was written but rolled back along with its checkpoint
+    assert _loaded(conn) == [f'Species {i}' for i in range(1, 5)]
+
+    monkeypatch.setattr(import_jobs, 'insert_entity_chunk', write_chunk)
+    report = _run(conn, dump)
+    assert report.resumed_at_line == 5
+    assert report.entities == 7
+    assert _loaded(conn) == [f'Species {i}' for i in range(1, 8)]
+    assert conn.execute(''' SELECT COUNT(*) FROM ENTITY_TAXA ''').fetchone()[0] == 7
+
+    # a finished job loads the whole file again rather than resuming
+    assert _run(conn, dump).resumed_at_line is None
+
+
+def test_a_bad_line_stops_the_job_where_a_rerun_picks_it_up(conn, dump, tmp_path):
+    lines = open(dump).read().splitlines(keepends=True)
+    lines[5] = json.dumps({'name': 'Species 6', 'cons_cd': 'XX'}) + '\n'
+    bad = tmp_path / 'bad.ndjson'
+    bad.write_text(''.join(lines))
+    with pytest.raises(ValueError, match='line 6: unknown conservation code'):
+        _run(conn, str(bad))
+    assert len(_loaded(conn)) == 4
+
+    # fixing a line past the checkpoint is fine
+    bad.write_text(open(dump).read())
+    assert _run(conn, str(bad)).resumed_at_line == 5
+    assert len(_loaded(conn)) == 7
+
+
+def test_a_file_changed_before_its_checkpoint_is_refused(conn, dump, monkeypatch):
+    monkeypatch.setattr(import_jobs, 'insert_entity_chunk', _crash_after(1, import_jobs.insert_entity_chunk))
+    with pytest.raises(KeyboardInterrupt):
+        _run(conn, dump)
+    text = open(dump).read()
+    with open(dump, 'w') as stream:
+        stream.write(text.replace('Species 2', 'Species X'))
+    monkeypatch.undo()
+    with pytest.raises(ImportJobError, match='changed since its last checkpoint'):
+        _run(conn, dump)
+    assert _run(conn, dump, restart=True).resumed_at_line is None
+    assert 'Species X' in _loaded(conn)
+
@@ -0,0 +1,143 @@
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from data_access.bulk_ops import insert_entities
+from data_access.connections import ConnectionConfig, open_connection
+from data_access.lineage import get_lineage, iter_members, rebuild_lineages
+from data_access.ranks import RankResolver
+from data_access.sql_ops import insert_many
+from functional.dispatch import batch, insert_record
+from model.db_data import Classification, Classifications, Rank, Ranks
+
+_RANKS = ('KINGDOM', 'PHYLUM', 'CLASS', 'ORDER', 'FAMILY', 'GENUS', 'SPECIES')
+
+_LION = ('ANIMALIA', 'CHORDATA', 'MAMMALIA', 'CARNIVORA', 'FELIDAE', 'PANTHERA', 'LEO')
+_TIGER = ('ANIMALIA', 'CHORDATA', 'MAMMALIA', 'CARNIVORA', 'FELIDAE', 'PANTHERA', 'TIGRIS')
+# a plant genus that happens to share the cats' genus (and species) names
+_HOMONYM = ('PLANTAE', 'TRACHEOPHYTA', 'MAGNOLIOPSIDA', 'ROSALES', 'ROSACEAE', 'PANTHERA', 'LEO')
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = open_connection(ConnectionConfig.for_path(str(tmp_path / 'taxonomy.db')))
+    with batch(conn):
+        insert_record(Ranks(*(Rank(name, name.lower(), 1, rel_index) for (rel_index, name) in enumerate(_RANKS))),
+                      conn)
+    yield conn
+    conn.close()
+
+
+def _load(conn, *entities) -> None:
+    ranks = RankResolver(conn)
+    rank_ids = ranks.resolve(_RANKS)
+    insert_entities(conn, [(line_no, name, 1, None, tuple(zip(rank_ids, taxa)))
+                           for (line_no, (name, taxa)) in enumerate(entities, 1)])
+
+
+def _lineage(conn, name: str) -> list:
+    return [(entry.rank, entry.name) for entry in get_lineage(conn, name)]
+
+
+def _members(conn, rank: str, name: str) -> set:
+    return {member.name for member in iter_members(conn, RankResolver(conn)[rank], name)}
+
+
+def _assert_tree(conn) -> None:
+    # every taxon is still used, and has exactly one ancestor per level above it
+    unused = conn.execute(''' SELECT COUNT(*) FROM TAXA t
+                                WHERE NOT EXISTS (SELECT 1 FROM ENTITY_TAXA WHERE TAXON_ID = t.ID)
+                                AND NOT EXISTS (SELECT 1 FROM TAXA WHERE PARENT_ID = t.ID) ''').fetchone()[0]
+    assert unused == 0
+    for taxon_id, ancestors, deepest in conn.execute(''' SELECT DESCENDANT_ID, COUNT(*), MAX(DEPTH)
+                                                            FROM TAXON_CLOSURE GROUP BY DESCENDANT_ID '''):
+        assert ancestors == deepest + 1
+
+
+def test_homonyms_keep_their_own_lineage(conn):
+    _load(conn, ('Lion', _LION), ('Tiger', _TIGER))
+    _load(conn, ('Rose leo', _HOMONYM))
+    assert _lineage(conn, 'Lion') == list(zip(_RANKS, _LION))
+    assert _lineage(conn, 'Rose leo') == list(zip(_RANKS, _HOMONYM))
+    assert _members(conn, 'FAMILY', 'FELIDAE') == {'Lion', 'Tiger'}
+    assert _members(conn, 'KINGDOM', 'PLANTAE') == {'Rose leo'}
+    assert _members(conn, 'GENUS', 'PANTHERA') == {'Lion', 'Tiger', 'Rose leo'}
+    _assert_tree(conn)
+
+
+def test_reclassifying_moves_only_that_entity(conn):
+    _load(conn, ('Lion', _LION), ('Tiger', _TIGER))
+    pantheridae = _TIGER[:4] + ('PANTHERIDAE',) + _TIGER[5:]
+    _load(conn, ('Tiger', pantheridae))
+    assert _lineage(conn, 'Tiger') == list(zip(_RANKS, pantheridae))
+    assert _lineage(conn, 'Lion') == list(zip(_RANKS, _LION))
+    assert _members(conn, 'FAMILY', 'FELIDAE') == {'Lion'}
+    assert _members(conn, 'FAMILY', 'PANTHERIDAE') == {'Tiger'}
+    _assert_tree(conn)
+
+    # moving the last entity off a branch drops the branch
+    _load(conn, ('Lion', pantheridae[:6] + ('LEO',)))
+    assert _members(conn, 'FAMILY', 'FELIDAE') == set()
+    assert conn.execute(''' SELECT COUNT(*) FROM TAXA WHERE NAME = 'FELIDAE' ''').fetchone()[0] == 0
+    _assert_tree(conn)
+
+
+def test_rebuild_matches_incremental(conn):
+    _load(conn, ('Lion', _LION), ('Tiger', _TIGER), ('Rose leo', _HOMONYM))
+    _load(conn, ('Tiger', _TIGER[:4] + ('PANTHERIDAE',) + _TIGER[5:]))
+    before = {name: _lineage(conn, name) for name in ('Lion', 'Tiger', 'Rose leo')}
+    with batch(conn):
+        rebuild_lineages(conn)
+    assert {name: _lineage(conn, name) for name in before} == before
+    _assert_tree(conn)
+
+
+def test_every_classification_writer_keeps_lineage_in_sync(conn):
+    _load(conn, ('Lion', _LION), ('Tiger', _TIGER))
+    lion_id = conn.execute(''' SELECT ID FROM ENTITIES WHERE NAME = 'Lion' ''').fetchone()[0]
+    ranks = RankResolver(conn)
+    insert_many([Classification(lion_id, ranks['GENUS'], 'NEOFELIS')], conn)
+    assert ('GENUS', 'NEOFELIS') in _lineage(conn, 'Lion')
+    assert _members(conn, 'GENUS', 'PANTHERA') == {'Tiger'}
+
+    with batch(conn):
+        insert_record(Classifications(Classification(lion_id, ranks['FAMILY'], 'PANTHERIDAE')), conn)
+    assert _lineage(conn, 'Lion') == list(zip(_RANKS, _LION[:4] + ('PANTHERIDAE', 'NEOFELIS', 'LEO')))
+    assert _members(conn, 'FAMILY', 'FELIDAE') == {'Tiger'}
+    _assert_tree(conn)
+
+
+def test_ranks_added_later_take_their_place_in_lineages(conn):
+    _load(conn, ('Lion', _LION))
+    lion_id = conn.execute(''' SELECT ID FROM ENTITIES WHERE NAME = 'Lion' ''').fetchone()[0]
+    # the upsert moves GENUS and SPECIES down a place to make room, after the first write cached the old order
+    insert_record(Ranks(Rank('SUBFAMILY', 'subfamily', 1, 5), Rank('GENUS', 'genus', 1, 6),
+                        Rank('SPECIES', 'species', 1, 7)), conn)
+    insert_many([Classification(lion_id, RankResolver(conn)['SUBFAMILY'], 'PANTHERINAE')], conn)
+    assert _lineage(conn, 'Lion') == list(zip(_RANKS[:5] + ('SUBFAMILY',) + _RANKS[5:],
+                                              _LION[:5] + ('PANTHERINAE',) + _LION[5:]))
+    _assert_tree(conn)
+
+
+# a process that only opens a connection and calls insert_record, with none of the modules that happen to import
+# the lineage listener loaded, still gets its lineages kept
+def test_lineage_is_kept_without_importing_the_listener(conn, tmp_path):
+    conn.close()
+    script = '''
+import sys
+from data_access.connections import ConnectionConfig, open_connection
+from functional.dispatch import insert_record
+from model.db_data import Classification, Classifications, Entities, Entity
+conn = open_connection(ConnectionConfig.for_path(sys.argv[1]))
+entity_id = insert_record(Entities(Entity('Lion', 1)), conn)['Lion']
+ranks = dict(conn.execute('SELECT NAME, ID FROM RANKS'))
+insert_record(Classifications(Classification(entity_id, ranks['FAMILY'], 'FELIDAE'),
+                              Classification(entity_id, ranks['KINGDOM'], 'ANIMALIA')), conn)
+'''
+    subprocess.run([sys.executable, '-c', script, str(tmp_path / 'taxonomy.db')], check=True,
+                   cwd=pathlib.Path(__file__).parent.parent)
+    reopened = open_connection(ConnectionConfig.for_path(str(tmp_path / 'taxonomy.db')))
+    assert _lineage(reopened, 'Lion') == [('KINGDOM', 'ANIMALIA'), ('FAMILY', 'FELIDAE')]
+    reopened.close()
@@ -0,0 +1,48 @@
+import io
+import json
+
+import pytest
+
+from data_access.pipeline import iter_resolved_parallel
+
+_RANK_IDS = {'family': 1, 'genus': 2}
+_CONS_CODES = {'LC': 1}
+
+
+def _ndjson(count: int, bad_lines=()) -> io.StringIO:
+    lines = [json.dumps({'name': f'Species {line_no}', 'cons_cd': 'XX' if line_no in bad_lines else 'LC',
+                         'taxonomy': {'family': 'FELIDAE'}})
+             for line_no in range(1, count + 1)]
+    return io.StringIO(''.join(line + '\n' for line in lines))
+
+
+def _resolve(stream: io.StringIO, fmt: str = 'ndjson', yielded: list = None) -> list:
+    yielded = [] if yielded is None else yielded
+    for entity in iter_resolved_parallel(stream, fmt, _RANK_IDS, _CONS_CODES, workers=3, chunk_lines=4):
+        yielded.append(entity)
+    return yielded
+
+
+def test_rows_come_out_in_file_order():
+    assert [line_no for (line_no, *_) in _resolve(_ndjson(50))] == list(range(1, 51))
+
+
+# later chunks finish while an earlier one is still failing; only the first bad line in the file is reported,
+# after every row before it, exactly as a serial load would stop
+def test_the_first_bad_line_is_raised_after_every_row_before_it():
+    yielded = []
+    with pytest.raises(ValueError, match='^line 13: unknown conservation code'):
+        _resolve(_ndjson(50, bad_lines=(13, 14, 31)), yielded=yielded)
+    assert [line_no for (line_no, *_) in yielded] == list(range(1, 13))
+
+
+def test_csv_line_numbers_count_quoted_fields_spanning_lines():
+    rows = ['name,cons_cd,family\n'] + [f'Species {i},LC,FELIDAE\n' for i in range(1, 4)]
+    rows += ['"Species\n', '4",LC,FELIDAE\n'] + [f'Species {i},LC,FELIDAE\n' for i in range(5, 10)] + ['Bad,XX,\n']
+    yielded = []
+    with pytest.raises(ValueError, match='^line 12: unknown conservation code'):
+        _resolve(io.StringIO(''.join(rows)), 'csv', yielded)
+    assert [name for (_, name, *_) in yielded] == ['Species 1', 'Species 2', 'Species 3', 'Species\n4'] + \
+        [f'Species {i}' for i in range(5, 10)]
+    # a record spanning lines is numbered by its last line, and the ones after it by their own
+    assert [line_no for (line_no, *_) in yielded] == [2, 3, 4, 6, 7, 8, 9, 10, 11]
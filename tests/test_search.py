@@ -0,0 +1,58 @@
+import pytest
+
+from data_access.bulk_ops import insert_entities
+from data_access.connections import ConnectionConfig, open_connection
+from data_access.ranks import RankResolver
+from data_access.search import fts_trigram_available, rebuild_search_index, search_names
+from functional.dispatch import batch, insert_record
+from model.db_data import Entities, Entity, Rank, Ranks
+
+_NAMES = ('PANTHERA', 'FELIDAE', 'ANIMALIA', 'CARNIVORA', 'CANIDAE', 'URSIDAE')
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = open_connection(ConnectionConfig.for_path(str(tmp_path / 'taxonomy.db')))
+    if not fts_trigram_available(conn):
+        pytest.skip('SQLite lacks FTS5 trigrams')
+    with batch(conn):
+        insert_record(Entities(*(Entity(name, 1) for name in _NAMES)), conn)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('pantera', 'PANTHERA'),
+    ('panthra', 'PANTHERA'),
+    ('felidea', 'FELIDAE'),
+    ('animlia', 'ANIMALIA'),
+    ('carnivra', 'CARNIVORA'),
+])
+def test_one_edit_misspellings_find_the_name(conn, query, expected):
+    matches = search_names(conn, query)
+    assert matches and matches[0].name == expected
+
+
+def test_unrelated_short_query_finds_nothing(conn):
+    assert search_names(conn, 'qwxyz') == []
+
+
+# the same genus under many families is one search result, before and after its first taxon is pruned
+def test_a_taxon_name_under_several_parents_is_found_once(conn):
+    with batch(conn):
+        insert_record(Ranks(Rank('FAMILY', 'family', 1, 0), Rank('GENUS', 'genus', 1, 1)), conn)
+    rank_ids = RankResolver(conn).resolve(('FAMILY', 'GENUS'))
+    families = [f'FAMILY{i}' for i in range(12)]
+    insert_entities(conn, [(line_no, f'Species {line_no}', 1, None, tuple(zip(rank_ids, (family, 'PANTHERA'))))
+                           for (line_no, family) in enumerate(families, 1)])
+
+    def taxa():
+        return [match.name for match in search_names(conn, 'panthera', limit=8) if match.kind == 'TAXON']
+
+    assert taxa() == ['PANTHERA']
+    insert_entities(conn, [(1, 'Species 1', 1, None, tuple(zip(rank_ids, ('FAMILY1', 'PANTHERA'))))])
+    assert taxa() == ['PANTHERA']
+    with batch(conn):
+        rebuild_search_index(conn)
+    assert taxa() == ['PANTHERA']
+    assert search_names(conn, 'family1', limit=8)[0].name == 'FAMILY1'